@@ -0,0 +1,169 @@
+# backend/app/airport_index.py
+"""Autocomplete index over the bundled airport list for /flight-suggestions.
+
+Two structures, both built once at startup:
+
+* a prefix index: every searchable key (IATA/ICAO code, city, alias, each
+  word of the airport name) in a sorted array per rank, so a prefix is a
+  ``bisect`` range, whose most popular airports NumPy picks out
+* a trigram index for infix matches ("shivaji" inside the airport name),
+  intersected smallest-posting-first and then verified
+
+Matches are ranked exact code > city/alias prefix > code or airport-word
+prefix > infix, then by popularity, and cut to the top ``limit``. Airports
+are stored in popularity order, so "most popular" is "lowest id" and the
+infix scan can stop as soon as it has enough hits.
+"""
+import hashlib
+import heapq
+import json
+import re
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+
+EXACT_CODE, CITY_PREFIX, WORD_PREFIX, INFIX = 4, 3, 2, 1
+
+# Words nearly every airport name shares; indexing them as prefixes would
+# turn "a" or "int" into a scan of the whole list
+STOPWORDS = {"airport", "international", "regional", "airfield", "aerodrome",
+             "airstrip", "domestic", "municipal", "the", "of", "de"}
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r" +")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class AirportIndex:
+    def __init__(self, airports: List[Dict[str, Any]], max_limit: int = 20):
+        self.airports = sorted(airports, key=lambda airport: -airport.get("popularity", 0))
+        self.max_limit = max_limit
+        # Changes whenever the data does; part of every ETag
+        self.version = hashlib.sha1(
+            json.dumps(airports, sort_keys=True).encode()
+        ).hexdigest()[:12]
+
+        keys: List[Tuple[str, int, int]] = []
+        self._by_code: Dict[str, List[int]] = {}
+        self._haystacks: List[str] = []
+        self._trigrams: Dict[str, List[int]] = {}
+        for i, airport in enumerate(self.airports):
+            codes = {normalize(airport[field]) for field in ("code", "icao") if airport.get(field)}
+            for code in codes:
+                self._by_code.setdefault(code, []).append(i)
+            keys.extend((code, WORD_PREFIX, i) for code in codes)
+            for place in [airport["city"]] + list(airport.get("aliases", [])):
+                keys.append((normalize(place), CITY_PREFIX, i))
+            for word in set(normalize(airport["airport"]).split()) - STOPWORDS:
+                keys.append((word, WORD_PREFIX, i))
+
+            haystack = " | ".join(normalize(text) for text in
+                                  [airport["city"], airport["airport"]] + list(airport.get("aliases", [])))
+            self._haystacks.append(haystack)
+            # Postings stay in ascending id order, i.e. most popular first
+            for gram in _trigrams(haystack):
+                self._trigrams.setdefault(gram, []).append(i)
+        self._trigram_sets = {gram: set(ids) for gram, ids in self._trigrams.items()}
+
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        # (tier, sorted keys, airport of each key), best tier first
+        self._prefix_tiers = []
+        for tier in (CITY_PREFIX, WORD_PREFIX):
+            tier_keys = [(key, i) for key, key_tier, i in keys if key_tier == tier]
+            self._prefix_tiers.append((tier, [key for key, _ in tier_keys],
+                                       np.array([i for _, i in tier_keys], dtype=np.int32)))
+        self._search_cached = lru_cache(maxsize=4096)(self._search)
+        self.warm()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "AirportIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.airports)
+
+    def warm(self):
+        # One- and two-character prefixes cover the widest key ranges; rank them up front
+        for prefix in {key[:n] for key in self._keys for n in (1, 2) if len(key) >= n}:
+            self._search_cached(prefix)
+
+    def _prefix_matches(self, query: str, best: Dict[int, int]):
+        for i in self._by_code.get(query, ()):
+            best[i] = EXACT_CODE
+        for tier, keys, airports in self._prefix_tiers:
+            lo = bisect_left(keys, query)
+            hi = bisect_left(keys, query + "\x7f", lo)
+            # The most popular (lowest) ids of the range; that many always
+            # include max_limit airports not already ranked higher
+            for i in np.unique(airports[lo:hi])[:self.max_limit + len(best)].tolist():
+                if tier > best.get(i, 0):
+                    best[i] = tier
+
+    def _infix_matches(self, query: str, best: Dict[int, int]):
+        grams = sorted(_trigrams(query), key=lambda gram: len(self._trigrams.get(gram, ())))
+        if not grams or grams[0] not in self._trigrams:
+            return
+        if len(grams) == 1:
+            candidates = self._trigrams[grams[0]]
+        else:
+            # Set intersection runs in C; the rarest posting bounds its cost
+            postings = [self._trigram_sets.get(gram, set()) for gram in grams]
+            candidates = sorted(postings[0].intersection(*postings[1:]))
+        found = 0
+        # Candidates most-popular-first; infix hits rank below every prefix
+        # hit, so max_limit new ones are always enough
+        for i in candidates:
+            if i in best:
+                continue
+            if query in self._haystacks[i]:
+                best[i] = INFIX
+                found += 1
+                if found >= self.max_limit:
+                    return
+
+    def _search(self, query: str) -> Tuple[Dict[str, Any], ...]:
+        # Always ranks max_limit results so every limit shares one cache entry
+        limit = self.max_limit
+        if not query:
+            ranked = range(min(limit, len(self.airports)))
+        else:
+            best: Dict[int, int] = {}
+            self._prefix_matches(query, best)
+            if len(query) >= 3 and len(best) < limit:
+                self._infix_matches(query, best)
+            ranked = heapq.nsmallest(limit, best, key=lambda i: (-best[i], i))
+        return tuple(self.suggestion(i) for i in ranked)
+
+    def suggestion(self, i: int) -> Dict[str, Any]:
+        airport = self.airports[i]
+        return {
+            "city": airport["city"],
+            "code": airport["code"],
+            "airport": airport["airport"],
+            "country": airport.get("country"),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        info = self._search_cached.cache_info()
+        return {"entries": info.currsize, "hits": info.hits, "misses": info.misses}
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        limit = max(1, min(limit, self.max_limit))
+        return list(self._search_cached(normalize(query))[:limit])
+
+    def etag(self, query: str, limit: int) -> str:
+        digest = hashlib.sha1(f"{normalize(query)}|{limit}".encode()).hexdigest()[:16]
+        return f'"{self.version}-{digest}"'
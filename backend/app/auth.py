@@ -0,0 +1,208 @@
+# backend/app/auth.py
+"""Firebase ID-token verification without the per-request cost.
+
+``firebase_admin.auth.verify_id_token`` checks an RSA signature on every
+call and parses Google's signing certificates again each time. Here both
+the keys and the results are kept:
+
+* ``PublicKeyCache``: Google's certificates, fetched once and turned into
+  ready-to-use keys, refreshed by a background task shortly before the
+  ``Cache-Control: max-age`` runs out. A token with an unknown key id
+  triggers one extra refresh (at most every ``min_refresh_interval``
+  seconds, shared by all waiting requests), which covers a key rotation
+  between two scheduled refreshes. When Google can't be reached the last
+  keys stay in use.
+* ``TokenVerifier``: the claims of verified tokens in a bounded LRU keyed
+  by a hash of the token, kept until the token's ``exp``. A client sends
+  the same token for up to an hour, so only its first request pays for the
+  signature check.
+
+Like ``verify_id_token`` without ``check_revoked``, a token stays valid
+until it expires even if the user's sessions were revoked meanwhile.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from jose import JWTError, jwk, jwt
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+# () -> ({key id: PEM certificate}, Cache-Control header)
+CertFetcher = Callable[[], Awaitable[Tuple[Dict[str, str], Optional[str]]]]
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+def max_age(cache_control: Optional[str], default: float) -> float:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(match.group(1)) if match else default
+
+
+async def fetch_google_certs() -> Tuple[Dict[str, str], Optional[str]]:
+    import httpx
+
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(GOOGLE_CERTS_URL)
+        response.raise_for_status()
+        return response.json(), response.headers.get("cache-control")
+
+
+class PublicKeyCache:
+    def __init__(self, fetch: CertFetcher = fetch_google_certs, refresh_margin: float = 300.0,
+                 min_refresh_interval: float = 60.0, default_max_age: float = 3600.0):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.default_max_age = default_max_age
+        self._keys: Dict[str, Any] = {}
+        self._expires = 0.0  # monotonic
+        self._attempted: Optional[float] = None
+        self._refreshing: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def key(self, kid: str):
+        if self._task is None:
+            # Started on first use, so a worker that never sees a token
+            # never calls Google
+            self.start()
+        key = self._keys.get(kid)
+        if key is None or self._expires <= time.monotonic():
+            if self._refreshing is not None or self._attempted is None or (
+                    time.monotonic() - self._attempted >= self.min_refresh_interval):
+                await self.refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError("Token signed with an unknown key")
+        return key
+
+    async def refresh(self):
+        # Single-flight: concurrent callers wait for the same fetch
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._fetch())
+            self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+        await asyncio.shield(self._refreshing)
+
+    async def _fetch(self):
+        self._attempted = time.monotonic()
+        try:
+            certs, cache_control = await self.fetch()
+            # Parsed once here instead of on every verification
+            keys = {kid: jwk.construct(pem, "RS256") for kid, pem in certs.items()}
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Error fetching Firebase signing keys: {e}")
+            return
+        self._keys = keys
+        self._expires = time.monotonic() + max_age(cache_control, self.default_max_age)
+        self.refreshes += 1
+
+    async def _run(self):
+        while True:
+            # Shortly before the keys expire; after a failed fetch, again in
+            # min_refresh_interval
+            delay = self._expires - time.monotonic() - self.refresh_margin
+            await asyncio.sleep(max(delay, self.min_refresh_interval))
+            await self.refresh()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "expires_in_seconds": max(0.0, self._expires - time.monotonic()) if self._keys else None,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+class TokenVerifier:
+    def __init__(self, project_id: str, keys: Optional[PublicKeyCache] = None,
+                 max_entries: int = 10000, clock_skew: int = 0):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.keys = keys or PublicKeyCache()
+        self.max_entries = max_entries
+        self.clock_skew = clock_skew
+        # token hash -> (claims, exp)
+        self._claims: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """The token's claims (shared, don't modify); ``uid`` is the Firebase user id."""
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        now = time.time()
+        entry = self._claims.get(digest)
+        if entry is not None:
+            if entry[1] > now:
+                self.hits += 1
+                self._claims.move_to_end(digest)
+                return entry[0]
+            del self._claims[digest]
+        self.misses += 1
+        try:
+            claims = await self._verify(token, now)
+        except InvalidTokenError:
+            # Not cached: a bad token is cheap to reject again
+            self.rejected += 1
+            raise
+        self._claims[digest] = (claims, claims["exp"] + self.clock_skew)
+        while len(self._claims) > self.max_entries:
+            self._claims.popitem(last=False)
+        return claims
+
+    async def _verify(self, token: str, now: float) -> Dict[str, Any]:
+        # The same checks as firebase_admin.auth.verify_id_token
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise InvalidTokenError(f"Malformed token: {e}")
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise InvalidTokenError("Token is not a Firebase ID token")
+        key = await self.keys.key(header["kid"])
+        try:
+            claims = jwt.decode(token, key, algorithms=["RS256"], audience=self.project_id,
+                                issuer=self.issuer, options={"leeway": self.clock_skew})
+        except JWTError as e:
+            raise InvalidTokenError(str(e))
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidTokenError("Token has an invalid subject")
+        if not isinstance(claims.get("exp"), (int, float)):
+            raise InvalidTokenError("Token has no expiry")
+        for claim in ("iat", "auth_time"):
+            if not isinstance(claims.get(claim), (int, float)) or claims[claim] > now + self.clock_skew:
+                raise InvalidTokenError(f"Token has an invalid {claim}")
+        claims["uid"] = subject
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._claims),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "keys": self.keys.stats(),
+        }
@@ -0,0 +1,135 @@
+# backend/app/chat.py
+"""Gemini chat helpers shared by the /chat and /chat/stream endpoints."""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.metrics import span
+
+# Add system prompt to guide the AI's behavior
+SYSTEM_PROMPT = """You are SkyView's AI travel assistant. 
+        Your goal is to help users with flight bookings, travel recommendations, and answer questions.
+        Be concise, friendly, and provide accurate travel information.
+        If asked about booking flights, guide users to search on the app.
+        Keep responses under 150 words and focus on being helpful."""
+
+# Fallback responses if Gemini is not available
+FALLBACK_RESPONSES = {
+    "flight": "I can help you find flights. Please provide your departure city, destination, and dates.",
+    "book": "To book a flight, I'll need information about your travel dates, destination, and preferences.",
+    "cancel": "If you need to cancel a booking, please go to the My Bookings section in your profile.",
+    "baggage": "Baggage allowance depends on the airline and fare class. Economy generally allows 15-20kg.",
+    "default": "I'm your travel assistant. I can help you book flights, answer questions about travel, and provide recommendations."
+}
+
+
+class LLMBusyError(Exception):
+    """Raised when no LLM slot frees up within the queue timeout."""
+
+
+class LLMLimiter:
+    """Caps the number of in-flight LLM calls on this worker."""
+
+    def __init__(self, max_concurrent: int, queue_timeout: float):
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusyError("Too many concurrent AI requests, please retry")
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+def format_messages(messages) -> List[Dict[str, Any]]:
+    # Format the conversation for Gemini
+    formatted_messages = []
+    for msg in messages:
+        role = "user" if msg.role == "user" else "model"
+        formatted_messages.append({"role": role, "parts": [msg.content]})
+    return formatted_messages
+
+
+def fallback_reply(messages) -> str:
+    # Determine which fallback to use based on the last user message
+    last_message = messages[-1].content.lower() if messages else ""
+
+    if "flight" in last_message:
+        return FALLBACK_RESPONSES["flight"]
+    elif "book" in last_message:
+        return FALLBACK_RESPONSES["book"]
+    elif "cancel" in last_message:
+        return FALLBACK_RESPONSES["cancel"]
+    elif "baggage" in last_message or "luggage" in last_message:
+        return FALLBACK_RESPONSES["baggage"]
+    return FALLBACK_RESPONSES["default"]
+
+
+def start_session(model, messages=()):
+    # Create a chat session with the system prompt and the conversation so
+    # far; the last message is then sent on its own (send_message takes one
+    # message, not a list of turns)
+    return model.start_chat(history=[
+        {"role": "user", "parts": ["What's your role?"]},
+        {"role": "model", "parts": [SYSTEM_PROMPT]}
+    ] + format_messages(messages[:-1]))
+
+
+def last_message(messages) -> str:
+    return messages[-1].content if messages else ""
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    lines = f"event: {event}\n" if event else ""
+    return lines + f"data: {json.dumps(data)}\n\n"
+
+
+async def stream_reply(model, messages, limiter: LLMLimiter, is_disconnected,
+                       on_complete=None) -> AsyncIterator[str]:
+    """Yield the Gemini reply as server-sent events.
+
+    The LLM slot is held only while generating and is released when the
+    client disconnects (Starlette cancels the generator, or the
+    ``is_disconnected`` poll between chunks notices first).
+    """
+    try:
+        await limiter.acquire()
+    except LLMBusyError as e:
+        yield sse_event({"detail": str(e)}, event="error")
+        return
+
+    response = None
+    try:
+        chat = start_session(model, messages)
+        with span("gemini", "send_message_stream"):
+            response = await chat.send_message_async(last_message(messages), stream=True)
+        parts = []
+        async for chunk in response:
+            if await is_disconnected():
+                return
+            parts.append(chunk.text)
+            yield sse_event({"text": chunk.text})
+        yield sse_event({"status": "success"}, event="done")
+        if on_complete is not None:
+            await on_complete("".join(parts))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Error in chat stream: {e}")
+        yield sse_event({"detail": f"Failed to process chat: {str(e)}"}, event="error")
+    finally:
+        limiter.release()
@@ -0,0 +1,178 @@
+# backend/app/chat_cache.py
+"""Response cache for /chat keyed on the normalized conversation tail.
+
+Most chat traffic is the same handful of questions, so identical tails (after
+lower-casing and stripping punctuation) are answered from the cache instead
+of a Gemini round-trip. The key includes a hash of the system prompt, so
+editing the prompt invalidates every entry.
+"""
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.chat import FALLBACK_RESPONSES, SYSTEM_PROMPT
+
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:12]
+
+# Canonical phrasings used to warm the cache from the fallback table
+WARM_START_QUESTIONS = {
+    "flight": ["find a flight", "search for flights", "i want to find a flight"],
+    "book": ["how do i book", "how do i book a ticket", "i want to book"],
+    "cancel": ["how do i cancel", "how do i cancel my booking", "cancel my booking"],
+    "baggage": ["what is the baggage allowance", "how much baggage can i carry",
+                "what is the luggage allowance"],
+}
+
+# Marks answers seeded from the fallback table, which a live model replaces
+SEEDED = "\x00seeded:"
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class InMemoryCacheBackend:
+    """LRU with per-entry TTL, bounded by the approximate bytes it holds."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        return len(key) + len(value.encode())
+
+    def _discard(self, key: str):
+        _, value = self._entries.pop(key)
+        self.size_bytes -= self._entry_size(key, value)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+
+class RedisCacheBackend:
+    """Shared cache for multi-worker deployments (needs the ``redis`` package).
+
+    Eviction is left to the server's ``maxmemory-policy`` (e.g. allkeys-lru).
+    """
+
+    def __init__(self, url: str, prefix: str = "skyview:chat:"):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._client.set(self._prefix + key, value, ex=max(1, int(ttl)))
+
+
+class ChatResponseCache:
+    def __init__(self, backend, ttl: float, tail_messages: int = 3):
+        self.backend = backend
+        self.ttl = ttl
+        self.tail_messages = tail_messages
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def key_for(self, messages) -> str:
+        tail = messages[-self.tail_messages:]
+        parts = [PROMPT_VERSION] + [f"{msg.role}:{normalize(msg.content)}" for msg in tail]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def is_cacheable(request) -> bool:
+        # Conversations tied to a user carry personal history, never share them
+        return bool(request.messages) and not request.user_id
+
+    async def get(self, messages, live: bool = True) -> Optional[str]:
+        """The cached answer; a seeded one only when ``live`` is false, so a
+        caller with a working model gets a miss and replaces it."""
+        try:
+            value = await self.backend.get(self.key_for(messages))
+        except Exception as e:
+            print(f"Error reading chat cache: {e}")
+            self.errors += 1
+            value = None
+        if value is not None and value.startswith(SEEDED):
+            value = None if live else value[len(SEEDED):]
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, messages, response: str, seeded: bool = False):
+        try:
+            await self.backend.set(self.key_for(messages), SEEDED + response if seeded else response, self.ttl)
+        except Exception as e:
+            print(f"Error writing chat cache: {e}")
+            self.errors += 1
+
+    async def warm_start(self, message_class):
+        """Seed the cache with the keyword fallback answers, for when Gemini
+        is unavailable; they never stand in for a live answer."""
+        for keyword, questions in WARM_START_QUESTIONS.items():
+            for question in questions:
+                messages = [message_class(content=question, role="user")]
+                await self.set(messages, FALLBACK_RESPONSES[keyword], seeded=True)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+        if isinstance(self.backend, InMemoryCacheBackend):
+            stats.update(entries=len(self.backend), bytes=self.backend.size_bytes,
+                         evictions=self.backend.evictions)
+        return stats
+
+
+def build_chat_cache(ttl: float, max_bytes: int, tail_messages: int,
+                     redis_url: Optional[str] = None) -> ChatResponseCache:
+    backend = None
+    if redis_url:
+        try:
+            backend = RedisCacheBackend(redis_url)
+        except Exception as e:
+            print(f"Shared chat cache unavailable, using in-process cache: {e}")
+    if backend is None:
+        backend = InMemoryCacheBackend(max_bytes)
+    return ChatResponseCache(backend, ttl, tail_messages)
@@ -0,0 +1,64 @@
+# backend/app/clients.py
+"""Firebase and Gemini client setup, done lazily at startup.
+
+``google.generativeai`` and the Firestore modules take most of a second to
+import, so ``app.main`` imports neither. Its startup hook calls these once
+per worker process, after any fork, so every worker gets its own clients
+(and their connection pools) that all of its requests then share.
+"""
+import os
+from typing import Optional
+
+from app.repository import FirestoreRepository
+
+
+def init_firebase(service_account_path: str) -> bool:
+    """Initialize the default Firebase app; False if it isn't configured."""
+    try:
+        import firebase_admin
+        from firebase_admin import credentials
+
+        try:
+            firebase_admin.get_app()
+            return True
+        except ValueError:
+            pass
+        if not os.path.exists(service_account_path):
+            print(f"Firebase service account file not found at: {service_account_path}")
+            print("Running without Firebase")
+            return False
+        firebase_admin.initialize_app(credentials.Certificate(service_account_path))
+        print("Firebase initialized successfully")
+        return True
+    except Exception as e:
+        print(f"Failed to initialize Firebase: {e}")
+        return False
+
+
+def firestore_repository(timeout: float, max_workers: int) -> FirestoreRepository:
+    """Repository over the async Firestore client, or the sync one on a thread pool.
+
+    Must be called with the event loop running: the async client binds to it.
+    """
+    from firebase_admin import firestore, firestore_async
+
+    try:
+        return FirestoreRepository(firestore_async.client(), is_async=True, timeout=timeout,
+                                   watch_client=firestore.client())
+    except Exception as e:
+        print(f"Async Firestore client unavailable, using thread pool: {e}")
+        return FirestoreRepository(firestore.client(), timeout=timeout, max_workers=max_workers)
+
+
+def init_gemini(api_key: Optional[str], model_name: str = "gemini-pro"):
+    """The Gemini model, or None when it can't be set up."""
+    try:
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(model_name)
+        print("Gemini API initialized successfully")
+        return model
+    except Exception as e:
+        print(f"Failed to initialize Gemini API: {e}")
+        return None
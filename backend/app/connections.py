@@ -0,0 +1,282 @@
+# backend/app/connections.py
+"""Connecting itineraries (up to two stops) behind /flights/connections.
+
+The route graph is time-expanded: each airport holds its outgoing flights
+as an array of catalogue rows ordered by departure time, so the flights
+that can follow an arrival at ``t`` are one ``searchsorted`` window,
+``[t + minimum connection time, t + max layover]``. Per airport it also
+keeps the cheapest and shortest flight to each airport it serves, used
+as lower bounds below.
+
+A search is best-first (Dijkstra-style, with the lower bounds as an A*
+heuristic): partial itineraries sit in a heap ordered by their cost so far
+plus the least the rest can cost, so complete itineraries come out in
+final ranking order and the search stops after ``limit`` of them. It is
+bounded three ways: at most ``max_stops`` connections, a next leg must
+land somewhere the destination can still be reached from within the legs
+left, and at most ``max_expansions`` partial itineraries are extended.
+
+Seats, classes and prices are read from the catalogue columns at query
+time, so seat updates need nothing here; ``update()`` re-files one flight
+after it is cancelled or retimed, touching only its departure airport.
+It is called from ``FlightSearchEngine.update_status`` for a status PATCH
+to this worker and for changes seen by a /ws/flights listener (see
+app/main.py); other changes wait for the next catalogue load.
+"""
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.flight_catalogue import ColumnarFlightCatalogue
+
+SORT_FIELDS = ("price", "duration")
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class Itinerary:
+    __slots__ = ("rows", "price", "departure", "arrival")
+
+    def __init__(self, rows: Tuple[int, ...], price: float, departure: int, arrival: int):
+        self.rows = rows
+        self.price = price
+        self.departure = departure
+        self.arrival = arrival
+
+    def record(self, catalogue: ColumnarFlightCatalogue) -> Dict[str, Any]:
+        legs = [catalogue.record(row) for row in self.rows]
+        return {
+            "legs": legs,
+            "stops": len(legs) - 1,
+            "price": self.price,
+            "durationMinutes": (self.arrival - self.departure) // 60,
+            "departureTime": legs[0]["departureTime"],
+            "arrivalTime": legs[-1]["arrivalTime"],
+            "layoverMinutes": [int(catalogue.departure[after] - catalogue.arrival[before]) // 60
+                               for before, after in zip(self.rows, self.rows[1:])],
+        }
+
+
+class _Departures:
+    """One airport's flights out, ordered by departure time."""
+    __slots__ = ("rows", "times")
+
+    def __init__(self, rows: np.ndarray, departure: np.ndarray):
+        self.rows = rows
+        self.times = departure[rows]
+
+    @classmethod
+    def of(cls, rows: np.ndarray, departure: np.ndarray) -> "_Departures":
+        return cls(rows[np.argsort(departure[rows], kind="stable")], departure)
+
+
+class ConnectionGraph:
+    def __init__(self, catalogue: ColumnarFlightCatalogue, min_connection: int = 45 * 60,
+                 min_connection_by_airport: Optional[Dict[str, int]] = None,
+                 max_layover: int = 12 * 3600):
+        self.catalogue = catalogue
+        self.max_layover = max_layover
+        # Minimum connection time per airport code, in seconds
+        self.min_connection = np.full(len(catalogue.airports), min_connection, dtype=np.int64)
+        for airport, seconds in (min_connection_by_airport or {}).items():
+            self.min_connection[catalogue.airports.codes_for(airport)] = seconds
+
+        self._city_airports: Dict[int, Set[int]] = {}
+        for city, airport in set(zip(catalogue.departure_city.tolist(), catalogue.departure_airport.tolist())) | \
+                set(zip(catalogue.arrival_city.tolist(), catalogue.arrival_airport.tolist())):
+            self._city_airports.setdefault(city, set()).add(airport)
+
+        live = np.flatnonzero(~self._cancelled(np.arange(len(catalogue), dtype=np.int64)))
+        order = live[np.argsort(catalogue.departure_airport[live], kind="stable")]
+        airports, starts = np.unique(catalogue.departure_airport[order], return_index=True)
+        self._departures: Dict[int, _Departures] = {
+            int(airport): _Departures.of(rows, catalogue.departure)
+            for airport, rows in zip(airports, np.split(order, starts[1:]))
+        }
+        # airport -> {airport served: (cheapest price, shortest duration)}
+        self._routes: Dict[int, Dict[int, Tuple[float, int]]] = {}
+        # airport -> airports with a flight to it
+        self._into: Dict[int, Set[int]] = {}
+        for airport in self._departures:
+            self._index_routes(airport)
+
+    def _cancelled(self, rows: np.ndarray) -> np.ndarray:
+        catalogue = self.catalogue
+        codes = [code for code, value in enumerate(catalogue.statuses.values) if value.lower() == "cancelled"]
+        return np.isin(catalogue.status[rows], codes)
+
+    def _index_routes(self, airport: int):
+        catalogue = self.catalogue
+        rows = self._departures[airport].rows
+        served, index = np.unique(catalogue.arrival_airport[rows], return_inverse=True)
+        prices = np.full(len(served), np.inf)
+        durations = np.full(len(served), np.iinfo(np.int64).max)
+        np.minimum.at(prices, index, catalogue.price[rows])
+        np.minimum.at(durations, index, catalogue.duration[rows])
+        self._routes[airport] = {int(to): (float(price), int(duration))
+                                 for to, price, duration in zip(served, prices, durations)}
+        for to in self._routes[airport]:
+            self._into.setdefault(to, set()).add(airport)
+
+    def _index_route(self, airport: int, to: int):
+        catalogue = self.catalogue
+        departures = self._departures.get(airport)
+        rows = departures.rows if departures is not None else _EMPTY
+        rows = rows[catalogue.arrival_airport[rows] == to]
+        routes = self._routes.setdefault(airport, {})
+        if len(rows):
+            routes[to] = (float(catalogue.price[rows].min()), int(catalogue.duration[rows].min()))
+            self._into.setdefault(to, set()).add(airport)
+        else:
+            routes.pop(to, None)
+            self._into.get(to, set()).discard(airport)
+
+    def update(self, row: int):
+        """Re-file one flight after its status or times changed."""
+        catalogue = self.catalogue
+        airport = int(catalogue.departure_airport[row])
+        departures = self._departures.get(airport)
+        rows = departures.rows[departures.rows != row] if departures is not None else _EMPTY
+        if not self._cancelled(np.array([row]))[0]:
+            # Among flights leaving at the same time, in row order, as a
+            # fresh build sorts them
+            times = catalogue.departure[rows]
+            low, high = (np.searchsorted(times, catalogue.departure[row], side=side) for side in ("left", "right"))
+            rows = np.insert(rows, low + np.searchsorted(rows[low:high], row), row)
+        if len(rows):
+            self._departures[airport] = _Departures(rows, catalogue.departure)
+        else:
+            self._departures.pop(airport, None)
+        self._index_route(airport, int(catalogue.arrival_airport[row]))
+
+    def airports_for(self, place: str) -> Set[int]:
+        # A place is an airport code or every airport of a city
+        catalogue = self.catalogue
+        airports = set(catalogue.airports.codes_for(place))
+        for city in catalogue.cities.codes_for(place):
+            airports |= self._city_airports.get(city, set())
+        return airports
+
+    def search(self, origin: str, destination: str, departure_date: Optional[str] = None,
+               max_stops: int = 2, passengers: Optional[int] = 1, travel_class: Optional[str] = None,
+               max_price: Optional[float] = None, sort_by: str = "price", limit: int = 10,
+               min_connection: int = 0, max_expansions: int = 5000) -> List[Itinerary]:
+        """The ``limit`` best itineraries by total price or total travel time.
+
+        The first leg departs on ``departure_date`` (any day when None); each
+        connection allows at least the airport's minimum connection time, or
+        ``min_connection`` seconds when that is longer.
+        """
+        catalogue = self.catalogue
+        targets = self.airports_for(destination)
+        origins = self.airports_for(origin) - targets
+        if not origins or not targets:
+            return []
+        by_price = sort_by != "duration"
+        max_legs = max_stops + 1
+        airport_count = len(catalogue.airports)
+
+        # Walking back from the destination one leg at a time: the airports
+        # it can be reached from within k legs (where a leg may land with k
+        # legs left after it), and the least the rest of an itinerary costs
+        # from each of them (fare, or flight time plus connection times)
+        connection = np.maximum(self.min_connection, min_connection)
+        is_target = np.zeros(airport_count, dtype=bool)
+        is_target[list(targets)] = True
+        landing = {0: is_target}
+        least: Dict[int, float] = dict.fromkeys(targets, 0.0)
+        frontier = targets
+        for legs in range(1, max_legs):
+            reached: Dict[int, float] = {}
+            for to in frontier:
+                for airport in self._into.get(to, ()):
+                    if is_target[airport]:
+                        continue
+                    price, duration = self._routes[airport][to]
+                    cost = (price if by_price else duration + connection[airport]) + least[to]
+                    if cost < reached.get(airport, np.inf):
+                        reached[airport] = cost
+            for airport, cost in reached.items():
+                least[airport] = min(cost, least.get(airport, np.inf))
+            landing[legs] = landing[legs - 1].copy()
+            landing[legs][list(reached)] = True
+            frontier = reached
+        bound = np.zeros(airport_count)
+        bound[list(least)] = list(least.values())
+
+        class_bit = catalogue.classes.column_bit(travel_class) if travel_class else None
+        if travel_class and not class_bit:
+            return []
+        # One entry per batch of next legs (the legs that can follow one
+        # partial itinerary, sorted by key): its best leg not taken yet.
+        # Later legs of a batch are only pushed once the one before is popped.
+        heap: List[tuple] = []
+        sequence = 0
+
+        def enqueue(batch: tuple, index: int):
+            nonlocal sequence
+            sequence += 1
+            heapq.heappush(heap, (batch[0][index].item(), batch[1][index].item(), sequence, batch, index))
+
+        def push(rows: np.ndarray, legs: Tuple[int, ...], price: float, first_departure: Optional[int]):
+            to = catalogue.arrival_airport[rows]
+            keep = landing.get(max_legs - len(legs) - 1, None)
+            keep = keep[to] if keep is not None else np.ones(len(rows), dtype=bool)
+            for visited in legs:
+                keep &= to != catalogue.departure_airport[visited]
+            if passengers:
+                keep &= catalogue.seats[rows] >= passengers
+            if class_bit is not None:
+                keep &= (catalogue.class_mask[rows] & class_bit) != 0
+            rows, to = rows[keep], to[keep]
+            prices = price + catalogue.price[rows]
+            if max_price:
+                keep = prices + (bound[to] if by_price else 0) <= max_price
+                rows, to, prices = rows[keep], to[keep], prices[keep]
+            if not len(rows):
+                return
+            arrivals = catalogue.arrival[rows]
+            starts = catalogue.departure[rows] if first_departure is None else np.full(len(rows), first_departure)
+            elapsed = arrivals - starts
+            first, second = (prices + bound[to], elapsed) if by_price else (elapsed + bound[to], prices)
+            order = np.lexsort((second, first))
+            enqueue((first[order], second[order], rows[order], prices[order], starts[order],
+                     arrivals[order], to[order], legs), 0)
+
+        date_codes = catalogue.dates.codes_for(departure_date[:10]) if departure_date else None
+        for airport in origins:
+            departures = self._departures.get(airport)
+            if departures is None:
+                continue
+            rows = departures.rows
+            if date_codes is not None:
+                rows = rows[np.isin(catalogue.departure_date[rows], date_codes)]
+            push(rows, (), 0.0, None)
+
+        results: List[Itinerary] = []
+        expansions = 0
+        while heap and len(results) < limit:
+            _, _, _, batch, index = heapq.heappop(heap)
+            if index + 1 < len(batch[2]):
+                enqueue(batch, index + 1)
+            legs = batch[7] + (batch[2][index].item(),)
+            price, start, arrival, airport = (batch[3][index].item(), batch[4][index].item(),
+                                              batch[5][index].item(), batch[6][index].item())
+            if is_target[airport]:
+                results.append(Itinerary(legs, price, start, arrival))
+                continue
+            if len(legs) >= max_legs or expansions >= max_expansions:
+                continue
+            expansions += 1
+            departures = self._departures.get(airport)
+            if departures is None:
+                continue
+            earliest = arrival + int(connection[airport])
+            low = np.searchsorted(departures.times, earliest, side="left")
+            high = np.searchsorted(departures.times, arrival + self.max_layover, side="right")
+            push(departures.rows[low:high], legs, price, start)
+        return results
+
+    def records(self, itineraries: Iterable[Itinerary]) -> List[Dict[str, Any]]:
+        return [itinerary.record(self.catalogue) for itinerary in itineraries]
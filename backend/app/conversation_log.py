@@ -0,0 +1,139 @@
+# backend/app/conversation_log.py
+"""Write-behind persistence for chat conversation records.
+
+The chat handlers only enqueue a record; a background task drains the queue
+into Firestore ``WriteBatch`` commits of up to ``batch_size`` documents,
+flushing when a batch is full or ``flush_interval`` seconds after its first
+record. The queue is bounded: when Firestore falls behind, new records are
+dropped (and counted) rather than holding memory or slowing chat down.
+Whatever is queued at shutdown is flushed before the app exits.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+# Firestore's limit on writes per batch
+MAX_BATCH_SIZE = 500
+
+
+class ConversationLog:
+    def __init__(self, max_queue: int = 10000, batch_size: int = MAX_BATCH_SIZE,
+                 flush_interval: float = 1.0, shutdown_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.repository = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Records taken off the queue but not yet handed to a commit, and
+        # the commit in progress; both survive the drain task being cancelled
+        self._batch: List[Dict[str, Any]] = []
+        self._commit: Optional[asyncio.Future] = None
+        self._full = asyncio.Event()
+        self._closing = False
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_commit_seconds = 0.0
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        """Queue ``record`` for writing; False if it was dropped."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+        return True
+
+    async def _fill_batch(self):
+        # Block for the first record, then wait until a batch's worth is
+        # queued or the flush deadline passes
+        self._batch.append(await self._queue.get())
+        if self._queue.qsize() + 1 < self.batch_size:
+            self._full.clear()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+        while len(self._batch) < self.batch_size and not self._queue.empty():
+            self._batch.append(self._queue.get_nowait())
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        start = time.monotonic()
+        try:
+            await self.repository.add_conversations(batch)
+            self.written += len(batch)
+            self.batches += 1
+            self.last_batch_size = len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Error storing {len(batch)} conversations: {e}")
+        self.last_commit_seconds = time.monotonic() - start
+
+    async def _run(self):
+        while not self._closing:
+            await self._fill_batch()
+            batch, self._batch = self._batch, []
+            # Shielded so stop() can't cancel a commit halfway
+            self._commit = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._commit)
+            self._commit = None
+
+    def start(self, repository):
+        self.repository = repository
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._full = asyncio.Event()
+            self._closing = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self):
+        """Write everything queued so far (used at shutdown)."""
+        if self._commit is not None:
+            await self._commit
+            self._commit = None
+        while self._batch or (self._queue is not None and not self._queue.empty()):
+            batch, self._batch = self._batch, []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # The flag covers a cancel that lands while wait_for is completing
+        self._closing = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            print(f"Gave up flushing {self._queue.qsize()} conversations at shutdown")
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_commit_seconds": self.last_commit_seconds,
+        }
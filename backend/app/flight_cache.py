@@ -0,0 +1,100 @@
+# backend/app/flight_cache.py
+"""Short-lived per-flight cache in front of Firestore flight reads.
+
+A results screen or a bookings list asks for the same handful of flights
+from many clients at once. Each flight document is kept for ``ttl``
+seconds, and concurrent misses for the same id share one read
+(single-flight): the first request starts the load, later ones await it.
+Misses of one ``get_many()`` call are loaded together in one batch.
+
+``invalidate()`` drops a flight, including a load already in flight, whose
+result is then returned to its waiters but not cached. It only reaches
+this worker's cache; other workers see a change once their entry expires,
+so ``ttl`` bounds how stale a flight status can be.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# ids -> {id: flight document} for the ids that exist
+Loader = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+class FlightCache:
+    def __init__(self, ttl: float = 5.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # id -> (document or None when it doesn't exist, expiry)
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.enabled = True
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    async def get(self, flight_id: str, load: Loader) -> Optional[Dict[str, Any]]:
+        return (await self.get_many([flight_id], load)).get(flight_id)
+
+    async def get_many(self, flight_ids: List[str], load: Loader) -> Dict[str, Dict[str, Any]]:
+        """The flights that exist, by id; each a copy the caller may modify."""
+        if not self.enabled:
+            return await load(list(dict.fromkeys(flight_ids)))
+        now = time.monotonic()
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        waiting: Dict[str, asyncio.Task] = {}
+        missing = []
+        for flight_id in dict.fromkeys(flight_ids):
+            entry = self._entries.get(flight_id)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                found[flight_id] = entry[0]
+            elif flight_id in self._loading:
+                self.coalesced += 1
+                waiting[flight_id] = self._loading[flight_id]
+            else:
+                self.misses += 1
+                missing.append(flight_id)
+
+        if missing:
+            # A task of its own, so a caller going away doesn't cancel the
+            # load the others are waiting on
+            task = asyncio.ensure_future(load(missing))
+            for flight_id in missing:
+                self._loading[flight_id] = waiting[flight_id] = task
+            task.add_done_callback(lambda done: self._loaded(missing, done))
+
+        for flight_id, task in waiting.items():
+            found[flight_id] = (await asyncio.shield(task)).get(flight_id)
+        return {flight_id: dict(data) for flight_id, data in found.items() if data is not None}
+
+    def _loaded(self, flight_ids: List[str], task: asyncio.Task):
+        docs = None if task.cancelled() or task.exception() is not None else task.result()
+        expires = time.monotonic() + self.ttl
+        for flight_id in flight_ids:
+            # Not ours any more if it was invalidated while loading
+            if self._loading.get(flight_id) is not task:
+                continue
+            del self._loading[flight_id]
+            if docs is not None:
+                self._entries[flight_id] = (docs.get(flight_id), expires)
+                self._entries.move_to_end(flight_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, flight_id: str):
+        self.invalidations += 1
+        self._entries.pop(flight_id, None)
+        self._loading.pop(flight_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "loading": len(self._loading),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,291 @@
+# backend/app/flight_catalogue.py
+"""Columnar, NumPy-backed flight catalogue.
+
+One Pydantic object per flight costs a few kilobytes; at hundreds of
+thousands of flights that dominates the worker's memory and every filter is
+a Python loop. Here each field is a column instead:
+
+* prices, seats and epoch times are NumPy arrays
+* cities, airports, airlines and statuses are dictionary-encoded int codes
+* travel classes and amenities are bitmasks for filtering, plus a code for
+  each distinct list so records keep the order the source document had
+* the remaining per-flight strings (id, flight number, gate, ...) stay in
+  object arrays
+
+Filters are boolean masks, sorts are argsorts, and ``FlightModel`` objects
+are only built for the rows a response actually returns. The columns are
+built a field at a time (timestamps parsed by NumPy, each distinct value
+encoded once) rather than a row at a time.
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def parse_epoch(timestamp: Optional[str]) -> int:
+    if not timestamp:
+        return 0
+    moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def format_epoch(epoch: int) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime(_TIME_FORMAT)
+
+
+def parse_epochs(timestamps: List[str]) -> Tuple[np.ndarray, Dict[int, str]]:
+    """Epoch seconds of each timestamp, and {position: timestamp} for those
+    not written the way ``format_epoch`` writes them."""
+    text = np.array(timestamps, dtype=str)
+    epochs = np.zeros(len(text), dtype=np.int64)
+    # YYYY-MM-DDTHH:MM:SSZ in bulk; anything else (offsets, fractions, bad
+    # dates) goes through parse_epoch one by one
+    exact = (np.char.str_len(text) == 20) & (np.char.endswith(text, "Z"))
+    try:
+        moments = text[exact].astype("U19").astype("datetime64[s]")
+    except ValueError:
+        exact[:] = False
+    else:
+        epochs[exact] = moments.astype(np.int64)
+        exact[exact] = np.char.add(np.datetime_as_string(moments, unit="s"), "Z") == text[exact]
+    others = {}
+    for position in np.flatnonzero(~exact).tolist():
+        epochs[position] = epoch = parse_epoch(timestamps[position])
+        if timestamps[position] != format_epoch(epoch):
+            others[position] = timestamps[position]
+    return epochs, others
+
+
+class Dictionary:
+    """Dictionary encoding: each distinct value is stored once, rows hold codes.
+
+    ``normalize`` (e.g. ``str.lower``) defines which values a lookup treats as
+    equal; the original spelling is kept for output.
+    """
+
+    def __init__(self, normalize=None):
+        self.values: List[Any] = []
+        self._codes: Dict[Any, int] = {}
+        self._normalize = normalize
+        self._normalized: Dict[Any, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            key = self._normalize(value) if self._normalize else value
+            self._normalized.setdefault(key, []).append(code)
+        return code
+
+    def encode_all(self, values: List, dtype=np.int32) -> np.ndarray:
+        """Codes of many values, each distinct one encoded once."""
+        for value in dict.fromkeys(values):
+            self.encode(value)
+        return np.fromiter(map(self._codes.__getitem__, values), dtype=dtype, count=len(values))
+
+    def codes_for(self, value) -> List[int]:
+        key = self._normalize(value) if self._normalize else value
+        return self._normalized.get(key, [])
+
+
+class BitSet:
+    """Maps list-valued fields (classes, amenities) onto bits of an int."""
+
+    def __init__(self):
+        self.names = Dictionary(normalize=str.lower)
+
+    def encode(self, values: Iterable[str]) -> int:
+        mask = 0
+        for value in values:
+            mask |= 1 << self.names.encode(value)
+        return mask
+
+    def bit(self, value: str) -> int:
+        # Case-insensitive lookup, 0 when the value never occurs
+        mask = 0
+        for code in self.names.codes_for(value):
+            mask |= 1 << code
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        return [name for code, name in enumerate(self.names.values) if mask >> code & 1]
+
+    @property
+    def wide(self) -> bool:
+        # Past 64 names the masks no longer fit a uint64
+        return len(self.names.values) > 64
+
+    def column(self, masks: List[int]) -> np.ndarray:
+        """Masks as uint64, or as Python ints (slower) when they don't fit."""
+        return np.array(masks, dtype=object if self.wide else np.uint64)
+
+    def column_bit(self, value: str):
+        """``bit(value)`` typed to AND with a ``column()`` array."""
+        bit = self.bit(value)
+        return bit if self.wide else np.uint64(bit)
+
+
+class ColumnarFlightCatalogue:
+    def __init__(self, records: Iterable = ()):
+        """``records`` are flight dicts or ``FlightModel`` objects."""
+        self.cities = Dictionary(normalize=str.lower)
+        self.airports = Dictionary(normalize=str.upper)
+        self.airlines = Dictionary()
+        self.statuses = Dictionary()
+        # Calendar day as written in departureTime, for the date filter
+        self.dates = Dictionary()
+        self.classes = BitSet()
+        self.amenities = BitSet()
+        # Distinct travelClasses/amenities lists, as written
+        self.class_lists = Dictionary()
+        self.amenity_lists = Dictionary()
+        # departure/arrival strings that don't round-trip through epoch seconds
+        self._time_overrides: Dict[int, Dict[str, str]] = {}
+
+        records = list(records)
+        if all(isinstance(record, dict) for record in records):
+            def column(name, default=None):
+                return [record.get(name, default) for record in records]
+        else:
+            # FlightModel objects: read the attributes, no dict per flight
+            def column(name, default=None):
+                return [record.get(name, default) if isinstance(record, dict) else getattr(record, name, default)
+                        for record in records]
+
+        self.ids = np.array(column("id"), dtype=object)
+        self.flight_numbers = np.array(column("flightNumber"), dtype=object)
+        self.gates = np.array(column("gate"), dtype=object)
+        self.terminals = np.array(column("terminal"), dtype=object)
+        self.last_updated = np.array(column("lastUpdated"), dtype=object)
+        self.logos = np.array(column("logo"), dtype=object)
+        self.price = np.array(column("price"), dtype=np.float64)
+        self.seats = np.array(column("availableSeats"), dtype=np.int32)
+        departure_times, arrival_times = column("departureTime"), column("arrivalTime")
+        self.departure, departure_overrides = parse_epochs(departure_times)
+        self.arrival, arrival_overrides = parse_epochs(arrival_times)
+        self.departure_date = self.dates.encode_all([time[:10] for time in departure_times])
+        for field, overrides in (("departureTime", departure_overrides), ("arrivalTime", arrival_overrides)):
+            for row, value in overrides.items():
+                self._time_overrides.setdefault(row, {})[field] = value
+        self.duration = self.arrival - self.departure
+        self.departure_city = self.cities.encode_all(column("departureCity"))
+        self.arrival_city = self.cities.encode_all(column("arrivalCity"))
+        self.departure_airport = self.airports.encode_all(column("departureAirport"))
+        self.arrival_airport = self.airports.encode_all(column("arrivalAirport"))
+        self.airline = self.airlines.encode_all(column("airlineName"), np.int16)
+        self.status = self.statuses.encode_all(column("status"), np.int16)
+        self.class_list = self.class_lists.encode_all([tuple(value) for value in column("travelClasses")])
+        self.amenity_list = self.amenity_lists.encode_all([tuple(value) for value in column("amenities")])
+        # Masks per distinct list, then per row
+        class_masks = [self.classes.encode(value) for value in self.class_lists.values]
+        amenity_masks = [self.amenities.encode(value) for value in self.amenity_lists.values]
+        self.class_mask = self.classes.column(class_masks)[self.class_list]
+        self.amenity_mask = self.amenities.column(amenity_masks)[self.amenity_list]
+        self.non_stop = np.array(column("isNonStop", True), dtype=bool)
+        # Position of each id in sorted-id order, the sort tie-breaker
+        self.id_rank = np.empty(len(self.ids), dtype=np.int64)
+        self.id_rank[np.argsort(self.ids.astype(str), kind="stable")] = np.arange(len(self.ids))
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def retime(self, row: int, departure_time: str, arrival_time: str):
+        """Give one flight new departure/arrival times."""
+        departure, arrival = parse_epoch(departure_time), parse_epoch(arrival_time)
+        self.departure[row], self.arrival[row] = departure, arrival
+        self.duration[row] = arrival - departure
+        self.departure_date[row] = self.dates.encode(departure_time[:10])
+        overrides = {
+            field: value
+            for field, value, epoch in (("departureTime", departure_time, departure),
+                                        ("arrivalTime", arrival_time, arrival))
+            if value != format_epoch(epoch)
+        }
+        if overrides:
+            self._time_overrides[int(row)] = overrides
+        else:
+            self._time_overrides.pop(int(row), None)
+
+    @classmethod
+    def from_models(cls, flights: Iterable) -> "ColumnarFlightCatalogue":
+        # Records may be dicts or models; kept for callers holding models
+        return cls(flights)
+
+    # Vectorized filters
+
+    def filter_rows(self, rows: Optional[np.ndarray] = None, max_price: Optional[float] = None,
+                    min_seats: Optional[int] = None, travel_class: Optional[str] = None) -> np.ndarray:
+        """Apply the numeric/bitmask filters to ``rows`` (all rows if None)."""
+        if rows is None:
+            rows = np.arange(len(self), dtype=np.int64)
+        keep = np.ones(len(rows), dtype=bool)
+        if max_price:
+            keep &= self.price[rows] <= max_price
+        if min_seats:
+            keep &= self.seats[rows] >= min_seats
+        if travel_class:
+            bit = self.classes.column_bit(travel_class)
+            keep &= (self.class_mask[rows] & bit) != 0
+        return rows[keep]
+
+    def sort_rows(self, rows: np.ndarray, by: str = "departure") -> np.ndarray:
+        """Order rows by price, duration or departure time, ties broken by id."""
+        # lexsort sorts by the last key first
+        order = np.lexsort((self.id_rank[rows], self._sort_column(by)[rows]))
+        return rows[order]
+
+    def sort_key(self, row: int, by: str = "departure") -> tuple:
+        return (self._sort_column(by)[row].item(), self.ids[row])
+
+    def _sort_column(self, by: str) -> np.ndarray:
+        return {"price": self.price, "duration": self.duration}.get(by, self.departure)
+
+    # Materialization
+
+    def record(self, row: int) -> Dict[str, Any]:
+        record = {
+            "id": self.ids[row],
+            "airlineName": self.airlines.values[self.airline[row]],
+            "flightNumber": self.flight_numbers[row],
+            "departureCity": self.cities.values[self.departure_city[row]],
+            "arrivalCity": self.cities.values[self.arrival_city[row]],
+            "departureAirport": self.airports.values[self.departure_airport[row]],
+            "arrivalAirport": self.airports.values[self.arrival_airport[row]],
+            "departureTime": format_epoch(self.departure[row]),
+            "arrivalTime": format_epoch(self.arrival[row]),
+            "price": float(self.price[row]),
+            "availableSeats": int(self.seats[row]),
+            "travelClasses": list(self.class_lists.values[self.class_list[row]]),
+            "amenities": list(self.amenity_lists.values[self.amenity_list[row]]),
+            "status": self.statuses.values[self.status[row]],
+            "gate": self.gates[row],
+            "terminal": self.terminals[row],
+            "lastUpdated": self.last_updated[row],
+            "logo": self.logos[row],
+            "isNonStop": bool(self.non_stop[row]),
+        }
+        record.update(self._time_overrides.get(int(row), {}))
+        return record
+
+    def materialize(self, rows: Iterable[int], model) -> List:
+        return [model(**self.record(row)) for row in rows]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns, including object cells."""
+        total = 0
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                total += value.nbytes
+                if value.dtype == object:
+                    total += sum(sys.getsizeof(cell) for cell in value if cell is not None)
+        return total
@@ -0,0 +1,210 @@
+# backend/app/flight_search.py
+"""In-memory indexed flight search behind /flights/search.
+
+The catalogue is loaded once into a ``ColumnarFlightCatalogue`` plus a
+handful of indexes, so a search is a few dict lookups and sorted-array
+intersections instead of a linear scan per filter:
+
+* hash indexes on departure/arrival city (case-insensitive) and airport code
+* a hash index on the departure date (``YYYY-MM-DD`` prefix of departureTime)
+* a price-sorted row array, range-queried with ``searchsorted``
+* a time-expanded route graph for connecting itineraries (app/connections.py)
+
+Each index maps a key to a sorted array of catalogue rows. Equality
+candidates are intersected smallest-first; price, seat and class checks then
+run as vectorized masks on the survivors. Only the page being returned is
+turned back into records.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.connections import ConnectionGraph
+from app.flight_catalogue import ColumnarFlightCatalogue
+from app.pagination import keyset_page
+
+SORT_FIELDS = ("departure", "price", "duration")
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def _group(codes: np.ndarray) -> Dict[int, np.ndarray]:
+    """code -> ascending rows holding that code."""
+    order = np.argsort(codes, kind="stable")
+    values, starts = np.unique(codes[order], return_index=True)
+    bounds = list(starts[1:]) + [len(order)]
+    return {int(value): order[start:end] for value, start, end in zip(values, starts, bounds)}
+
+
+def _move(index: Dict[int, np.ndarray], old: int, new: int, row: int):
+    # Re-file one row under another code, keeping the rows ascending
+    if old == new:
+        return
+    rows = index.get(old)
+    if rows is not None:
+        index[old] = rows[rows != row]
+    rows = index.get(new, _EMPTY)
+    index[new] = np.insert(rows, np.searchsorted(rows, row), row)
+
+
+class SearchResult:
+    """Matching catalogue rows, already in ``sort_by`` order."""
+
+    def __init__(self, catalogue: ColumnarFlightCatalogue, rows: np.ndarray, sort_by: str):
+        self.catalogue = catalogue
+        self.rows = rows
+        self.sort_by = sort_by
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def key(self, row: int) -> tuple:
+        return self.catalogue.sort_key(row, self.sort_by)
+
+    def page(self, limit: int, offset: int = 0,
+             after: Optional[Sequence] = None) -> Tuple[np.ndarray, Optional[tuple]]:
+        """Rows of one page (keyset when ``after`` is set) and the next-page key."""
+        if after is not None:
+            return keyset_page(self.rows, self.key, after, limit)
+        rows = self.rows[offset:offset + limit]
+        more = offset + limit < len(self.rows)
+        return rows, (self.key(rows[-1]) if len(rows) and more else None)
+
+    def materialize(self, rows: Iterable[int], model) -> List:
+        return self.catalogue.materialize(rows, model)
+
+    def records(self, rows: Iterable[int]) -> List[Dict]:
+        # Plain dicts in model field order, for serializing without models
+        return [self.catalogue.record(row) for row in rows]
+
+
+class FlightSearchEngine:
+    def __init__(self, flights: Iterable = (), **connection_rules):
+        # Minimum connection times and max layover, see ConnectionGraph
+        self.connection_rules = connection_rules
+        self.load(flights)
+
+    def __len__(self) -> int:
+        return len(self.catalogue)
+
+    def __contains__(self, flight_id: str) -> bool:
+        return flight_id in self._rows_by_id
+
+    def load(self, flights: Iterable):
+        """Replace the catalogue and rebuild every index."""
+        self.catalogue = catalogue = ColumnarFlightCatalogue.from_models(flights)
+        self._by_departure_city = _group(catalogue.departure_city)
+        self._by_arrival_city = _group(catalogue.arrival_city)
+        self._by_departure_airport = _group(catalogue.departure_airport)
+        self._by_arrival_airport = _group(catalogue.arrival_airport)
+        self._by_date = _group(catalogue.departure_date)
+        self._price_rows = np.argsort(catalogue.price, kind="stable")
+        self._prices = catalogue.price[self._price_rows]
+        self._rows_by_id = {flight_id: row for row, flight_id in enumerate(catalogue.ids)}
+        self.connections = ConnectionGraph(catalogue, **self.connection_rules)
+
+    def update_seats(self, seats: Dict[str, int]):
+        """Overwrite the seats left on the given flights (unknown ids are ignored)."""
+        for flight_id, count in seats.items():
+            row = self._rows_by_id.get(flight_id)
+            if row is not None:
+                self.catalogue.seats[row] = count
+
+    def update_status(self, flight_id: str, fields: Dict[str, Optional[str]]):
+        """Apply a status/gate/terminal/lastUpdated or departure/arrival time
+        change to one flight.
+
+        Flights added after ``load()`` are not picked up (unknown ids are
+        ignored), only by the next load.
+        """
+        row = self._rows_by_id.get(flight_id)
+        if row is None:
+            return
+        catalogue = self.catalogue
+        if "status" in fields:
+            catalogue.status[row] = catalogue.statuses.encode(fields["status"])
+        for field, column in (("gate", catalogue.gates), ("terminal", catalogue.terminals),
+                              ("lastUpdated", catalogue.last_updated)):
+            if field in fields:
+                column[row] = fields[field]
+        retimed = False
+        if fields.get("departureTime") or fields.get("arrivalTime"):
+            record = catalogue.record(row)
+            times = (fields.get("departureTime") or record["departureTime"],
+                     fields.get("arrivalTime") or record["arrivalTime"])
+            if times != (record["departureTime"], record["arrivalTime"]):
+                date = int(catalogue.departure_date[row])
+                catalogue.retime(row, *times)
+                _move(self._by_date, date, int(catalogue.departure_date[row]), row)
+                retimed = True
+        if "status" in fields or retimed:
+            # A cancelled flight can't be part of a connection any more, and
+            # a retimed one connects with other flights
+            self.connections.update(row)
+
+    def _lookup(self, index: Dict[int, np.ndarray], codes: List[int]) -> np.ndarray:
+        arrays = [index[code] for code in codes if code in index]
+        if not arrays:
+            return _EMPTY
+        return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+    def _place(self, value: str, by_city, by_airport) -> np.ndarray:
+        # A place matches either a city name or an airport code
+        catalogue = self.catalogue
+        cities = self._lookup(by_city, catalogue.cities.codes_for(value))
+        airports = self._lookup(by_airport, catalogue.airports.codes_for(value))
+        if not len(airports):
+            return cities
+        return np.union1d(cities, airports)
+
+    def _candidates(self, departure: Optional[str], arrival: Optional[str],
+                    departure_date: Optional[str]) -> Optional[np.ndarray]:
+        arrays = []
+        if departure:
+            arrays.append(self._place(departure, self._by_departure_city, self._by_departure_airport))
+        if arrival:
+            arrays.append(self._place(arrival, self._by_arrival_city, self._by_arrival_airport))
+        if departure_date:
+            arrays.append(self._lookup(self._by_date, self.catalogue.dates.codes_for(departure_date[:10])))
+        if not arrays:
+            return None
+        # Intersect starting from the most selective index
+        arrays.sort(key=len)
+        result = arrays[0]
+        for other in arrays[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def _match(self, departure, arrival, departure_date, travel_class,
+               max_price, passengers) -> np.ndarray:
+        candidates = self._candidates(departure, arrival, departure_date)
+        price_filter = max_price
+        if max_price:
+            cutoff = np.searchsorted(self._prices, max_price, side="right")
+            if candidates is None or cutoff < len(candidates):
+                # The price range is the smallest candidate list
+                price_rows = self._price_rows[:cutoff]
+                if candidates is not None:
+                    price_rows = price_rows[np.isin(price_rows, candidates, assume_unique=True)]
+                candidates, price_filter = price_rows, None
+        return self.catalogue.filter_rows(candidates, max_price=price_filter,
+                                          min_seats=passengers, travel_class=travel_class)
+
+    def search(self, params) -> SearchResult:
+        """All flights matching ``FlightSearchParams``, ordered by ``sort_by``.
+
+        With a ``return_date`` and both cities, the return legs (arrival city
+        back to departure city on that date) are included as well.
+        """
+        rows = self._match(params.departure_city, params.arrival_city, params.departure_date,
+                           params.travel_class, params.max_price, params.passengers)
+
+        if params.return_date and params.departure_city and params.arrival_city:
+            return_rows = self._match(params.arrival_city, params.departure_city, params.return_date,
+                                      params.travel_class, params.max_price, params.passengers)
+            rows = np.concatenate([rows, return_rows])
+
+        sort_by = getattr(params, "sort_by", None) or "departure"
+        return SearchResult(self.catalogue, self.catalogue.sort_rows(rows, sort_by), sort_by)
@@ -0,0 +1,262 @@
+# backend/app/flight_updates.py
+"""Live flight status for /ws/flights subscribers.
+
+Polling GET /flights/{flight_id} costs a Firestore read per client per
+poll. Here each watched flight has one Firestore snapshot listener, shared
+by every connection subscribed to it and reference-counted: the first
+subscriber starts it, and it is stopped ``linger`` seconds after the last
+one leaves (so a reconnecting client doesn't restart it).
+
+Only the status fields in ``FIELDS`` are tracked. A new subscriber gets
+them all once (``"snapshot"``); after that, a change to the document is
+compared with the last state and only the fields that changed are sent
+(``"update"``), serialized once for all subscribers. Writes that touch
+none of these fields (e.g. seat counts) send nothing.
+
+Only flights ``known`` to the caller (the search catalogue) can be
+watched, and at most ``max_listeners`` listeners run at once; a listener
+lingering without subscribers is stopped early to make room.
+
+Each connection has its own send task and pending messages, so a slow
+client never holds up the others. Pending messages are kept per flight,
+and a new change to a flight whose previous message is still waiting is
+merged into it. The backlog is therefore bounded by the number of flights
+the connection watches. A client that doesn't take a message within
+``send_timeout`` seconds is disconnected.
+
+Messages, as JSON text:
+    client:  {"action": "subscribe" | "unsubscribe", "flight_ids": [...]}
+    server:  {"type": "snapshot" | "update", "flight_id": ..., "data": {...}}
+             ("data" is null for a flight that doesn't exist)
+             {"type": "error", "detail": ...}
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.responses import dumps
+
+FIELDS = ("status", "gate", "terminal", "lastUpdated", "departureTime", "arrivalTime")
+
+_UNKNOWN = object()
+
+
+class SubscriptionError(Exception):
+    pass
+
+
+class TooManySubscriptionsError(SubscriptionError):
+    pass
+
+
+class Subscriber:
+    """One connection: the flights it watches and the messages it hasn't been sent yet."""
+
+    def __init__(self, send: Callable[[bytes], Awaitable[None]], close: Callable[[], Awaitable[None]]):
+        self.send = send
+        self.close = close
+        self.flights: Set[str] = set()
+        # key (flight id, or the error) -> (type, data, serialized message or None)
+        self.pending: "OrderedDict[str, Tuple[str, Any, Optional[bytes]]]" = OrderedDict()
+        self.sending: Optional[asyncio.Task] = None
+
+
+class _Watch:
+    __slots__ = ("handle", "subscribers", "state", "snapshot", "release")
+
+    def __init__(self):
+        self.handle = None
+        self.subscribers: Set[Subscriber] = set()
+        self.state: Any = _UNKNOWN  # tracked fields, None if the flight doesn't exist
+        self.snapshot: Optional[bytes] = None  # serialized snapshot message
+        self.release: Optional[asyncio.TimerHandle] = None
+
+
+class FlightUpdates:
+    def __init__(self, max_flights_per_connection: int = 50, send_timeout: float = 10.0,
+                 linger: float = 30.0, max_listeners: int = 10000,
+                 known: Optional[Callable[[str], bool]] = None,
+                 on_change: Optional[Callable[[str, Optional[Dict[str, Any]]], None]] = None):
+        self.max_flights_per_connection = max_flights_per_connection
+        self.max_listeners = max_listeners
+        # Whether a flight id may be watched; any id when None
+        self.known = known
+        self.send_timeout = send_timeout
+        self.linger = linger
+        # Called with the flight id and the fields that changed (all tracked
+        # fields after a re-creation, None after a delete) whenever a watched
+        # flight changes
+        self.on_change = on_change
+        self.repository = None
+        self._watches: Dict[str, _Watch] = {}
+        self._subscribers: Set[Subscriber] = set()
+
+        self.updates = 0
+        self.unchanged = 0
+        self.messages = 0
+        self.merged = 0
+        self.slow_disconnects = 0
+        self.listeners_started = 0
+
+    def start(self, repository):
+        self.repository = repository
+
+    async def stop(self):
+        for subscriber in list(self._subscribers):
+            self.disconnect(subscriber)
+        for flight_id, watch in list(self._watches.items()):
+            self._release(flight_id, watch)
+
+    # Connections
+
+    def connect(self, send: Callable[[bytes], Awaitable[None]],
+                close: Callable[[], Awaitable[None]]) -> Subscriber:
+        subscriber = Subscriber(send, close)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        for flight_id in list(subscriber.flights):
+            self.unsubscribe(subscriber, flight_id)
+        if subscriber.sending is not None:
+            subscriber.sending.cancel()
+        self._subscribers.discard(subscriber)
+
+    def subscribe(self, subscriber: Subscriber, flight_id: str):
+        if flight_id in subscriber.flights:
+            return
+        if "/" in flight_id or (self.known is not None and not self.known(flight_id)):
+            raise SubscriptionError(f"Unknown flight {flight_id[:64]}")
+        if len(subscriber.flights) >= self.max_flights_per_connection:
+            raise TooManySubscriptionsError(
+                f"At most {self.max_flights_per_connection} flights per connection")
+        watch = self._watches.get(flight_id)
+        if watch is None:
+            if len(self._watches) >= self.max_listeners:
+                idle = next((item for item in self._watches.items() if not item[1].subscribers), None)
+                if idle is None:
+                    raise TooManySubscriptionsError("Too many flights are being watched, try again later")
+                self._release(*idle)
+            watch = _Watch()
+            loop = asyncio.get_running_loop()
+            # Snapshots arrive on the Firestore watch thread. Registered only
+            # once the listener is running, so a failed start leaves nothing
+            watch.handle = self.repository.watch_flight(
+                flight_id, lambda data: loop.call_soon_threadsafe(self._changed, flight_id, watch, data))
+            self._watches[flight_id] = watch
+            self.listeners_started += 1
+        elif watch.release is not None:
+            watch.release.cancel()
+            watch.release = None
+        watch.subscribers.add(subscriber)
+        subscriber.flights.add(flight_id)
+        if watch.state is not _UNKNOWN:
+            if watch.snapshot is None:
+                watch.snapshot = dumps({"type": "snapshot", "flight_id": flight_id, "data": watch.state})
+            self._queue(subscriber, flight_id, "snapshot", watch.state, watch.snapshot)
+
+    def unsubscribe(self, subscriber: Subscriber, flight_id: str):
+        if flight_id not in subscriber.flights:
+            return
+        subscriber.flights.discard(flight_id)
+        subscriber.pending.pop(flight_id, None)
+        watch = self._watches[flight_id]
+        watch.subscribers.discard(subscriber)
+        if not watch.subscribers:
+            watch.release = asyncio.get_running_loop().call_later(
+                self.linger, self._release, flight_id, watch)
+
+    def error(self, subscriber: Subscriber, detail: str):
+        # Keyed by the text, so repeating an error doesn't grow the backlog;
+        # dropped once a client that isn't reading has a full backlog
+        if len(subscriber.pending) >= 2 * self.max_flights_per_connection:
+            return
+        self._queue(subscriber, f"error:{detail}", "error", detail, dumps({"type": "error", "detail": detail}))
+
+    # Listeners
+
+    def _release(self, flight_id: str, watch: _Watch):
+        if watch.subscribers or self._watches.get(flight_id) is not watch:
+            return
+        del self._watches[flight_id]
+        if watch.release is not None:
+            watch.release.cancel()
+        # Stopping a watch joins its thread, so not on the event loop
+        asyncio.get_running_loop().run_in_executor(None, watch.handle.unsubscribe)
+
+    def _changed(self, flight_id: str, watch: _Watch, data: Optional[Dict[str, Any]]):
+        if self._watches.get(flight_id) is not watch:
+            return  # Released meanwhile
+        state = None if data is None else {field: data.get(field) for field in FIELDS}
+        previous = watch.state
+        if state == previous:
+            self.unchanged += 1
+            return
+        watch.state = state
+        watch.snapshot = None
+        if previous is _UNKNOWN or previous is None or state is None:
+            kind, delta = "snapshot", state
+        else:
+            kind, delta = "update", {field: value for field, value in state.items() if previous[field] != value}
+        if previous is not _UNKNOWN:
+            self.updates += 1
+            if self.on_change is not None:
+                try:
+                    self.on_change(flight_id, delta)
+                except Exception as e:
+                    print(f"Error applying change to flight {flight_id}: {e}")
+        message = dumps({"type": kind, "flight_id": flight_id, "data": delta})
+        for subscriber in watch.subscribers:
+            self._queue(subscriber, flight_id, kind, delta, message)
+
+    # Sending
+
+    def _queue(self, subscriber: Subscriber, key: str, kind: str, data: Any, message: bytes):
+        pending = subscriber.pending.get(key)
+        if pending is not None and kind == "update":
+            # The client hasn't taken the last message for this flight yet:
+            # fold the change into it (a snapshot stays a snapshot)
+            self.merged += 1
+            kind, data, message = pending[0], {**(pending[1] or {}), **data}, None
+        elif pending is not None and kind == "snapshot":
+            # The full state replaces whatever was waiting
+            self.merged += 1
+        subscriber.pending[key] = (kind, data, message)
+        if subscriber.sending is None:
+            subscriber.sending = asyncio.get_running_loop().create_task(self._send(subscriber))
+
+    async def _send(self, subscriber: Subscriber):
+        try:
+            while subscriber.pending:
+                key, (kind, data, message) = subscriber.pending.popitem(last=False)
+                if message is None:
+                    message = dumps({"type": kind, "flight_id": key, "data": data})
+                await asyncio.wait_for(subscriber.send(message), self.send_timeout)
+                self.messages += 1
+        except asyncio.TimeoutError:
+            self.slow_disconnects += 1
+            subscriber.sending = None
+            self.disconnect(subscriber)
+            try:
+                await asyncio.wait_for(subscriber.close(), self.send_timeout)
+            except Exception:
+                pass
+        except Exception:
+            # The connection is gone; its handler cleans up
+            pass
+        finally:
+            subscriber.sending = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._subscribers),
+            "listeners": len(self._watches),
+            "max_listeners": self.max_listeners,
+            "subscriptions": sum(len(watch.subscribers) for watch in self._watches.values()),
+            "listeners_started": self.listeners_started,
+            "updates": self.updates,
+            "unchanged": self.unchanged,
+            "messages": self.messages,
+            "merged": self.merged,
+            "slow_disconnects": self.slow_disconnects,
+        }
@@ -0,0 +1,355 @@
+# backend/app/inventory.py
+"""Seat inventory: sharded seat counters, expiring holds, idempotent bookings.
+
+A flight's free seats live in ``shards`` counter documents rather than on
+the flight document, so concurrent bookings of a popular flight mostly
+commit to different documents instead of queueing on one (Firestore
+sustains roughly one write per second per document). Booking is two steps:
+
+1. ``hold()`` takes seats from one randomly picked shard (a second one on
+   contention) in a short transaction and records them in a hold document
+   that expires after ``hold_seconds``. Only when no single shard can serve
+   the request does it fall back to one transaction over all shards; when
+   this worker's counts say the flight is sold out, one plain read of the
+   shards, shared by every request asking at that moment, confirms it
+   instead. Within a worker, transactions on the same shard queue on a
+   local lock rather than aborting each other, so transaction retries are
+   only spent on conflicts with other workers. The locks come from a fixed
+   pool, striped by flight and shard, so memory doesn't grow with the
+   number of flights ever booked.
+2. ``book()`` turns a hold into a booking. The booking id is derived from
+   the client's idempotency key, so a retried request finds its booking
+   instead of taking seats twice.
+
+A booking without a hold does both in one transaction (read the booking
+and a shard, write both) so the one-shot path costs a single transaction.
+
+Expired holds are returned to their shards by a background sweeper. The
+same loop keeps a per-worker copy of every flight's shard counts up to date
+(only shards written since the last pass are read) and reports changed
+totals to ``on_change``, which is how /flights/search sees availability
+without touching Firestore.
+
+The shard count may grow for a live system but must not shrink: seats in
+dropped shards would no longer be sold.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.repository import ContentionError
+
+
+class SeatsUnavailableError(Exception):
+    pass
+
+
+class InvalidHoldError(Exception):
+    pass
+
+
+class UnknownFlightError(Exception):
+    pass
+
+
+class InventoryBusyError(Exception):
+    """Too many concurrent writers on a flight's shards; retry shortly."""
+
+
+def booking_id_for(user_id: str, idempotency_key: str) -> str:
+    """Booking document id for a client's idempotency key."""
+    digest = hashlib.sha256(f"{user_id}:{idempotency_key}".encode()).hexdigest()
+    return digest[:20]
+
+
+class SeatInventory:
+    def __init__(self, shards: int = 8, hold_seconds: float = 600.0, sync_interval: float = 10.0,
+                 sweep_interval: float = 30.0, fast_path_shards: int = 2, max_attempts: int = 3,
+                 lock_stripes: int = 1024):
+        self.shards = shards
+        self.hold_seconds = hold_seconds
+        self.sync_interval = sync_interval
+        self.sweep_interval = sweep_interval
+        self.fast_path_shards = fast_path_shards
+        self.max_attempts = max_attempts
+        self.repository = None
+        self.on_change: Optional[Callable[[Dict[str, int]], None]] = None
+
+        # flight id -> seats left per shard, as last read or written here
+        self._shard_seats: Dict[str, Dict[int, int]] = {}
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
+        self._first_takes = [asyncio.Lock() for _ in range(lock_stripes)]
+        self._refreshes: Dict[str, asyncio.Future] = {}
+        self._synced_until: Optional[datetime] = None
+        self._last_sweep = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+        self.holds = 0
+        self.bookings = 0
+        self.replays = 0
+        self.sold_out = 0
+        self.contention = 0
+        self.expired_released = 0
+        self.sync_errors = 0
+
+    # Cached availability, the aggregate search reads
+
+    def available(self, flight_id: str) -> Optional[int]:
+        """Seats left on the flight, None until every shard has been seen."""
+        counts = self._shard_seats.get(flight_id)
+        if counts is None or len(counts) < self.shards:
+            return None
+        return sum(counts.values())
+
+    def _record(self, changes: Dict[str, Dict[int, int]]):
+        totals = {}
+        for flight_id, counts in changes.items():
+            self._shard_seats.setdefault(flight_id, {}).update(counts)
+            total = self.available(flight_id)
+            if total is not None:
+                totals[flight_id] = total
+        if totals and self.on_change is not None:
+            self.on_change(totals)
+
+    # Holds and bookings
+
+    def _stripe(self, flight_id: str, shard: int) -> int:
+        return hash((flight_id, shard)) % len(self._locks)
+
+    def _fast_path(self, flight_id: str, seats: int) -> List[int]:
+        # Shards believed to have enough seats, idle ones first, otherwise in
+        # random order to spread the load
+        counts = self._shard_seats.get(flight_id, {})
+        candidates = [n for n in range(self.shards) if counts.get(n, seats) >= seats]
+        random.shuffle(candidates)
+        candidates.sort(key=lambda n: self._locks[self._stripe(flight_id, n)].locked())
+        return candidates[:self.fast_path_shards]
+
+    async def _locked(self, flight_id: str, shards: List[int], call: Callable):
+        # Each stripe once (two shards may share one), in stripe order, so
+        # multi-shard calls can't deadlock
+        stripes = sorted({self._stripe(flight_id, n) for n in shards})
+        for stripe in stripes:
+            await self._locks[stripe].acquire()
+        try:
+            return await call()
+        finally:
+            for stripe in stripes:
+                self._locks[stripe].release()
+
+    async def _take(self, flight_id: str, seats: int, take: Callable):
+        """Run ``take(shards, init)`` on one shard at a time, then on all of them.
+
+        ``take`` returns ``(result, seats left per shard read)``, result None
+        when those shards don't have ``seats`` seats between them.
+        """
+        all_shards = list(range(self.shards))
+        if self.available(flight_id) is None:
+            # First request for the flight in this worker: one transaction
+            # over every shard (creating them on the flight's first booking)
+            # teaches us all the counts. Later arrivals wait on the gate, not
+            # on the shard locks, and take the fast path once it's open.
+            gate = self._first_takes[hash(flight_id) % len(self._first_takes)]
+            async with gate:
+                if self.available(flight_id) is None:
+                    try:
+                        outcome = await self._locked(flight_id, all_shards, lambda: take(all_shards, True))
+                    except ContentionError:
+                        self.contention += 1
+                        raise InventoryBusyError(f"Flight {flight_id} inventory is busy")
+                    return self._taken(flight_id, *outcome)
+
+        busy = False
+        for n in self._fast_path(flight_id, seats):
+            try:
+                result, counts = await self._locked(flight_id, [n], lambda: take([n], False))
+            except ContentionError:
+                self.contention += 1
+                busy = True
+                continue
+            if counts:
+                self._record({flight_id: counts})
+            if result is not None:
+                return result
+        if busy:
+            # The seats may well be there; don't pile onto every shard at once
+            raise InventoryBusyError(f"Flight {flight_id} inventory is busy")
+
+        if self.available(flight_id) < seats:
+            # Probably sold out: confirm with one plain read shared by every
+            # request asking right now, rather than queueing each of them
+            # for a transaction over all shards
+            await self._refresh(flight_id)
+            if self.available(flight_id) < seats:
+                self.sold_out += 1
+                raise SeatsUnavailableError(f"Not enough seats left on flight {flight_id}")
+
+        # No single shard (as far as this worker knows) has enough seats
+        try:
+            result, counts = await self._locked(flight_id, all_shards, lambda: take(all_shards, False))
+        except ContentionError:
+            self.contention += 1
+            raise InventoryBusyError(f"Flight {flight_id} inventory is busy")
+        return self._taken(flight_id, result, counts)
+
+    async def _refresh(self, flight_id: str):
+        refresh = self._refreshes.get(flight_id)
+        if refresh is None:
+            refresh = asyncio.ensure_future(self.repository.seat_shard_counts(flight_id))
+            self._refreshes[flight_id] = refresh
+            refresh.add_done_callback(lambda _: self._refreshes.pop(flight_id, None))
+        self._record({flight_id: await asyncio.shield(refresh)})
+
+    def _taken(self, flight_id: str, result, counts: Optional[Dict[int, int]]):
+        # Outcome of a transaction that read every shard
+        if counts is None:
+            raise UnknownFlightError(f"Flight {flight_id} not found")
+        if counts:
+            self._record({flight_id: counts})
+        if result is None:
+            self.sold_out += 1
+            raise SeatsUnavailableError(f"Not enough seats left on flight {flight_id}")
+        return result
+
+    async def hold(self, flight_id: str, seats: int, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Hold ``seats`` seats on the flight; the hold document."""
+        hold = {
+            "id": self.repository.new_hold_id(),
+            "seats": seats,
+            "user_id": user_id,
+            "expiresAt": datetime.now(timezone.utc) + timedelta(seconds=self.hold_seconds),
+        }
+        held = await self._take(flight_id, seats, lambda shards, init: self.repository.take_seats(
+            flight_id, shards, hold, init, self.max_attempts))
+        self.holds += 1
+        return held
+
+    async def release(self, hold_id: str) -> bool:
+        """Give a hold's seats back; False if it no longer exists."""
+        hold = await self.repository.get_seat_hold(hold_id)
+        if hold is None:
+            return False
+        return await self._release(hold)
+
+    async def _release(self, hold: Dict[str, Any]) -> bool:
+        shards = sorted(int(n) for n in hold["shards"])
+        for attempt in range(self.max_attempts):
+            try:
+                counts = await self._locked(hold["flight_id"], shards,
+                                            lambda: self.repository.release_seat_hold(hold))
+                break
+            except ContentionError:
+                self.contention += 1
+        else:
+            raise InventoryBusyError(f"Flight {hold['flight_id']} inventory is busy")
+        if counts is None:
+            return False
+        self._record({hold["flight_id"]: counts})
+        return True
+
+    async def book(self, booking: Dict[str, Any], booking_id: str,
+                   hold_id: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """Confirm a booking; ``(booking, created)``.
+
+        With a ``hold_id`` the held seats are used, otherwise seats are taken
+        and the booking written in the same transaction. A booking id that
+        was already confirmed returns the stored booking either way.
+        """
+        try:
+            if hold_id is None:
+                try:
+                    status, stored = await self._take(
+                        booking["flight_id"], booking["passengers"],
+                        lambda shards, init: self.repository.book_seats(
+                            booking["flight_id"], shards, booking_id, booking, init, self.max_attempts))
+                except SeatsUnavailableError:
+                    # Sold out may have been decided without reading the
+                    # booking; a retry of a booking that got the last seats
+                    # must still get it back
+                    stored = await self.repository.get_booking(booking_id)
+                    if stored is None:
+                        raise
+                    status = "existing"
+            else:
+                status, stored = await self.repository.confirm_booking(booking_id, booking, hold_id)
+        except ContentionError:
+            self.contention += 1
+            raise InventoryBusyError("Booking is busy")
+        if status == "created":
+            self.bookings += 1
+            return stored, True
+        if status == "existing":
+            self.replays += 1
+            return stored, False
+        raise InvalidHoldError({
+            "missing": f"Hold {hold_id} does not exist or was released",
+            "expired": f"Hold {hold_id} has expired",
+            "mismatch": f"Hold {hold_id} is for a different flight, seat count or user",
+        }[status])
+
+    # Background upkeep
+
+    async def sync(self):
+        """Read the shards written since the last pass into the local counts."""
+        docs = await self.repository.seat_shards_changed_since(self._synced_until)
+        changes: Dict[str, Dict[int, int]] = {}
+        for data in docs:
+            changes.setdefault(data["flight_id"], {})[data["shard"]] = data["available"]
+            updated = data.get("updatedAt")
+            if updated is not None and (self._synced_until is None or updated > self._synced_until):
+                self._synced_until = updated
+        self._record(changes)
+
+    async def sweep(self) -> int:
+        """Release expired holds; how many were released here."""
+        released = 0
+        for hold in await self.repository.expired_seat_holds(datetime.now(timezone.utc)):
+            try:
+                if await self._release(hold):
+                    released += 1
+            except InventoryBusyError:
+                pass  # Picked up again next pass
+        self.expired_released += released
+        return released
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+                if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                    self._last_sweep = time.monotonic()
+                    await self.sweep()
+            except Exception as e:
+                self.sync_errors += 1
+                print(f"Error syncing seat inventory: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self, repository, on_change: Optional[Callable[[Dict[str, int]], None]] = None):
+        self.repository = repository
+        self.on_change = on_change
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "flights_tracked": len(self._shard_seats),
+            "holds": self.holds,
+            "bookings": self.bookings,
+            "replays": self.replays,
+            "sold_out": self.sold_out,
+            "contention": self.contention,
+            "expired_released": self.expired_released,
+            "sync_errors": self.sync_errors,
+        }
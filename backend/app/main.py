@@ -1,20 +1,41 @@
 # backend/app/main.py
-from fastapi import FastAPI, HTTPException, Depends, status, Request, Query, Body
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Response, Query, Body, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.security import APIKeyHeader
-from pydantic import BaseModel
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel, Field, ValidationError
 from pydantic_settings import BaseSettings
-from typing import Optional, List, Dict
-import google.generativeai as genai
+from typing import Optional, List, Dict, Literal
+import asyncio
+import inspect
 import os
 from dotenv import load_dotenv
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from datetime import datetime, timezone
+from app.airport_index import AirportIndex
+from app.auth import InvalidTokenError, TokenVerifier
+from app.chat import (
+    LLMBusyError, LLMLimiter, fallback_reply, last_message, start_session, stream_reply
+)
+from app.chat_cache import build_chat_cache
+from app.clients import firestore_repository, init_firebase, init_gemini
+from app.conversation_log import ConversationLog
+from app.flight_cache import FlightCache
+from app.flight_search import FlightSearchEngine
+from app.flight_updates import FlightUpdates, SubscriptionError
+from app.inventory import (
+    InvalidHoldError, InventoryBusyError, SeatInventory, SeatsUnavailableError, UnknownFlightError,
+    booking_id_for
+)
+from app.metrics import REGISTRY, MetricsMiddleware, span
+from app.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.profiling import SamplingProfiler
+from app.rate_limit import build_rate_limiter
+from app.recommendations import RecommendationService
+from app.repository import FirestoreRepository, server_timestamp, valid_document_id
+from app.responses import FastJSONResponse, Payload, PayloadCache
 
 # Load environment variables
 load_dotenv()
@@ -26,6 +47,58 @@ class Settings(BaseSettings):
     ALLOWED_HOSTS: List[str] = ["*"]
     API_KEY: str = "dev-key"  # Default value for development
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_BURST: Optional[int] = None
+    RATE_LIMIT_STORE: Literal["memory", "shared", "redis"] = "shared"
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_SHM_NAME: str = "skyview-ratelimit"
+    RATE_LIMIT_KEY_QUOTAS: Dict[str, int] = {}
+    RATE_LIMIT_BROWSE_PER_MINUTE: int = 600  # Flights, recommendations, holds and bookings
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # Set behind a load balancer, see app/rate_limit.py
+    RATE_LIMIT_CHAT_COST: float = 10.0
+    RATE_LIMIT_LOOKUP_COST: float = 1.0
+    RATE_LIMIT_BATCH_COST: float = 5.0
+    FIRESTORE_TIMEOUT_SECONDS: float = 5.0
+    FIRESTORE_MAX_WORKERS: int = 16
+    MAX_CONCURRENT_LLM_CALLS: int = 8
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    CHAT_CACHE_TTL_SECONDS: float = 3600.0
+    CHAT_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    CHAT_CACHE_TAIL_MESSAGES: int = 3
+    CHAT_CACHE_REDIS_URL: Optional[str] = None
+    FIREBASE_CREDENTIALS_FILE: str = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "joystick-dc535-firebase-adminsdk-fbsvc-998b2aad07.json"
+    )
+    GEMINI_MODEL: str = "gemini-pro"
+    AIRPORTS_DATA_FILE: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "airports.json")
+    SUGGESTIONS_MAX_AGE_SECONDS: int = 86400
+    SUGGESTIONS_CACHE_MAX_ENTRIES: int = 4096
+    RECOMMENDATIONS_REFRESH_SECONDS: float = 300.0
+    RECOMMENDATIONS_MAX_USERS: int = 10000
+    RECOMMENDATIONS_MAX_PENDING_REFRESHES: int = 1000
+    CONVERSATION_LOG_MAX_QUEUE: int = 10000
+    CONVERSATION_LOG_BATCH_SIZE: int = 500
+    CONVERSATION_LOG_FLUSH_SECONDS: float = 1.0
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_SECONDS: float = 0.001
+    PROFILE_DIR: str = "profiles"
+    SEAT_SHARDS: int = 8  # May be raised for a live system, never lowered
+    SEAT_HOLD_SECONDS: float = 600.0
+    INVENTORY_SYNC_SECONDS: float = 10.0
+    INVENTORY_SWEEP_SECONDS: float = 30.0
+    FLIGHT_CACHE_TTL_SECONDS: float = 5.0  # Also how long other workers may show an old status
+    FLIGHT_CACHE_MAX_ENTRIES: int = 10000
+    PAYLOAD_CACHE_MAX_ENTRIES: int = 10000
+    MIN_CONNECTION_MINUTES: int = 45
+    MIN_CONNECTION_MINUTES_BY_AIRPORT: Dict[str, int] = {}  # e.g. {"LHR": 75}
+    MAX_LAYOVER_MINUTES: int = 720
+    WS_MAX_FLIGHTS_PER_CONNECTION: int = 50
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+    FLIGHT_WATCH_LINGER_SECONDS: float = 30.0
+    MAX_FLIGHT_WATCHES: int = 10000  # Firestore listeners per worker
+    AUTH_REQUIRED: bool = False  # Off while clients move to sending ID tokens
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
 
     class Config:
         env_file = ".env"
@@ -33,15 +106,29 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Token-bucket rate limiter; the default store is shared by all worker
+# processes on the host, so the limit doesn't scale with --workers
+limiter = build_rate_limiter(
+    store=settings.RATE_LIMIT_STORE,
+    per_minute=settings.RATE_LIMIT_PER_MINUTE,
+    burst=settings.RATE_LIMIT_BURST,
+    quotas=settings.RATE_LIMIT_KEY_QUOTAS,
+    trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+    redis_url=settings.RATE_LIMIT_REDIS_URL,
+    shm_name=settings.RATE_LIMIT_SHM_NAME,
+)
+chat_rate_limit = Depends(limiter.cost(settings.RATE_LIMIT_CHAT_COST))
+lookup_rate_limit = Depends(limiter.cost(settings.RATE_LIMIT_LOOKUP_COST))
+# Browsing and booking spend from a separate, larger budget, so they neither
+# run into nor use up the search and chat limits
+browse_rate_limit = Depends(limiter.cost(settings.RATE_LIMIT_LOOKUP_COST, "browse",
+                                         settings.RATE_LIMIT_BROWSE_PER_MINUTE))
+batch_rate_limit = Depends(limiter.cost(settings.RATE_LIMIT_BATCH_COST, "browse",
+                                        settings.RATE_LIMIT_BROWSE_PER_MINUTE))
 
 # Initialize the FastAPI app
-app = FastAPI(title="SkyView AI Backend")
-
-# Add rate limiting exception handler
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# orjson instead of json.dumps for every route; see app/responses.py
+app = FastAPI(title="SkyView AI Backend", default_response_class=FastJSONResponse)
 
 # Add security middleware
 app.add_middleware(
@@ -60,6 +147,19 @@ app.add_middleware(
     max_age=3600,
 )
 
+# Per-route latency/status metrics and the opt-in request profiler; added
+# last so it is outermost and times the other middleware too
+app.add_middleware(
+    MetricsMiddleware,
+    routes=lambda: app.router.routes,
+    profiler=SamplingProfiler(
+        enabled=settings.PROFILING_ENABLED,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        interval=settings.PROFILE_INTERVAL_SECONDS,
+        output_dir=settings.PROFILE_DIR,
+    ),
+)
+
 # API Key security
 api_key_header = APIKeyHeader(name="X-API-Key")
 
@@ -71,36 +171,66 @@ async def verify_api_key(api_key: str = Depends(api_key_header)):
         )
     return api_key
 
-# Initialize Firebase using the service account JSON file
-try:
-    # Path to the Firebase service account credentials file
-    service_account_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-        "joystick-dc535-firebase-adminsdk-fbsvc-998b2aad07.json"
-    )
-    
-    # Check if the service account file exists
-    if os.path.exists(service_account_path):
-        # Initialize Firebase with the service account file
-        cred = credentials.Certificate(service_account_path)
-        firebase_admin.initialize_app(cred)
-        db = firestore.client()
-        print("Firebase initialized successfully")
-    else:
-        print(f"Firebase service account file not found at: {service_account_path}")
-        print("Running without Firebase")
-except Exception as e:
-    print(f"Failed to initialize Firebase: {e}")
-    # Continue without Firebase
-
-# Initialize Gemini API
-try:
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-pro')
-    print("Gemini API initialized successfully")
-except Exception as e:
-    print(f"Failed to initialize Gemini API: {e}")
-    model = None
+# Firebase ID tokens (Authorization: Bearer), verified with cached keys and
+# claims, see app/auth.py
+token_verifier = TokenVerifier(settings.FIREBASE_PROJECT_ID, max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
+bearer_token = HTTPBearer(auto_error=False)
+
+async def current_user(request: Request,
+                       credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_token)) -> Optional[str]:
+    """The signed-in user's uid, or None for a request without a token."""
+    if credentials is None:
+        if settings.AUTH_REQUIRED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                                headers={"WWW-Authenticate": "Bearer"})
+        return None
+    try:
+        claims = await token_verifier.verify(credentials.credentials)
+    except InvalidTokenError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid ID token: {e}",
+                            headers={"WWW-Authenticate": "Bearer"})
+    # Rate limits are then counted per user (see app/rate_limit.py)
+    request.state.user_id = claims["uid"]
+    return claims["uid"]
+
+# Listed in a route's dependencies ahead of the rate limit, so the limiter
+# sees the user; the endpoint gets the same (per-request cached) result
+authenticated = Depends(current_user)
+
+def check_user(uid: Optional[str], user_id: Optional[str]):
+    # Without a token the caller-supplied user_id is trusted, as before
+    if uid is not None and user_id is not None and user_id != uid:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="user_id does not match the signed-in user")
+
+# Firebase and Gemini are set up in the startup hook, once per worker
+# process (see app/clients.py), so importing this module stays cheap
+firebase_ready = False
+repository: Optional[FirestoreRepository] = None
+model = None
+
+# Cap in-flight Gemini calls so a burst of chats can't exhaust the worker
+llm_limiter = LLMLimiter(settings.MAX_CONCURRENT_LLM_CALLS, settings.LLM_QUEUE_TIMEOUT_SECONDS)
+
+# Cache answers to repeated anonymous questions
+chat_cache = build_chat_cache(
+    ttl=settings.CHAT_CACHE_TTL_SECONDS,
+    max_bytes=settings.CHAT_CACHE_MAX_BYTES,
+    tail_messages=settings.CHAT_CACHE_TAIL_MESSAGES,
+    redis_url=settings.CHAT_CACHE_REDIS_URL,
+)
+
+gemini_task: Optional[asyncio.Task] = None
+
+async def load_gemini():
+    global model
+    model = await asyncio.to_thread(init_gemini, os.getenv("GOOGLE_API_KEY"), settings.GEMINI_MODEL)
+
+async def get_chat_model():
+    # Dependency so tests and benchmarks can swap in a fake model; waits
+    # for the startup hook's Gemini setup if it is still running
+    if gemini_task is not None and not gemini_task.done():
+        await asyncio.shield(gemini_task)
+    return model
 
 # Define data models
 class ChatMessage(BaseModel):
@@ -134,21 +264,40 @@ class FlightModel(BaseModel):
     travelClasses: list
     amenities: list
     status: str
-    gate: str = None
-    terminal: str = None
-    lastUpdated: str = None
-    logo: str = None
+    gate: Optional[str] = None
+    terminal: Optional[str] = None
+    lastUpdated: Optional[str] = None
+    logo: Optional[str] = None
     isNonStop: bool = True
 
+class FlightBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=100)
+
+class FlightStatusUpdate(BaseModel):
+    status: str
+    gate: Optional[str] = None
+    terminal: Optional[str] = None
+
 class BookingModel(BaseModel):
-    id: str = None
+    id: Optional[str] = None
     user_id: str
     flight_id: str
-    passengers: int
+    passengers: int = Field(..., ge=1, le=9)
     travelClass: str
     totalPrice: float
-    bookingTime: str = None
+    bookingTime: Optional[str] = None
     status: str = "confirmed"
+    hold_id: Optional[str] = None  # From POST /flights/{flight_id}/holds
+
+class HoldRequest(BaseModel):
+    seats: int = Field(1, ge=1, le=9)
+    user_id: Optional[str] = None
+
+class HoldModel(BaseModel):
+    id: str
+    flight_id: str
+    seats: int
+    expiresAt: str
 
 class FlightSearchParams(BaseModel):
     departure_city: Optional[str] = None
@@ -158,88 +307,345 @@ class FlightSearchParams(BaseModel):
     passengers: Optional[int] = 1
     travel_class: Optional[str] = None
     max_price: Optional[float] = None
-    page: int = 1
-    limit: int = 20
+    page: int = Field(1, ge=1)
+    limit: int = Field(20, ge=1, le=100)
+    cursor: Optional[str] = None  # Takes precedence over page when set
+    sort_by: Literal["departure", "price", "duration"] = "departure"
+
+def query_params(model):
+    # Depends() on a model checks the query string's types but not Field
+    # bounds, which then fail in the constructor; report those as 422s too
+    def build(**values):
+        try:
+            return model(**values)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("query", *error["loc"])} for error in e.errors()])
+    build.__signature__ = inspect.signature(model)
+    return build
+
+class ItineraryModel(BaseModel):
+    legs: List[FlightModel]
+    stops: int
+    price: float  # Sum of the legs' fares
+    durationMinutes: int  # First departure to last arrival
+    departureTime: str
+    arrivalTime: str
+    layoverMinutes: List[int]
+
+# Autocomplete index for /flight-suggestions, built once from the bundled data
+airport_index = AirportIndex.from_file(settings.AIRPORTS_DATA_FILE)
+
+# Catalogue used by /flights/search until Firestore flights are loaded
+MOCK_SEARCH_FLIGHTS = [
+    FlightModel(
+        id="1",
+        airlineName="Air India",
+        flightNumber="AI101",
+        departureCity="Delhi",
+        arrivalCity="London",
+        departureAirport="DEL",
+        arrivalAirport="LHR",
+        departureTime="2024-06-01T10:00:00Z",
+        arrivalTime="2024-06-01T14:00:00Z",
+        price=50000,
+        availableSeats=5,
+        travelClasses=["Economy", "Business"],
+        amenities=["meal", "wifi"],
+        status="Scheduled",
+        gate="A1",
+        terminal="T3",
+        lastUpdated=None,
+        logo=None,
+        isNonStop=True
+    ),
+    FlightModel(
+        id="2",
+        airlineName="Emirates",
+        flightNumber="EK202",
+        departureCity="Dubai",
+        arrivalCity="New York",
+        departureAirport="DXB",
+        arrivalAirport="JFK",
+        departureTime="2024-06-02T08:00:00Z",
+        arrivalTime="2024-06-02T16:00:00Z",
+        price=70000,
+        availableSeats=3,
+        travelClasses=["Economy", "Business", "First"],
+        amenities=["meal", "entertainment"],
+        status="Scheduled",
+        gate="B2",
+        terminal="T1",
+        lastUpdated=None,
+        logo=None,
+        isNonStop=True
+    ),
+    FlightModel(
+        id="3",
+        airlineName="British Airways",
+        flightNumber="BA123",
+        departureCity="London",
+        arrivalCity="Paris",
+        departureAirport="LHR",
+        arrivalAirport="CDG",
+        departureTime="2024-06-03T09:00:00Z",
+        arrivalTime="2024-06-03T11:00:00Z",
+        price=45000,
+        availableSeats=8,
+        travelClasses=["Economy", "Business"],
+        amenities=["meal", "wifi", "entertainment"],
+        status="Scheduled",
+        gate="C3",
+        terminal="T2",
+        lastUpdated=None,
+        logo=None,
+        isNonStop=True
+    )
+]
+
+# Fallback for /flights and /flights/{flight_id}, serialized once
+MOCK_FLIGHTS = MOCK_SEARCH_FLIGHTS[:2]
+MOCK_FLIGHTS_BY_ID = {flight.id: flight for flight in MOCK_FLIGHTS}
+MOCK_FLIGHTS_PAYLOAD = Payload.of(MOCK_FLIGHTS)
+MOCK_FLIGHT_PAYLOADS = {flight.id: Payload.of(flight) for flight in MOCK_FLIGHTS}
+
+# Loaded once at startup into a columnar catalogue, see app/flight_search.py
+flight_search = FlightSearchEngine(
+    MOCK_SEARCH_FLIGHTS,
+    min_connection=settings.MIN_CONNECTION_MINUTES * 60,
+    min_connection_by_airport={airport: minutes * 60 for airport, minutes
+                               in settings.MIN_CONNECTION_MINUTES_BY_AIRPORT.items()},
+    max_layover=settings.MAX_LAYOVER_MINUTES * 60,
+)
+
+# Seats are sold from sharded counters; search reads the cached totals
+inventory = SeatInventory(
+    shards=settings.SEAT_SHARDS,
+    hold_seconds=settings.SEAT_HOLD_SECONDS,
+    sync_interval=settings.INVENTORY_SYNC_SECONDS,
+    sweep_interval=settings.INVENTORY_SWEEP_SECONDS,
+)
+
+# Flight documents for /flights/{flight_id} and /flights/batch
+flight_cache = FlightCache(ttl=settings.FLIGHT_CACHE_TTL_SECONDS,
+                           max_entries=settings.FLIGHT_CACHE_MAX_ENTRIES)
+
+# Serialized bodies (with ETags) of responses that are served many times unchanged
+payloads = PayloadCache(max_entries=settings.PAYLOAD_CACHE_MAX_ENTRIES)
+# Suggestions get their own, so typing arbitrary prefixes can't evict flights
+suggestion_payloads = PayloadCache(max_entries=settings.SUGGESTIONS_CACHE_MAX_ENTRIES)
+
+def apply_flight_change(flight_id: str, fields: Optional[dict]):
+    # A change seen by a /ws/flights listener, possibly written by another
+    # worker: refresh the flight cache, the search indexes and the
+    # connection graph. Flights nobody watches are only refreshed by a
+    # status PATCH to this worker or the next catalogue load.
+    flight_cache.invalidate(flight_id)
+    if fields:
+        flight_search.update_status(flight_id, fields)
+
+# Status pushed to /ws/flights subscribers from one shared Firestore
+# listener per flight; a change seen there is also applied locally
+flight_updates = FlightUpdates(
+    max_flights_per_connection=settings.WS_MAX_FLIGHTS_PER_CONNECTION,
+    send_timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+    linger=settings.FLIGHT_WATCH_LINGER_SECONDS,
+    max_listeners=settings.MAX_FLIGHT_WATCHES,
+    known=lambda flight_id: flight_id in flight_search,
+    on_change=apply_flight_change,
+)
+
+async def flight_exists(flight_id: str) -> bool:
+    # Checked before any inventory work, where an unknown id costs a
+    # transaction over every shard. Flights added since the catalogue was
+    # loaded are found with one (cached) read.
+    if not valid_document_id(flight_id):
+        return False
+    return flight_id in flight_search or await flight_cache.get(flight_id, repository.get_flights) is not None
+
+def with_live_seats(data: dict) -> dict:
+    # The flight document's availableSeats is only the initial count
+    seats = inventory.available(data.get("id"))
+    if seats is not None:
+        data["availableSeats"] = seats
+    return data
+
+# Chat records are queued and written to Firestore in batches
+conversation_log = ConversationLog(
+    max_queue=settings.CONVERSATION_LOG_MAX_QUEUE,
+    batch_size=settings.CONVERSATION_LOG_BATCH_SIZE,
+    flush_interval=settings.CONVERSATION_LOG_FLUSH_SECONDS,
+)
+
+# Materialized in the background, see app/recommendations.py
+recommendations = RecommendationService(
+    refresh_interval=settings.RECOMMENDATIONS_REFRESH_SECONDS,
+    max_users=settings.RECOMMENDATIONS_MAX_USERS,
+    max_pending=settings.RECOMMENDATIONS_MAX_PENDING_REFRESHES,
+)
 
 # Add startup event to ensure configuration
 @app.on_event("startup")
 async def startup_event():
     if not os.getenv("GOOGLE_API_KEY"):
         print("WARNING: GOOGLE_API_KEY not set. AI functionality will be limited.")
+    # Gemini is imported and configured in a thread while the worker starts
+    # serving; only /chat and /chat/stream wait for it (see get_chat_model)
+    global gemini_task, firebase_ready, repository
+    if model is None and gemini_task is None:
+        gemini_task = asyncio.create_task(load_gemini())
+    await chat_cache.warm_start(ChatMessage)
+    # The async Firestore client binds to the running event loop, so the
+    # repository is built here rather than at import time
+    if repository is None:
+        firebase_ready = init_firebase(settings.FIREBASE_CREDENTIALS_FILE)
+        if firebase_ready:
+            repository = firestore_repository(
+                timeout=settings.FIRESTORE_TIMEOUT_SECONDS,
+                max_workers=settings.FIRESTORE_MAX_WORKERS,
+            )
+    await load_flight_catalogue()
+    if repository is not None:
+        recommendations.start(repository)
+        conversation_log.start(repository)
+        inventory.start(repository, on_change=flight_search.update_seats)
+        flight_updates.start(repository)
+
+async def load_flight_catalogue():
+    if repository is None:
+        return
+    try:
+        docs = await repository.all_flights()
+        if docs:
+            flight_search.load(FlightModel(**data) for data in docs)
+            print(f"Loaded {len(flight_search)} flights into the search index")
+    except Exception as e:
+        print(f"Error loading flight catalogue, keeping mock data: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await recommendations.stop()
+    await inventory.stop()
+    await conversation_log.stop()
+    await flight_updates.stop()
+    await token_verifier.keys.stop()
+    if repository is not None:
+        repository.close()
+
+# Pagination helpers: the next-page cursor travels in a response header so
+# list responses keep their shape
+def parse_cursor(scope: str, cursor: Optional[str], **kwargs):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(scope, cursor, **kwargs)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def next_cursor_headers(scope: str, next_key) -> Dict[str, str]:
+    if next_key is None:
+        return {}
+    return {"X-Next-Cursor": encode_cursor(scope, next_key)}
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "gemini_available": model is not None}
+    return {
+        "status": "healthy",
+        "gemini_available": model is not None,
+        "chat_cache": chat_cache.stats(),
+        "recommendations": recommendations.stats(),
+        "conversation_log": conversation_log.stats(),
+        "inventory": inventory.stats(),
+        "flight_cache": flight_cache.stats(),
+        "flight_updates": flight_updates.stats(),
+        "auth": token_verifier.stats(),
+    }
+
+# Scrape-time metrics read from the caches' and queues' own counters
+def cache_lookups() -> Dict[str, tuple]:
+    """(hits, misses) per cache."""
+    chat = chat_cache.stats()
+    recs = recommendations.stats()
+    suggestions = airport_index.stats()
+    flights = flight_cache.stats()
+    serialized = payloads.stats()
+    tokens = token_verifier.stats()
+    return {
+        "chat": (chat["hits"], chat["misses"]),
+        "recommendations": (recs["hits"] + recs["stale_hits"], recs["misses"]),
+        "suggestions": (suggestions["hits"], suggestions["misses"]),
+        "flights": (flights["hits"] + flights["coalesced"], flights["misses"]),
+        "payloads": (serialized["hits"], serialized["misses"]),
+        "auth_tokens": (tokens["hits"], tokens["misses"]),
+    }
+
+def cache_hit_ratios():
+    return [((cache,), hits / (hits + misses) if hits + misses else 0.0)
+            for cache, (hits, misses) in cache_lookups().items()]
+
+REGISTRY.collector("counter", "cache_hits", "Lookups served from cache", ("cache",),
+                   lambda: [((cache,), hits) for cache, (hits, _) in cache_lookups().items()])
+REGISTRY.collector("counter", "cache_misses", "Lookups that missed the cache", ("cache",),
+                   lambda: [((cache,), misses) for cache, (_, misses) in cache_lookups().items()])
+REGISTRY.collector("gauge", "cache_hit_ratio", "Share of lookups served from cache", ("cache",),
+                   cache_hit_ratios)
+REGISTRY.collector("gauge", "llm_calls_in_flight", "Gemini calls holding a slot", (),
+                   lambda: [((), llm_limiter.in_flight)])
+REGISTRY.collector("gauge", "conversation_log_queued", "Conversation records waiting to be written", (),
+                   lambda: [((), conversation_log.stats()["queued"])])
+REGISTRY.collector("counter", "conversation_log_records", "Conversation records by outcome", ("outcome",),
+                   lambda: [((outcome,), conversation_log.stats()[outcome])
+                            for outcome in ("written", "dropped", "failed")])
+REGISTRY.collector("counter", "rate_limited_requests", "Requests rejected with 429", (),
+                   lambda: [((), limiter.limited)])
+REGISTRY.collector("gauge", "recommendations_snapshot_age_seconds", "Age of the global recommendations", (),
+                   lambda: [((), recommendations.stats()["global_age_seconds"] or 0)])
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Chat endpoint
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@app.post("/chat", response_model=ChatResponse, dependencies=[authenticated, chat_rate_limit])
+async def chat(request: ChatRequest, model=Depends(get_chat_model), uid: Optional[str] = authenticated):
+    check_user(uid, request.user_id)
+    cacheable = chat_cache.is_cacheable(request)
     if not model:
-        # Fallback responses if Gemini is not available
-        fallback_responses = {
-            "flight": "I can help you find flights. Please provide your departure city, destination, and dates.",
-            "book": "To book a flight, I'll need information about your travel dates, destination, and preferences.",
-            "cancel": "If you need to cancel a booking, please go to the My Bookings section in your profile.",
-            "baggage": "Baggage allowance depends on the airline and fare class. Economy generally allows 15-20kg.",
-            "default": "I'm your travel assistant. I can help you book flights, answer questions about travel, and provide recommendations."
-        }
-        
-        # Determine which fallback to use based on the last user message
-        last_message = request.messages[-1].content.lower() if request.messages else ""
-        
-        if "flight" in last_message:
-            response = fallback_responses["flight"]
-        elif "book" in last_message:
-            response = fallback_responses["book"]
-        elif "cancel" in last_message:
-            response = fallback_responses["cancel"]
-        elif "baggage" in last_message or "luggage" in last_message:
-            response = fallback_responses["baggage"]
-        else:
-            response = fallback_responses["default"]
-            
-        return ChatResponse(response=response)
+        # Fallback responses if Gemini is not available; cached answers
+        # (including the seeded ones) are served first
+        cached = await chat_cache.get(request.messages, live=False) if cacheable else None
+        return ChatResponse(response=cached if cached is not None else fallback_reply(request.messages))
     
+    if cacheable:
+        cached = await chat_cache.get(request.messages)
+        if cached is not None:
+            return ChatResponse(response=cached)
+
     try:
-        # Format the conversation for Gemini
-        formatted_messages = []
-        for msg in request.messages:
-            role = "user" if msg.role == "user" else "model"
-            formatted_messages.append({"role": role, "parts": [msg.content]})
-        
-        # Add system prompt to guide the AI's behavior
-        system_prompt = """You are SkyView's AI travel assistant. 
-        Your goal is to help users with flight bookings, travel recommendations, and answer questions.
-        Be concise, friendly, and provide accurate travel information.
-        If asked about booking flights, guide users to search on the app.
-        Keep responses under 150 words and focus on being helpful."""
+        chat = start_session(model, request.messages)
         
-        # Create a chat session with the system prompt
-        chat = model.start_chat(history=[
-            {"role": "user", "parts": ["What's your role?"]},
-            {"role": "model", "parts": [system_prompt]}
-        ])
+        # Send the conversation to Gemini without blocking the event loop
+        async with llm_limiter:
+            with span("gemini", "send_message"):
+                response = await chat.send_message_async(last_message(request.messages))
         
-        # Send the conversation to Gemini
-        response = chat.send_message(formatted_messages)
+        if cacheable:
+            await chat_cache.set(request.messages, response.text)
         
         # Store the conversation in Firebase if user_id is provided
-        if request.user_id and 'db' in globals():
-            try:
-                # Create a conversation record
-                conversation_ref = db.collection('conversations').document()
-                conversation_ref.set({
-                    'user_id': request.user_id,
-                    'timestamp': firestore.SERVER_TIMESTAMP,
-                    'query': request.messages[-1].content,
-                    'response': response.text,
-                })
-            except Exception as e:
-                print(f"Error storing conversation: {e}")
+        if request.user_id:
+            # Written behind the response, see app/conversation_log.py
+            conversation_log.log({
+                'user_id': request.user_id,
+                'timestamp': server_timestamp(),
+                'query': request.messages[-1].content,
+                'response': response.text,
+            })
         
         return ChatResponse(response=response.text)
     
+    except LLMBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         raise HTTPException(
@@ -247,228 +653,387 @@ async def chat(request: ChatRequest):
             detail=f"Failed to process chat: {str(e)}"
         )
 
+# Streaming chat endpoint: forwards Gemini chunks as server-sent events
+@app.post("/chat/stream", dependencies=[authenticated, chat_rate_limit])
+async def chat_stream(request: Request, chat_request: ChatRequest, model=Depends(get_chat_model),
+                      uid: Optional[str] = authenticated):
+    check_user(uid, chat_request.user_id)
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI chat is not available"
+        )
+
+    async def store_conversation(text: str):
+        if chat_request.user_id:
+            conversation_log.log({
+                'user_id': chat_request.user_id,
+                'timestamp': server_timestamp(),
+                'query': chat_request.messages[-1].content,
+                'response': text,
+            })
+
+    return StreamingResponse(
+        stream_reply(model, chat_request.messages, llm_limiter,
+                     request.is_disconnected, on_complete=store_conversation),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Flight search suggestions endpoint (mock data for now)
 @app.get("/flight-suggestions")
-async def get_flight_suggestions(query: str = ""):
-    # This would be replaced with actual flight search API integration
-    suggestions = [
-        {"city": "Mumbai", "code": "BOM", "airport": "Chhatrapati Shivaji Maharaj International Airport"},
-        {"city": "Delhi", "code": "DEL", "airport": "Indira Gandhi International Airport"},
-        {"city": "Bangalore", "code": "BLR", "airport": "Kempegowda International Airport"},
-        {"city": "Chennai", "code": "MAA", "airport": "Chennai International Airport"},
-        {"city": "Kolkata", "code": "CCU", "airport": "Netaji Subhas Chandra Bose International Airport"},
-    ]
-    
-    if query:
-        query = query.lower()
-        suggestions = [s for s in suggestions if query in s["city"].lower() or query in s["code"].lower()]
-    
-    return {"suggestions": suggestions}
+async def get_flight_suggestions(request: Request, query: str = "", limit: int = Query(10, ge=1, le=20)):
+    # Results only change when the bundled airport data does, so clients and
+    # proxies may cache each prefix
+    etag = airport_index.etag(query, limit)
+    payload = suggestion_payloads.get(etag, etag, lambda: {"suggestions": airport_index.search(query, limit)},
+                                      etag=etag)
+    return payload.response(request, {"Cache-Control": f"public, max-age={settings.SUGGESTIONS_MAX_AGE_SECONDS}"})
+
+@app.get("/recommendations", response_model=RecommendationResponse, dependencies=[authenticated, browse_rate_limit])
+async def get_recommendations(request: Request, user_id: Optional[str] = Query(None),
+                              uid: Optional[str] = authenticated):
+    check_user(uid, user_id)
+    user_id = user_id or uid
+    # Served from the precomputed snapshot; Firestore is only read by the
+    # background refresher. A snapshot is serialized once per refresh.
+    results, age = recommendations.get(user_id)
+    headers = {"X-Recommendations-Age": str(int(age))} if age != float("inf") else {}
+    payload = payloads.get(("recommendations", user_id), results,
+                           lambda: RecommendationResponse(recommendations=results))
+    return payload.response(request, headers)
 
-@app.get("/recommendations", response_model=RecommendationResponse)
-async def get_recommendations(user_id: Optional[str] = Query(None)):
-    # Try to fetch from Firestore if available
+@app.get("/flights", response_model=List[FlightModel], dependencies=[browse_rate_limit])
+async def list_flights(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    page: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
+):
+    after = parse_cursor("flights", cursor)
     try:
-        if 'db' in globals():
-            # Example: get top 5 popular destinations
-            locations_ref = db.collection('locations').where('isPopular', '==', True).order_by('popularity', direction=firestore.Query.DESCENDING).limit(5)
-            docs = locations_ref.stream()
-            recommendations = []
-            for doc in docs:
-                data = doc.to_dict()
-                recommendations.append({
-                    "city": data.get("city"),
-                    "country": data.get("country"),
-                    "code": data.get("code"),
-                    "airportName": data.get("airportName"),
-                    "imageUrl": data.get("imageUrl"),
-                })
-            return RecommendationResponse(recommendations=recommendations)
+        if repository is not None:
+            docs, next_key = await repository.list_flights(
+                limit=limit, offset=(page - 1) * limit, after=after
+            )
+            flights = [FlightModel(**with_live_seats(data)) for data in docs]
+            # Already validated: skip response_model's second pass
+            return FastJSONResponse(flights, headers=next_cursor_headers("flights", next_key))
     except Exception as e:
-        print(f"Error fetching recommendations from Firestore: {e}")
-    # Fallback: mock data
-    recommendations = [
-        {"city": "London", "country": "UK", "code": "LHR", "airportName": "Heathrow Airport", "imageUrl": None},
-        {"city": "Paris", "country": "France", "code": "CDG", "airportName": "Charles de Gaulle Airport", "imageUrl": None},
-        {"city": "New York", "country": "USA", "code": "JFK", "airportName": "John F. Kennedy International Airport", "imageUrl": None},
-        {"city": "Dubai", "country": "UAE", "code": "DXB", "airportName": "Dubai International Airport", "imageUrl": None},
-        {"city": "Singapore", "country": "Singapore", "code": "SIN", "airportName": "Changi Airport", "imageUrl": None},
-    ]
-    return RecommendationResponse(recommendations=recommendations)
-
-@app.get("/flights", response_model=List[FlightModel])
-async def list_flights():
+        print(f"Error fetching flights: {e}")
+    # Fallback mock data
+    return MOCK_FLIGHTS_PAYLOAD.response(request)
+
+@app.get("/flights/search", response_model=List[FlightModel], dependencies=[lookup_rate_limit])
+async def search_flights(
+    request: Request,
+    params: FlightSearchParams = Depends(query_params(FlightSearchParams)),
+    api_key: str = Depends(verify_api_key)
+):
+    # Cursors are only valid for the sort order they were issued under
+    cursor_scope = f"flight-search:{params.sort_by}"
+    # The catalogue sorts on numbers (prices, durations, epoch seconds)
+    after = parse_cursor(cursor_scope, params.cursor, value_types=(int, float))
     try:
-        if 'db' in globals():
-            flights_ref = db.collection('flights').limit(20)
-            docs = flights_ref.stream()
-            flights = [FlightModel(**doc.to_dict()) for doc in docs]
-            return flights
+        # Served from the in-memory indexes, no per-request scan
+        results = flight_search.search(params)
+
+        # Apply pagination: keyset when a cursor is given, offset otherwise
+        rows, next_key = results.page(
+            params.limit, offset=(params.page - 1) * params.limit, after=after
+        )
+        # Catalogue records were validated when the catalogue was loaded, so
+        # the page is serialized as-is, without building model objects
+        return FastJSONResponse(results.records(rows), headers=next_cursor_headers(cursor_scope, next_key))
+
+    except Exception as e:
+        print(f"Error searching flights: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search flights: {str(e)}"
+        )
+
+@app.get("/flights/connections", response_model=List[ItineraryModel], dependencies=[lookup_rate_limit])
+async def search_connections(
+    departure_city: str,
+    arrival_city: str,
+    departure_date: Optional[str] = None,
+    passengers: int = Query(1, ge=1),
+    travel_class: Optional[str] = None,
+    max_price: Optional[float] = None,
+    max_stops: int = Query(2, ge=0, le=2),
+    min_connection_minutes: int = Query(0, ge=0),  # On top of each airport's own minimum
+    sort_by: Literal["price", "duration"] = "price",
+    limit: int = Query(10, ge=1, le=50),
+    api_key: str = Depends(verify_api_key)
+):
+    # Direct flights and itineraries with up to two connections, best first;
+    # cities or airport codes, like /flights/search
+    try:
+        itineraries = flight_search.connections.search(
+            departure_city, arrival_city, departure_date, max_stops=max_stops, passengers=passengers,
+            travel_class=travel_class, max_price=max_price, sort_by=sort_by, limit=limit,
+            min_connection=min_connection_minutes * 60,
+        )
+        return FastJSONResponse(flight_search.connections.records(itineraries))
+    except Exception as e:
+        print(f"Error searching connections: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search connections: {str(e)}"
+        )
+
+@app.post("/flights/batch", response_model=List[FlightModel], dependencies=[batch_rate_limit])
+async def get_flights_batch(request: FlightBatchRequest = Body(...)):
+    # Flights in request order; ids that don't exist are left out
+    try:
+        if repository is not None:
+            docs = await flight_cache.get_many(request.ids, repository.get_flights)
+            return FastJSONResponse([FlightModel(**with_live_seats(docs[flight_id]))
+                                     for flight_id in dict.fromkeys(request.ids) if flight_id in docs])
     except Exception as e:
         print(f"Error fetching flights: {e}")
     # Fallback mock data
-    return [
-        FlightModel(
-            id="1", airlineName="Air India", flightNumber="AI101", departureCity="Delhi", arrivalCity="London", departureAirport="DEL", arrivalAirport="LHR", departureTime="2024-06-01T10:00:00Z", arrivalTime="2024-06-01T14:00:00Z", price=50000, availableSeats=5, travelClasses=["Economy", "Business"], amenities=["meal", "wifi"], status="Scheduled", gate="A1", terminal="T3", lastUpdated=None, logo=None, isNonStop=True
-        ),
-        FlightModel(
-            id="2", airlineName="Emirates", flightNumber="EK202", departureCity="Dubai", arrivalCity="New York", departureAirport="DXB", arrivalAirport="JFK", departureTime="2024-06-02T08:00:00Z", arrivalTime="2024-06-02T16:00:00Z", price=70000, availableSeats=3, travelClasses=["Economy", "Business", "First"], amenities=["meal", "entertainment"], status="Scheduled", gate="B2", terminal="T1", lastUpdated=None, logo=None, isNonStop=True
-        ),
-    ]
-
-@app.get("/flights/{flight_id}", response_model=FlightModel)
-async def get_flight(flight_id: str):
+    return FastJSONResponse([MOCK_FLIGHTS_BY_ID[flight_id] for flight_id in dict.fromkeys(request.ids)
+                             if flight_id in MOCK_FLIGHTS_BY_ID])
+
+@app.get("/flights/{flight_id}", response_model=FlightModel, dependencies=[browse_rate_limit])
+async def get_flight(request: Request, flight_id: str):
     try:
-        if 'db' in globals():
-            doc = db.collection('flights').document(flight_id).get()
-            if doc.exists:
-                return FlightModel(**doc.to_dict())
+        if repository is not None:
+            # Concurrent requests for one flight share a single read
+            data = await flight_cache.get(flight_id, repository.get_flights)
+            if data is not None:
+                # Validated and serialized again only when the document or
+                # its seat count changed
+                data = with_live_seats(data)
+                payload = payloads.get(("flight", flight_id), data, lambda: FlightModel(**data))
+                return payload.response(request)
     except Exception as e:
         print(f"Error fetching flight: {e}")
     # Fallback mock data
-    if flight_id == "1":
-        return FlightModel(
-            id="1", airlineName="Air India", flightNumber="AI101", departureCity="Delhi", arrivalCity="London", departureAirport="DEL", arrivalAirport="LHR", departureTime="2024-06-01T10:00:00Z", arrivalTime="2024-06-01T14:00:00Z", price=50000, availableSeats=5, travelClasses=["Economy", "Business"], amenities=["meal", "wifi"], status="Scheduled", gate="A1", terminal="T3", lastUpdated=None, logo=None, isNonStop=True
-        )
-    elif flight_id == "2":
-        return FlightModel(
-            id="2", airlineName="Emirates", flightNumber="EK202", departureCity="Dubai", arrivalCity="New York", departureAirport="DXB", arrivalAirport="JFK", departureTime="2024-06-02T08:00:00Z", arrivalTime="2024-06-02T16:00:00Z", price=70000, availableSeats=3, travelClasses=["Economy", "Business", "First"], amenities=["meal", "entertainment"], status="Scheduled", gate="B2", terminal="T1", lastUpdated=None, logo=None, isNonStop=True
-        )
+    payload = MOCK_FLIGHT_PAYLOADS.get(flight_id)
+    if payload is not None:
+        return payload.response(request)
     raise HTTPException(status_code=404, detail="Flight not found")
 
-@app.post("/bookings", response_model=BookingModel)
-async def create_booking(booking: BookingModel = Body(...)):
+@app.patch("/flights/{flight_id}/status", response_model=FlightModel)
+async def update_flight_status(flight_id: str, update: FlightStatusUpdate = Body(...),
+                               api_key: str = Depends(verify_api_key)):
+    # For operations tools: gate/terminal are only changed when given
+    if repository is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Flight updates are unavailable")
+    fields = {name: value for name, value in update.dict().items() if value is not None}
+    fields["lastUpdated"] = datetime.now(timezone.utc).isoformat()
     try:
-        if 'db' in globals():
-            booking_id = db.collection('bookings').document().id
+        updated = await repository.update_flight(flight_id, fields)
+    except Exception as e:
+        print(f"Error updating flight status: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update flight")
+    finally:
+        # Even a failed or timed-out write may have landed
+        flight_cache.invalidate(flight_id)
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flight not found")
+    flight_search.update_status(flight_id, fields)
+    data = await flight_cache.get(flight_id, repository.get_flights)
+    if data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Flight not found")
+    return FlightModel(**with_live_seats(data))
+
+async def websocket_refusal(websocket: WebSocket) -> Optional[str]:
+    # The API key, ID token and rate limit checks of the HTTP routes; their
+    # dependencies take a Request, which FastAPI doesn't pass to WebSockets
+    api_key = websocket.headers.get("x-api-key")
+    if api_key is None or (settings.API_KEY != "dev-key" and api_key != settings.API_KEY):
+        return "Invalid API key"
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            claims = await token_verifier.verify(token)
+        except InvalidTokenError as e:
+            return f"Invalid ID token: {e}"
+        websocket.state.user_id = claims["uid"]
+    elif settings.AUTH_REQUIRED:
+        return "Not authenticated"
+    return await websocket_rate_limit(websocket)
+
+async def websocket_rate_limit(websocket: WebSocket) -> Optional[str]:
+    try:
+        await limiter.check(websocket, settings.RATE_LIMIT_LOOKUP_COST, "browse",
+                            settings.RATE_LIMIT_BROWSE_PER_MINUTE)
+    except HTTPException as e:
+        return e.detail
+    return None
+
+@app.websocket("/ws/flights")
+async def flight_updates_socket(websocket: WebSocket, flight_ids: Optional[str] = None):
+    # Live status of the flights in ?flight_ids=a,b and those sent as
+    # {"action": "subscribe", "flight_ids": [...]}; see app/flight_updates.py
+    refusal = await websocket_refusal(websocket)
+    if refusal is not None:
+        # Before accept(), so the handshake itself is refused
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=refusal)
+        return
+    await websocket.accept()
+    if repository is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Flight updates are unavailable")
+        return
+    subscriber = flight_updates.connect(lambda message: websocket.send_text(message.decode()), websocket.close)
+
+    def apply(action: str, ids):
+        # Each id on its own, so one bad id doesn't end the connection
+        for flight_id in ids:
+            try:
+                if action == "subscribe":
+                    flight_updates.subscribe(subscriber, flight_id)
+                else:
+                    flight_updates.unsubscribe(subscriber, flight_id)
+            except SubscriptionError as e:
+                flight_updates.error(subscriber, str(e))
+            except Exception as e:
+                print(f"Error watching flight {flight_id}: {e}")
+                flight_updates.error(subscriber, f"Could not watch flight {flight_id[:64]}")
+
+    try:
+        apply("subscribe", [flight_id for flight_id in (flight_ids or "").split(",") if flight_id])
+        while True:
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+                action, ids = request["action"], request["flight_ids"]
+                if action not in ("subscribe", "unsubscribe") or not isinstance(ids, list) or \
+                        len(ids) > settings.WS_MAX_FLIGHTS_PER_CONNECTION or \
+                        not all(isinstance(flight_id, str) and flight_id for flight_id in ids):
+                    raise ValueError
+            except (ValueError, KeyError, TypeError):
+                flight_updates.error(subscriber, 'Expected {"action": "subscribe" | "unsubscribe", "flight_ids": [...]}')
+                continue
+            refusal = await websocket_rate_limit(websocket)
+            if refusal is not None:
+                flight_updates.error(subscriber, refusal)
+                continue
+            apply(action, ids)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        flight_updates.disconnect(subscriber)
+
+
+@app.post("/flights/{flight_id}/holds", response_model=HoldModel, dependencies=[authenticated, browse_rate_limit])
+async def hold_seats(flight_id: str, request: HoldRequest = Body(...), uid: Optional[str] = authenticated):
+    check_user(uid, request.user_id)
+    # Seats are held until expiresAt; pass the hold's id as hold_id to
+    # POST /bookings (as the same user) to turn it into a booking
+    user_id = request.user_id or uid
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_id is required to hold seats")
+    if repository is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Booking is unavailable")
+    try:
+        if not await flight_exists(flight_id):
+            raise UnknownFlightError(f"Flight {flight_id[:64]} not found")
+        hold = await inventory.hold(flight_id, request.seats, user_id=user_id)
+    except UnknownFlightError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SeatsUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except InventoryBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                            headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        # Seats the hold may have taken come back when it expires
+        print(f"Timed out holding seats on flight {flight_id}")
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Hold timed out",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"Error holding seats: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Booking is unavailable")
+    return HoldModel(id=hold["id"], flight_id=flight_id, seats=hold["seats"],
+                     expiresAt=hold["expiresAt"].isoformat())
+
+@app.delete("/holds/{hold_id}", dependencies=[browse_rate_limit])
+async def release_hold(hold_id: str):
+    if repository is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Booking is unavailable")
+    try:
+        released = await inventory.release(hold_id)
+    except InventoryBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                            headers={"Retry-After": "1"})
+    if not released:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hold not found")
+    return {"status": "released"}
+
+@app.post("/bookings", response_model=BookingModel, dependencies=[authenticated, browse_rate_limit])
+async def create_booking(booking: BookingModel = Body(...),
+                         idempotency_key: Optional[str] = Header(None),
+                         uid: Optional[str] = authenticated):
+    check_user(uid, booking.user_id)
+    try:
+        if repository is not None:
+            # The same Idempotency-Key always maps to the same booking id, so
+            # a retried request gets the original booking back
+            booking_id = (booking_id_for(booking.user_id, idempotency_key) if idempotency_key
+                          else repository.new_booking_id())
             booking.id = booking_id
-            booking.bookingTime = firestore.SERVER_TIMESTAMP
-            db.collection('bookings').document(booking_id).set(booking.dict())
-            return booking
+            # Stored with the server's clock; the response can't carry the
+            # sentinel, so it reports the time the request was handled
+            data = booking.dict()
+            data['bookingTime'] = server_timestamp()
+            if not await flight_exists(booking.flight_id):
+                raise UnknownFlightError(f"Flight {booking.flight_id[:64]} not found")
+            stored, created = await inventory.book(data, booking_id, booking.hold_id)
+            if not created:
+                return FastJSONResponse(BookingModel(**stored))
+            booking.bookingTime = datetime.now(timezone.utc).isoformat()
+            return FastJSONResponse(booking)
+    except UnknownFlightError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except (SeatsUnavailableError, InvalidHoldError) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except InventoryBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                            headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        # The transaction may or may not have committed; a retry with the
+        # same Idempotency-Key returns the booking if it did
+        print(f"Timed out creating booking {booking.id}")
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Booking timed out",
+                            headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Error creating booking: {e}")
+        if repository is not None:
+            # Never a made-up confirmation for a real booking
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Booking is unavailable")
     # Fallback mock response
     booking.id = "mock123"
     booking.bookingTime = "2024-06-01T12:00:00Z"
     return booking
 
-@app.get("/bookings/{user_id}", response_model=List[BookingModel])
-async def get_user_bookings(user_id: str):
+@app.get("/bookings/{user_id}", response_model=List[BookingModel], dependencies=[authenticated, browse_rate_limit])
+async def get_user_bookings(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    page: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
+    uid: Optional[str] = authenticated,
+):
+    check_user(uid, user_id)
+    after = parse_cursor("bookings", cursor)
     try:
-        if 'db' in globals():
-            bookings_ref = db.collection('bookings').where('user_id', '==', user_id)
-            docs = bookings_ref.stream()
-            bookings = [BookingModel(**doc.to_dict()) for doc in docs]
-            return bookings
+        if repository is not None:
+            docs, next_key = await repository.get_user_bookings(
+                user_id, limit=limit, offset=(page - 1) * limit, after=after
+            )
+            bookings = [BookingModel(**data) for data in docs]
+            return FastJSONResponse(bookings, headers=next_cursor_headers("bookings", next_key))
     except Exception as e:
         print(f"Error fetching bookings: {e}")
     # Fallback mock data
     return []
 
-@app.get("/flights/search", response_model=List[FlightModel])
-@limiter.limit("60/minute")
-async def search_flights(
-    request: Request,
-    params: FlightSearchParams = Depends(),
-    api_key: str = Depends(verify_api_key)
-):
-    try:
-        # For now, return mock data since we don't have a real database
-        mock_flights = [
-            FlightModel(
-                id="1",
-                airlineName="Air India",
-                flightNumber="AI101",
-                departureCity="Delhi",
-                arrivalCity="London",
-                departureAirport="DEL",
-                arrivalAirport="LHR",
-                departureTime="2024-06-01T10:00:00Z",
-                arrivalTime="2024-06-01T14:00:00Z",
-                price=50000,
-                availableSeats=5,
-                travelClasses=["Economy", "Business"],
-                amenities=["meal", "wifi"],
-                status="Scheduled",
-                gate="A1",
-                terminal="T3",
-                lastUpdated=None,
-                logo=None,
-                isNonStop=True
-            ),
-            FlightModel(
-                id="2",
-                airlineName="Emirates",
-                flightNumber="EK202",
-                departureCity="Dubai",
-                arrivalCity="New York",
-                departureAirport="DXB",
-                arrivalAirport="JFK",
-                departureTime="2024-06-02T08:00:00Z",
-                arrivalTime="2024-06-02T16:00:00Z",
-                price=70000,
-                availableSeats=3,
-                travelClasses=["Economy", "Business", "First"],
-                amenities=["meal", "entertainment"],
-                status="Scheduled",
-                gate="B2",
-                terminal="T1",
-                lastUpdated=None,
-                logo=None,
-                isNonStop=True
-            ),
-            FlightModel(
-                id="3",
-                airlineName="British Airways",
-                flightNumber="BA123",
-                departureCity="London",
-                arrivalCity="Paris",
-                departureAirport="LHR",
-                arrivalAirport="CDG",
-                departureTime="2024-06-03T09:00:00Z",
-                arrivalTime="2024-06-03T11:00:00Z",
-                price=45000,
-                availableSeats=8,
-                travelClasses=["Economy", "Business"],
-                amenities=["meal", "wifi", "entertainment"],
-                status="Scheduled",
-                gate="C3",
-                terminal="T2",
-                lastUpdated=None,
-                logo=None,
-                isNonStop=True
-            )
-        ]
-
-        # Apply filters to mock data
-        filtered_flights = mock_flights
-
-        if params.departure_city:
-            filtered_flights = [f for f in filtered_flights if f.departureCity.lower() == params.departure_city.lower()]
-        if params.arrival_city:
-            filtered_flights = [f for f in filtered_flights if f.arrivalCity.lower() == params.arrival_city.lower()]
-        if params.travel_class:
-            filtered_flights = [f for f in filtered_flights if params.travel_class in f.travelClasses]
-        if params.max_price:
-            filtered_flights = [f for f in filtered_flights if f.price <= params.max_price]
-        if params.passengers:
-            filtered_flights = [f for f in filtered_flights if f.availableSeats >= params.passengers]
-
-        # Apply pagination
-        start_idx = (params.page - 1) * params.limit
-        end_idx = start_idx + params.limit
-        paginated_flights = filtered_flights[start_idx:end_idx]
-
-        return paginated_flights
-
-    except Exception as e:
-        print(f"Error searching flights: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to search flights: {str(e)}"
-        )
-
-# Run the app with: uvicorn app.main:app --reload
+# Run the app with: python run.py (production) or python run.py --reload
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
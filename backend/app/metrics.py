@@ -0,0 +1,306 @@
+# backend/app/metrics.py
+"""Request and dependency metrics in the Prometheus text format.
+
+A small self-contained registry (counters, gauges, histograms with labels)
+so the hot path is a dict lookup and a ``bisect`` per observation:
+
+* ``MetricsMiddleware`` records per-route latency and status, and the
+  number of requests in flight
+* ``span()`` / ``timed()`` time calls to Firestore and Gemini
+* ``Registry.collector()`` callbacks read cache and queue statistics only
+  when /metrics is scraped
+"""
+import math
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+# Seconds; covers a cached lookup up to a slow LLM reply
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield "_total", self.labelnames, values, child.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield "", self.labelnames, values, child.value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # Buckets are "less than or equal", so bisect_left finds the first bound >= value
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                yield "_bucket", bucket_names, values + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, values, child.sum
+            yield "_count", self.labelnames, values, cumulative
+
+
+class _Collected(_Metric):
+    """A metric whose samples come from a callback at scrape time."""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._callback = callback
+
+    def samples(self):
+        suffix = "_total" if self.kind == "counter" else ""
+        for values, value in self._callback():
+            yield suffix, self.labelnames, tuple(values), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, kind: str, name: str, documentation: str, labelnames: Sequence[str],
+                  callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        """Register ``callback`` returning ``(label values, value)`` pairs."""
+        return self.register(_Collected(kind, name, documentation, labelnames, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to send the complete response", ("method", "route"))
+REQUESTS = REGISTRY.counter(
+    "http_requests", "Requests by route and status code", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "Requests currently being handled").labels()
+DEPENDENCY_DURATION = REGISTRY.histogram(
+    "dependency_call_duration_seconds", "Time spent in calls to Firestore and Gemini",
+    ("dependency", "operation"))
+DEPENDENCY_ERRORS = REGISTRY.counter(
+    "dependency_call_errors", "Failed calls to Firestore and Gemini", ("dependency", "operation"))
+DEPENDENCY_IN_FLIGHT = REGISTRY.gauge(
+    "dependency_calls_in_flight", "Calls to Firestore and Gemini in progress", ("dependency",))
+
+
+class span:
+    """Time one call to an external dependency (``with span("firestore", "get_flight"):``)."""
+
+    __slots__ = ("dependency", "operation", "start")
+
+    def __init__(self, dependency: str, operation: str):
+        self.dependency = dependency
+        self.operation = operation
+
+    def __enter__(self):
+        DEPENDENCY_IN_FLIGHT.labels(self.dependency).inc()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        DEPENDENCY_DURATION.labels(self.dependency, self.operation).observe(
+            time.perf_counter() - self.start)
+        DEPENDENCY_IN_FLIGHT.labels(self.dependency).dec()
+        if exc_type is not None and issubclass(exc_type, Exception):
+            DEPENDENCY_ERRORS.labels(self.dependency, self.operation).inc()
+        return False
+
+
+def timed(dependency: str, operation: Optional[str] = None):
+    """Decorator form of ``span()`` for coroutine functions."""
+    def decorator(func):
+        name = operation or func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(dependency, name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight requests.
+
+    Requests are labelled with the route template (``/flights/{flight_id}``),
+    never the raw path, so label cardinality stays bounded. The router stores
+    the matched endpoint in the (shared) scope, so the template is looked up
+    from that after the fact instead of matching the path a second time.
+    ``profiler`` is an optional hook with ``should_profile(scope)`` and the
+    async context manager ``profile(scope)`` (see app/profiling.py).
+    """
+
+    def __init__(self, app, routes: Callable[[], Sequence] = None, profiler=None):
+        self.app = app
+        self._routes = routes
+        self._templates: Dict[object, str] = {}
+        self.profiler = profiler
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            # First request to this endpoint, or routes were added since
+            self._templates = {
+                getattr(route, "endpoint", None) or getattr(route, "app", None): route.path
+                for route in self._routes()
+            }
+            template = self._templates.get(endpoint, "unmatched")
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            if self.profiler is not None and self.profiler.should_profile(scope):
+                async with self.profiler.profile(scope) as headers:
+                    async def send_profiled(message):
+                        if message["type"] == "http.response.start":
+                            message["headers"] = list(message.get("headers", [])) + headers
+                        await send_wrapper(message)
+                    await self.app(scope, receive, send_profiled)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = self._route(scope)
+            REQUEST_DURATION.labels(scope["method"], route).observe(elapsed)
+            REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            REQUESTS_IN_FLIGHT.dec()
@@ -0,0 +1,75 @@
+# backend/app/pagination.py
+"""Opaque keyset-pagination cursors.
+
+A cursor is the sort key of the last item on a page (e.g. ``[departureTime,
+id]``), JSON-encoded and base64url'd together with a scope so a bookings
+cursor can't be replayed against flights. Datetimes (Firestore timestamps)
+round-trip through a tagged ISO string. Cursors come from clients, so
+anything that doesn't decode to ``[value, id]`` raises ``InvalidCursorError``.
+"""
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Type, Union
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(scope: str, key: Sequence[Any]) -> str:
+    payload = json.dumps({"s": scope, "k": [_encode_value(v) for v in key]},
+                         separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(scope: str, token: str,
+                  value_types: Union[Type, Tuple[Type, ...]] = (str, int, float, datetime)) -> List[Any]:
+    """The ``[sort value, id]`` key in a cursor issued for ``scope``; the
+    sort value must be one of ``value_types``.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        token_scope, key = payload["s"], payload["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+    if token_scope != scope:
+        raise InvalidCursorError(f"Cursor is not valid for {scope}")
+    if not isinstance(key, list):
+        raise InvalidCursorError("Malformed cursor")
+    try:
+        key = [_decode_value(v) for v in key]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+    if (len(key) != 2 or not isinstance(key[1], str) or isinstance(key[0], bool)
+            or not isinstance(key[0], value_types)):
+        raise InvalidCursorError("Malformed cursor")
+    return key
+
+
+def keyset_page(items: Sequence[Any], key: Callable[[Any], Tuple], after: Optional[Sequence[Any]],
+                limit: int) -> Tuple[List[Any], Optional[Tuple]]:
+    """Page through ``items`` (already sorted by ``key``) after a cursor key.
+
+    Returns the page and the key of its last item, or None when this is the
+    last page.
+    """
+    start = bisect_right(items, tuple(after), key=key) if after else 0
+    page = list(items[start:start + limit])
+    has_more = start + limit < len(items)
+    return page, (key(page[-1]) if page and has_more else None)
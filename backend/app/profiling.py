@@ -0,0 +1,110 @@
+# backend/app/profiling.py
+"""Opt-in sampling profiler for individual requests.
+
+When enabled, a request carrying ``X-Profile: 1`` (or a random
+``sample_rate`` fraction of all requests) is profiled by a background thread
+that samples the event-loop thread's stack every ``interval`` seconds. The
+samples are written as folded stacks (``frame;frame;frame count``, the input
+format of flamegraph.pl and speedscope) to ``output_dir/<id>.folded`` and the
+id is returned in the ``X-Profile-Id`` response header.
+
+Sampling sees everything the event loop runs while the request is in
+flight, including other concurrent requests, and costs nothing when no
+request is being profiled. Only one request is profiled at a time.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+
+
+def _fold(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, target_thread: int, interval: float):
+        super().__init__(name="profiler", daemon=True)
+        self.target_thread = target_thread
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread)
+            if frame is not None:
+                self.samples[_fold(frame)] += 1
+
+    def stop(self) -> Counter:
+        self._done.set()
+        self.join()
+        return self.samples
+
+
+class SamplingProfiler:
+    def __init__(self, enabled: bool = False, sample_rate: float = 0.0,
+                 interval: float = 0.001, output_dir: str = "profiles",
+                 header: str = "x-profile"):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self._header = header.encode()
+        self._lock = threading.Lock()
+        self._active = False
+
+    def should_profile(self, scope) -> bool:
+        if not self.enabled or self._active:
+            return False
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return any(name == self._header and value not in (b"", b"0")
+                   for name, value in scope["headers"])
+
+    @asynccontextmanager
+    async def profile(self, scope):
+        """Profile the enclosed block; yields extra response headers."""
+        with self._lock:
+            busy = self._active
+            self._active = True
+        if busy:
+            # Lost the race to another request; run unprofiled
+            yield []
+            return
+        profile_id = uuid.uuid4().hex[:16]
+        sampler = _Sampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            yield [(b"x-profile-id", profile_id.encode())]
+        finally:
+            # Joining the sampler and writing the file would stall every
+            # request on the loop
+            await asyncio.to_thread(self._finish, sampler, profile_id, scope)
+
+    def _finish(self, sampler: _Sampler, profile_id: str, scope):
+        samples = sampler.stop()
+        with self._lock:
+            self._active = False
+        self._write(profile_id, scope, samples)
+
+    def _write(self, profile_id: str, scope, samples: Counter):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{profile_id}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            print(f"Wrote profile of {scope['method']} {scope['path']} to {path} "
+                  f"({sum(samples.values())} samples)")
+        except OSError as e:
+            print(f"Error writing profile {profile_id}: {e}")
@@ -0,0 +1,281 @@
+# backend/app/rate_limit.py
+"""Token-bucket rate limiting shared by all worker processes.
+
+Every client gets one bucket of ``burst`` units refilled at ``per_minute``
+units a minute; each route spends its own cost from it, so a chat (which
+holds an LLM slot for seconds) costs more than a flight lookup. Routes may
+instead spend from a separately named bucket with its own, larger budget,
+so ordinary browsing doesn't eat into the search and chat limits. Clients
+are identified by API key when it has its own quota (partner keys; the
+app's shared key would put every user in one bucket), then by authenticated
+user, then by IP. Behind a load balancer every client has the balancer's IP
+unless ``trust_forwarded_for`` is set (only do that when the proxy sets
+X-Forwarded-For, or clients can pick their own key).
+
+Bucket stores, all O(1) per check:
+
+* ``InMemoryBucketStore``: one process only (tests, ``--reload``)
+* ``SharedMemoryBucketStore``: a fixed-size hash table in POSIX shared
+  memory, guarded by striped file locks, so every uvicorn worker on the
+  host sees the same buckets for a microsecond-level cost
+* ``RedisBucketStore``: buckets in Redis (needs the ``redis`` package) for
+  limits shared across hosts, at the cost of a round trip per check
+"""
+import hashlib
+import math
+import os
+import tempfile
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locks, in-memory store only
+    fcntl = None
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class InMemoryBucketStore:
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Spend ``cost`` from ``key``'s bucket; 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = capacity if bucket is None else _refill(bucket[0], bucket[1], now, capacity, rate)
+        if tokens < cost:
+            return (cost - tokens) / rate
+        if bucket is None and len(self._buckets) >= self.max_keys:
+            # Oldest insertion first; a dropped bucket just starts full again
+            self._buckets.pop(next(iter(self._buckets)))
+        self._buckets[key] = (tokens - cost, now)
+        return 0.0
+
+
+class SharedMemoryBucketStore:
+    """Open-addressing hash table of (key hash, tokens, updated) in shared memory.
+
+    The first worker creates the segment, later ones attach to it by name.
+    Slots come in groups of ``probes``, and a key is looked up only in
+    its home slot's group; when every slot there is taken by other keys
+    the least recently updated one is reused (an idle bucket refills to
+    full anyway). Groups are locked in stripes with ``lockf`` byte-range
+    locks on a small lock file, so a slot is always under the same lock.
+    """
+
+    STRIPES = 64
+
+    def __init__(self, name: str = "skyview-ratelimit", slots: int = 65536, probes: int = 8):
+        if fcntl is None:
+            raise RuntimeError("shared-memory rate limiting needs POSIX file locks")
+        if slots % probes:
+            raise ValueError("slots must be a multiple of probes")
+        self.slots = slots
+        self.probes = probes
+        size = slots * 8 * 3
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+            if self._shm.size < size:
+                raise RuntimeError(f"shared memory segment {name} is too small")
+        # Every worker attaches and detaches, only the OS removes the segment
+        # (at reboot, or via unlink()); don't let this process's resource
+        # tracker delete it when one worker exits
+        _untrack(self._shm)
+        buffer = self._shm.buf
+        self._keys = buffer[:slots * 8].cast("Q")
+        self._tokens = buffer[slots * 8:slots * 16].cast("d")
+        self._updated = buffer[slots * 16:slots * 24].cast("d")
+        lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Stable across processes (str hash() is salted per process); 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        key_hash = self._hash(key)
+        home = key_hash % self.slots
+        group = home - home % self.probes
+        stripe = (group // self.probes) % self.STRIPES
+        fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+        try:
+            now = time.monotonic()
+            keys, updated = self._keys, self._updated
+            slot, victim = -1, home
+            for probe in range(self.probes):
+                index = group + (home + probe) % self.probes
+                if keys[index] == key_hash:
+                    slot = index
+                    break
+                if keys[index] == 0:
+                    victim = index
+                    break
+                if updated[index] < updated[victim]:
+                    victim = index
+
+            if slot >= 0:
+                tokens = _refill(self._tokens[slot], updated[slot], now, capacity, rate)
+            else:
+                slot, tokens = victim, capacity
+            if tokens < cost:
+                return (cost - tokens) / rate
+            keys[slot] = key_hash
+            self._tokens[slot] = tokens - cost
+            updated[slot] = now
+            return 0.0
+        finally:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def close(self):
+        for view in (self._keys, self._tokens, self._updated):
+            view.release()
+        self._shm.close()
+        os.close(self._lock_fd)
+
+    def unlink(self):
+        """Remove the segment (tests and benchmarks; workers only close())."""
+        # unlink() also unregisters from the resource tracker, which
+        # complains about a name it was never told about
+        _track(self._shm)
+        self._shm.unlink()
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _track(shm: shared_memory.SharedMemory):
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+# KEYS[1] bucket; ARGV cost, capacity, rate/s. Returns seconds to wait
+# (as a string, Lua numbers become integers), "0" when allowed.
+_REDIS_TAKE = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local cost, capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = capacity
+if bucket[1] then
+  tokens = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+end
+if tokens < cost then
+  return tostring((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - cost, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return '0'
+"""
+
+
+class RedisBucketStore:
+    """Buckets in Redis, for limits shared across hosts (needs the ``redis`` package)."""
+
+    def __init__(self, url: str, prefix: str = "skyview:ratelimit:"):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self._script = self._client.register_script(_REDIS_TAKE)
+        self._prefix = prefix
+
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        return float(await self._script(keys=[self._prefix + key], args=[cost, capacity, rate]))
+
+
+class RateLimiter:
+    def __init__(self, store, per_minute: int = 60, burst: Optional[int] = None,
+                 quotas: Optional[Dict[str, int]] = None, trust_forwarded_for: bool = False):
+        self.store = store
+        self.per_minute = per_minute
+        self.burst = burst
+        # API key -> units per minute; only these keys get their own bucket,
+        # so made-up keys can't be used to dodge the limit
+        self.quotas = quotas or {}
+        self.trust_forwarded_for = trust_forwarded_for
+        self.enabled = True
+        self.limited = 0
+
+    def client_key(self, request: Request) -> Tuple[str, int]:
+        """Who is making the request, and their units per minute."""
+        api_key = request.headers.get("x-api-key")
+        if api_key in self.quotas:
+            # Hashed so raw keys never sit in shared memory or Redis
+            digest = hashlib.blake2b(api_key.encode(), digest_size=12).hexdigest()
+            return f"key:{digest}", self.quotas[api_key]
+        # request.state.user_id, read from the scope directly: going through
+        # State costs a raised AttributeError when it isn't set
+        scope = request.scope
+        user_id = scope.get("state", {}).get("user_id")
+        if user_id:
+            return f"user:{user_id}", self.per_minute
+        forwarded = request.headers.get("x-forwarded-for") if self.trust_forwarded_for else None
+        if forwarded:
+            # The rightmost entry is the one our proxy appended; anything to
+            # its left is whatever the client sent
+            return f"ip:{forwarded.split(',')[-1].strip()}", self.per_minute
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}", self.per_minute
+
+    async def check(self, request: Request, cost: float, bucket: Optional[str] = None,
+                    budget: Optional[int] = None):
+        """Spend ``cost`` from the caller's bucket, or from their ``bucket``
+        of ``budget`` units a minute (their own quota if that is larger)."""
+        if not self.enabled:
+            return
+        key, per_minute = self.client_key(request)
+        capacity = self.burst or per_minute
+        if bucket is not None:
+            key, per_minute = f"{bucket}:{key}", max(per_minute, budget or 0)
+            capacity = per_minute
+        rate = per_minute / 60.0
+        capacity = max(capacity, cost)
+        wait = await self.store.take(key, cost, capacity, rate)
+        if wait:
+            self.limited += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded: {per_minute} units per minute",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def cost(self, units: float, bucket: Optional[str] = None, budget: Optional[int] = None):
+        """A route dependency spending ``units`` from the caller's bucket (see check())."""
+        async def rate_limit(request: Request):
+            await self.check(request, units, bucket, budget)
+        return rate_limit
+
+
+def build_rate_limiter(store: str = "shared", per_minute: int = 60, burst: Optional[int] = None,
+                       quotas: Optional[Dict[str, int]] = None, trust_forwarded_for: bool = False,
+                       redis_url: Optional[str] = None, shm_name: str = "skyview-ratelimit",
+                       slots: int = 65536) -> RateLimiter:
+    backend = None
+    try:
+        if store == "redis" and redis_url:
+            backend = RedisBucketStore(redis_url)
+        elif store == "shared":
+            backend = SharedMemoryBucketStore(shm_name, slots)
+    except Exception as e:
+        print(f"Shared rate limit store unavailable, limiting per process: {e}")
+    if backend is None:
+        backend = InMemoryBucketStore()
+    return RateLimiter(backend, per_minute, burst, quotas, trust_forwarded_for)
@@ -0,0 +1,194 @@
+# backend/app/recommendations.py
+"""Precomputed destination recommendations.
+
+A background task periodically materializes the global popular list and a
+list per recently active user (destinations from their bookings, then
+popular places in the same countries, then the global list). /recommendations
+only ever reads these in-memory snapshots: an unknown user gets the global
+list while their own is computed in the background, and a stale user list is
+served as-is while it is refreshed (stale-while-revalidate). At most
+``max_pending`` user refreshes wait at a time; beyond that a user keeps
+getting the global (or their stale) list until one is scheduled later.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Fallback: mock data, served until the first refresh succeeds
+DEFAULT_RECOMMENDATIONS = [
+    {"city": "London", "country": "UK", "code": "LHR", "airportName": "Heathrow Airport", "imageUrl": None},
+    {"city": "Paris", "country": "France", "code": "CDG", "airportName": "Charles de Gaulle Airport", "imageUrl": None},
+    {"city": "New York", "country": "USA", "code": "JFK", "airportName": "John F. Kennedy International Airport", "imageUrl": None},
+    {"city": "Dubai", "country": "UAE", "code": "DXB", "airportName": "Dubai International Airport", "imageUrl": None},
+    {"city": "Singapore", "country": "Singapore", "code": "SIN", "airportName": "Changi Airport", "imageUrl": None},
+]
+
+
+def location_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "city": data.get("city"),
+        "country": data.get("country"),
+        "code": data.get("code"),
+        "airportName": data.get("airportName"),
+        "imageUrl": data.get("imageUrl"),
+    }
+
+
+class RecommendationService:
+    def __init__(self, size: int = 5, refresh_interval: float = 300.0,
+                 max_users: int = 10000, candidate_pool: int = 50, max_concurrent_refreshes: int = 4,
+                 max_pending: int = 1000):
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self.candidate_pool = candidate_pool
+        self.repository = None
+
+        self._global: List[Dict[str, Any]] = DEFAULT_RECOMMENDATIONS[:size]
+        self._global_at: Optional[float] = None
+        self._locations: List[Dict[str, Any]] = []
+        self._users: "OrderedDict[str, Tuple[List[Dict[str, Any]], float]]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._refresh_slots = asyncio.Semaphore(max_concurrent_refreshes)
+        self._task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refresh_errors = 0
+        self.refreshes_dropped = 0
+        self.last_refresh_seconds = 0.0
+
+    # Hot path: never awaits anything
+
+    def get(self, user_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], float]:
+        """Recommendations for ``user_id`` (or the global list) and their age in seconds."""
+        now = time.monotonic()
+        if user_id:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                recommendations, generated_at = entry
+                if now - generated_at > self.refresh_interval:
+                    self.stale_hits += 1
+                    self._schedule_user_refresh(user_id)
+                else:
+                    self.hits += 1
+                return recommendations, now - generated_at
+            self.misses += 1
+            self._schedule_user_refresh(user_id)
+        age = now - self._global_at if self._global_at is not None else float("inf")
+        return self._global, age
+
+    def _schedule_user_refresh(self, user_id: str):
+        if self.repository is None or user_id in self._pending:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.refreshes_dropped += 1
+            return
+        self._pending.add(user_id)
+        asyncio.get_running_loop().create_task(self._refresh_user_task(user_id))
+
+    # Background refresh
+
+    async def _refresh_user_task(self, user_id: str):
+        try:
+            async with self._refresh_slots:
+                await self.refresh_user(user_id)
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Error refreshing recommendations for {user_id}: {e}")
+        finally:
+            self._pending.discard(user_id)
+
+    async def refresh_global(self):
+        locations = await self.repository.popular_locations(limit=self.candidate_pool)
+        if locations:
+            self._locations = [location_summary(data) for data in locations]
+            self._global = self._locations[:self.size]
+        self._global_at = time.monotonic()
+
+    async def refresh_user(self, user_id: str):
+        bookings, _ = await self.repository.get_user_bookings(user_id, limit=self.candidate_pool)
+        flight_ids = [flight_id for flight_id in dict.fromkeys(booking.get("flight_id") for booking in bookings)
+                      if flight_id]
+        # One get_all round-trip for every booked flight
+        found = await self.repository.get_flights(flight_ids) if flight_ids else {}
+        flights = [found.get(flight_id) for flight_id in flight_ids]
+        by_city = {location["city"]: location for location in self._locations}
+
+        # Destinations they've flown to, most recent booking first
+        flown = []
+        for flight in flights:
+            if not flight or not flight.get("arrivalCity"):
+                continue
+            city = flight["arrivalCity"]
+            flown.append(by_city.get(city) or {
+                "city": city, "country": None, "code": flight.get("arrivalAirport"),
+                "airportName": None, "imageUrl": None,
+            })
+
+        # Then popular places in the same countries, then the global list
+        countries = {location["country"] for location in flown if location["country"]}
+        similar = [location for location in self._locations if location["country"] in countries]
+        merged, seen = [], set()
+        for location in flown + similar + self._global:
+            if location["city"] not in seen:
+                seen.add(location["city"])
+                merged.append(location)
+
+        self._users[user_id] = (merged[:self.size], time.monotonic())
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    async def refresh_all(self):
+        start = time.monotonic()
+        try:
+            await self.refresh_global()
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Error refreshing popular recommendations: {e}")
+        # Re-materialize every user list that has gone stale
+        cutoff = time.monotonic() - self.refresh_interval
+        for user_id, (_, generated_at) in list(self._users.items()):
+            if generated_at < cutoff:
+                self._schedule_user_refresh(user_id)
+        self.last_refresh_seconds = time.monotonic() - start
+
+    async def _run(self):
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, repository):
+        self.repository = repository
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        user_ages = [now - generated_at for _, generated_at in self._users.values()]
+        return {
+            "global_age_seconds": now - self._global_at if self._global_at is not None else None,
+            "users_cached": len(self._users),
+            "oldest_user_age_seconds": max(user_ages) if user_ages else None,
+            "refreshes_pending": len(self._pending),
+            "refreshes_dropped": self.refreshes_dropped,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_errors": self.refresh_errors,
+            "last_refresh_seconds": self.last_refresh_seconds,
+        }
@@ -0,0 +1,461 @@
+# backend/app/repository.py
+"""Firestore data access for the API handlers.
+
+All Firestore round-trips go through ``FirestoreRepository`` so the handlers in
+``main.py`` never block the event loop. With the async Firestore client the
+calls are awaited directly; with the sync client they are offloaded to a
+bounded thread pool. Every call is wrapped in a per-request timeout and
+timed into the ``dependency_call_duration_seconds`` histogram.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.metrics import timed
+
+_DEFAULT_TIMEOUT = object()
+
+
+def server_timestamp():
+    # Imported on first use: the Firestore package is slow to import and
+    # app.main shouldn't pay for it at import time
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    return SERVER_TIMESTAMP
+
+
+def valid_document_id(doc_id: str) -> bool:
+    """Whether Firestore takes ``doc_id`` as a document id rather than
+    failing the call (no path separators or reserved names, <= 1500 bytes)."""
+    return (bool(doc_id) and "/" not in doc_id and doc_id not in (".", "..")
+            and not (doc_id.startswith("__") and doc_id.endswith("__"))
+            and len(doc_id.encode()) <= 1500)
+
+
+class ContentionError(Exception):
+    """A transaction was aborted by concurrent writers on every attempt."""
+
+
+class FirestoreRepository:
+    def __init__(
+        self,
+        client: Any,
+        is_async: bool = False,
+        timeout: float = 5.0,
+        max_workers: int = 16,
+        watch_client: Any = None,
+    ):
+        self.client = client
+        self.is_async = is_async
+        # Snapshot listeners need a sync client; the async one can't watch
+        self.watch_client = watch_client or client
+        self.timeout = timeout
+        # Only the sync client needs worker threads
+        self._executor = None if is_async else ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="firestore"
+        )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Low-level helpers: build the query synchronously, run the RPC off-loop
+
+    async def _run(self, sync_call: Callable[[], Any], async_call: Callable[[], Any],
+                   timeout: Any = _DEFAULT_TIMEOUT):
+        # None disables the timeout, e.g. for the startup catalogue load
+        timeout = self.timeout if timeout is _DEFAULT_TIMEOUT else timeout
+        if self.is_async:
+            return await asyncio.wait_for(async_call(), timeout)
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self._executor, sync_call), timeout
+        )
+
+    async def _stream(self, query, timeout: Any = _DEFAULT_TIMEOUT) -> List[Any]:
+        async def collect():
+            return [doc async for doc in query.stream()]
+
+        return await self._run(lambda: list(query.stream()), collect, timeout)
+
+    async def _get(self, ref):
+        return await self._run(ref.get, ref.get)
+
+    async def _set(self, ref, data: Dict[str, Any]):
+        return await self._run(lambda: ref.set(data), lambda: ref.set(data))
+
+    async def _transact(self, refs: List[Any], decide: Callable, max_attempts: int = 5):
+        """Read ``refs`` and apply the writes ``decide`` asks for, atomically.
+
+        ``decide(snapshots)`` gets the snapshots in ``refs`` order and returns
+        ``(result, writes)``, each write being ``(op, ref, data)`` with op
+        ``set``, ``update`` or ``delete``. It is called again on every retry,
+        so it must not have side effects.
+        """
+        from google.api_core.exceptions import Aborted
+        from google.cloud.firestore import async_transactional, transactional
+
+        def apply(transaction, snapshots):
+            by_path = {snapshot.reference.path: snapshot for snapshot in snapshots}
+            result, writes = decide([by_path[ref.path] for ref in refs])
+            for op, ref, data in writes:
+                if op == 'delete':
+                    transaction.delete(ref)
+                else:
+                    getattr(transaction, op)(ref, data)
+            return result
+
+        @transactional
+        def run_sync(transaction):
+            return apply(transaction, list(transaction.get_all(refs)))
+
+        @async_transactional
+        async def run_async(transaction):
+            return apply(transaction, [snapshot async for snapshot in await transaction.get_all(refs)])
+
+        try:
+            return await self._run(
+                lambda: run_sync(self.client.transaction(max_attempts=max_attempts)),
+                lambda: run_async(self.client.transaction(max_attempts=max_attempts)),
+            )
+        except ValueError as e:
+            # What the transactional decorators raise once retries run out
+            if isinstance(e.__cause__, Aborted):
+                raise ContentionError(str(e)) from e
+            raise
+
+    # Flights
+
+    async def _page(self, query, sort_field: str, limit: int, offset: int,
+                    after: Optional[List[Any]]) -> Tuple[List[Dict[str, Any]], Optional[List[Any]]]:
+        """Run a keyset (``after``) or offset page of a query ordered by
+        ``sort_field`` then document id.
+
+        Returns the documents and the key of the last one, or None when there
+        is no further page. One extra document is fetched to tell.
+        """
+        if after is not None:
+            query = query.start_after({sort_field: after[0], '__name__': after[1]})
+        elif offset:
+            query = query.offset(offset)
+        docs = await self._stream(query.limit(limit + 1))
+        next_key = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_key = [docs[-1].get(sort_field), docs[-1].id]
+        return [doc.to_dict() for doc in docs], next_key
+
+    @timed('firestore')
+    async def list_flights(self, limit: int = 20, offset: int = 0,
+                           after: Optional[List[Any]] = None):
+        query = self.client.collection('flights').order_by('departureTime').order_by('__name__')
+        return await self._page(query, 'departureTime', limit, offset, after)
+
+    @timed('firestore')
+    async def all_flights(self) -> List[Dict[str, Any]]:
+        # Full catalogue read, used once at startup to build the search index
+        docs = await self._stream(self.client.collection('flights'), timeout=None)
+        return [doc.to_dict() for doc in docs]
+
+    @timed('firestore')
+    async def get_flight(self, flight_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self._get(self.client.collection('flights').document(flight_id))
+        return doc.to_dict() if doc.exists else None
+
+    @timed('firestore')
+    async def get_flights(self, flight_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Many flights in one get_all round-trip; unknown ids are left out."""
+        refs = [self.client.collection('flights').document(flight_id) for flight_id in flight_ids]
+
+        async def collect():
+            return [doc async for doc in self.client.get_all(refs)]
+
+        docs = await self._run(lambda: list(self.client.get_all(refs)), collect)
+        # get_all doesn't keep the order of refs
+        return {doc.id: doc.to_dict() for doc in docs if doc.exists}
+
+    @timed('firestore')
+    async def update_flight(self, flight_id: str, fields: Dict[str, Any]) -> bool:
+        """Update some fields of a flight; False if it doesn't exist."""
+        from google.api_core.exceptions import NotFound
+
+        ref = self.client.collection('flights').document(flight_id)
+        try:
+            await self._run(lambda: ref.update(fields), lambda: ref.update(fields))
+        except NotFound:
+            return False
+        return True
+
+    def watch_flight(self, flight_id: str, on_change: Callable[[Optional[Dict[str, Any]]], None]):
+        """Listen to one flight document; returns the watch (``unsubscribe()`` it).
+
+        ``on_change`` gets the document (None while it doesn't exist), first
+        as it is now and then after every write. It runs on the Firestore
+        client's watch thread, not the event loop.
+        """
+        def callback(snapshots, changes, read_time):
+            on_change(next((snapshot.to_dict() for snapshot in snapshots if snapshot.exists), None))
+
+        return self.watch_client.collection('flights').document(flight_id).on_snapshot(callback)
+
+    # Bookings
+
+    def new_booking_id(self) -> str:
+        # Document ids are generated client-side, no round-trip needed
+        return self.client.collection('bookings').document().id
+
+    @timed('firestore')
+    async def create_booking(self, booking_id: str, data: Dict[str, Any]):
+        await self._set(self.client.collection('bookings').document(booking_id), data)
+
+    @timed('firestore')
+    async def get_booking(self, booking_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self._get(self.client.collection('bookings').document(booking_id))
+        return _booking_dict(doc.to_dict()) if doc.exists else None
+
+    @timed('firestore')
+    async def get_user_bookings(self, user_id: str, limit: int = 50, offset: int = 0,
+                                after: Optional[List[Any]] = None):
+        # Newest first, served by the (user_id, bookingTime DESC) composite index
+        query = (
+            self.client.collection('bookings')
+            .where('user_id', '==', user_id)
+            .order_by('bookingTime', direction='DESCENDING')
+            .order_by('__name__', direction='DESCENDING')
+        )
+        docs, next_key = await self._page(query, 'bookingTime', limit, offset, after)
+        return [_booking_dict(data) for data in docs], next_key
+
+    # Seat inventory: each flight's free seats are split over ``seat_shards``
+    # documents so concurrent bookings mostly write different documents, and
+    # a booking may first take seats into a ``seat_holds`` document that
+    # expires. See app/inventory.py.
+
+    def _shard_ref(self, flight_id: str, shard: int):
+        return self.client.collection('seat_shards').document(f"{flight_id}_{shard}")
+
+    def _hold_ref(self, hold_id: str):
+        return self.client.collection('seat_holds').document(hold_id)
+
+    def new_hold_id(self) -> str:
+        return self.client.collection('seat_holds').document().id
+
+    def _seat_refs(self, flight_id: str, shards: List[int], init: bool) -> List[Any]:
+        refs = [self._shard_ref(flight_id, n) for n in shards]
+        if init:
+            refs.insert(0, self.client.collection('flights').document(flight_id))
+        return refs
+
+    def _take(self, flight_id: str, shards: List[int], refs: List[Any], snapshots: List[Any],
+              seats: int, init: bool):
+        """Take ``seats`` from the shard snapshots, creating missing shards when ``init``.
+
+        With ``init``, ``shards`` is every shard and the flight document comes
+        first: the first time, its ``availableSeats`` are spread evenly over
+        the shards; shards added later (a larger shard count) start empty.
+        Returns ``(taken per shard or None, seats left per shard read,
+        writes)``; the counts are None when shards are missing (or the
+        flight is, with ``init``).
+        """
+        if init:
+            flight, refs, snapshots = snapshots[0], refs[1:], snapshots[1:]
+        counts = {n: doc.get('available') for n, doc in zip(shards, snapshots) if doc.exists}
+        missing = [n for n, doc in zip(shards, snapshots) if not doc.exists]
+        if missing and not init:
+            return None, None, []
+        if missing and not counts:
+            if not flight.exists:
+                return None, None, []
+            total = flight.get('availableSeats') or 0
+            counts = {n: total // len(shards) + (1 if n < total % len(shards) else 0) for n in shards}
+        else:
+            counts.update({n: 0 for n in missing})
+        taken = _take_from(counts, seats)
+        writes = [
+            ('set', refs[shards.index(n)], {'flight_id': flight_id, 'shard': n, 'available': counts[n],
+                                            'updatedAt': server_timestamp()})
+            for n in missing
+        ]
+        writes += [
+            ('update', refs[shards.index(n)], {'available': counts[n], 'updatedAt': server_timestamp()})
+            for n in (taken or ()) if n not in missing
+        ]
+        return taken, counts, writes
+
+    @timed('firestore')
+    async def take_seats(self, flight_id: str, shards: List[int], hold: Dict[str, Any],
+                         init: bool = False, max_attempts: int = 5):
+        """Move ``hold['seats']`` seats from the given shards into a new hold.
+
+        Returns ``(hold, seats left per shard read)``; the hold is None when
+        those shards don't have enough seats together. See ``_take`` for
+        ``init`` and when the counts are None.
+        """
+        hold_ref = self._hold_ref(hold['id'])
+        refs = self._seat_refs(flight_id, shards, init)
+
+        def decide(snapshots):
+            taken, counts, writes = self._take(flight_id, shards, refs, snapshots, hold['seats'], init)
+            if taken is None:
+                return (None, counts), writes
+            data = dict(hold, flight_id=flight_id, shards={str(n): seats for n, seats in taken.items()})
+            return (data, counts), writes + [('set', hold_ref, data)]
+
+        return await self._transact(refs, decide, max_attempts)
+
+    @timed('firestore')
+    async def book_seats(self, flight_id: str, shards: List[int], booking_id: str, data: Dict[str, Any],
+                         init: bool = False, max_attempts: int = 5):
+        """Take ``data['passengers']`` seats from the given shards and write the booking.
+
+        Like ``take_seats`` without the hold: returns ``((status, booking),
+        seats left per shard read)``, status ``created`` or ``existing`` (the
+        id was already booked, nothing taken), or ``(None, counts)`` when the
+        shards don't have enough seats.
+        """
+        if data['passengers'] < 1:
+            raise ValueError(f"Cannot book {data['passengers']} seats")
+        booking_ref = self.client.collection('bookings').document(booking_id)
+        refs = [booking_ref] + self._seat_refs(flight_id, shards, init)
+
+        def decide(snapshots):
+            if snapshots[0].exists:
+                return (('existing', _booking_dict(snapshots[0].to_dict())), {}), []
+            taken, counts, writes = self._take(flight_id, shards, refs[1:], snapshots[1:],
+                                               data['passengers'], init)
+            if taken is None:
+                return (None, counts), writes
+            return (('created', data), counts), writes + [('set', booking_ref, data)]
+
+        return await self._transact(refs, decide, max_attempts)
+
+    @timed('firestore')
+    async def get_seat_hold(self, hold_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self._get(self._hold_ref(hold_id))
+        return doc.to_dict() if doc.exists else None
+
+    @timed('firestore')
+    async def release_seat_hold(self, hold: Dict[str, Any]) -> Optional[Dict[int, int]]:
+        """Return a hold's seats to its shards and delete it.
+
+        Seats left per shard afterwards, or None if the hold was already gone
+        (released, expired or turned into a booking).
+        """
+        taken = [(int(n), seats) for n, seats in hold['shards'].items()]
+        hold_ref = self._hold_ref(hold['id'])
+        refs = [hold_ref] + [self._shard_ref(hold['flight_id'], n) for n, _ in taken]
+
+        def decide(snapshots):
+            if not snapshots[0].exists:
+                return None, []
+            counts, writes = {}, [('delete', hold_ref, None)]
+            for (n, seats), ref, doc in zip(taken, refs[1:], snapshots[1:]):
+                counts[n] = doc.get('available') + seats
+                writes.append(('update', ref, {'available': counts[n], 'updatedAt': server_timestamp()}))
+            return counts, writes
+
+        return await self._transact(refs, decide)
+
+    @timed('firestore')
+    async def confirm_booking(self, booking_id: str, data: Dict[str, Any],
+                              hold_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Write booking ``booking_id`` in exchange for hold ``hold_id``.
+
+        Returns ``(status, booking)``: ``created``, or ``existing`` with the
+        stored booking when that id was already confirmed (a retried request),
+        else ``missing``/``expired``/``mismatch`` for an unusable hold and no
+        booking. A hold only makes a booking for the same flight, seat count
+        and user.
+        """
+        booking_ref = self.client.collection('bookings').document(booking_id)
+        hold_ref = self._hold_ref(hold_id)
+
+        def decide(snapshots):
+            booking, hold = snapshots
+            if booking.exists:
+                return ('existing', _booking_dict(booking.to_dict())), []
+            if not hold.exists:
+                return ('missing', None), []
+            if hold.get('expiresAt') <= datetime.now(timezone.utc):
+                return ('expired', None), []
+            if (hold.get('flight_id') != data['flight_id'] or hold.get('seats') != data['passengers']
+                    or hold.get('user_id') != data['user_id']):
+                return ('mismatch', None), []
+            return ('created', data), [('set', booking_ref, data), ('delete', hold_ref, None)]
+
+        return await self._transact([booking_ref, hold_ref], decide)
+
+    @timed('firestore')
+    async def seat_shards_changed_since(self, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        """Shard documents written after ``since`` (all of them when None)."""
+        query = self.client.collection('seat_shards')
+        if since is not None:
+            query = query.where('updatedAt', '>', since)
+        docs = await self._stream(query, timeout=None)
+        return [doc.to_dict() for doc in docs]
+
+    @timed('firestore')
+    async def seat_shard_counts(self, flight_id: str) -> Dict[int, int]:
+        """Seats left per shard of one flight (a plain read, no transaction)."""
+        query = self.client.collection('seat_shards').where('flight_id', '==', flight_id)
+        docs = await self._stream(query)
+        return {data['shard']: data['available'] for data in (doc.to_dict() for doc in docs)}
+
+    @timed('firestore')
+    async def expired_seat_holds(self, now: datetime, limit: int = 500) -> List[Dict[str, Any]]:
+        query = self.client.collection('seat_holds').where('expiresAt', '<=', now).limit(limit)
+        docs = await self._stream(query)
+        return [doc.to_dict() for doc in docs]
+
+    # Locations
+
+    @timed('firestore')
+    async def popular_locations(self, limit: int = 5) -> List[Dict[str, Any]]:
+        # Direction is passed as the string constant so this works for both
+        # the sync and async Query classes
+        query = (
+            self.client.collection('locations')
+            .where('isPopular', '==', True)
+            .order_by('popularity', direction='DESCENDING')
+            .limit(limit)
+        )
+        docs = await self._stream(query)
+        return [doc.to_dict() for doc in docs]
+
+    # Conversations
+
+    @timed('firestore')
+    async def add_conversations(self, records: List[Dict[str, Any]]):
+        # One WriteBatch commit (at most 500 writes) instead of one RPC per record
+        batch = self.client.batch()
+        collection = self.client.collection('conversations')
+        for data in records:
+            batch.set(collection.document(), data)
+        await self._run(batch.commit, batch.commit)
+
+
+def _booking_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Server timestamps come back as datetimes
+    if isinstance(data.get('bookingTime'), datetime):
+        data['bookingTime'] = data['bookingTime'].isoformat()
+    return data
+
+
+def _take_from(counts: Dict[int, int], seats: int) -> Optional[Dict[int, int]]:
+    """Seats to take per shard, fullest shards first so as few as possible
+    are written; ``counts`` is updated in place. None if there aren't enough.
+    """
+    if seats < 1:
+        raise ValueError(f"Cannot take {seats} seats")
+    if sum(counts.values()) < seats:
+        return None
+    taken = {}
+    for n in sorted(counts, key=counts.get, reverse=True):
+        if not seats:
+            break
+        take = min(seats, counts[n])
+        if take:
+            taken[n] = take
+            counts[n] -= take
+            seats -= take
+    return taken
@@ -0,0 +1,117 @@
+# backend/app/responses.py
+"""JSON responses without FastAPI's second validation pass and the stdlib encoder.
+
+For a route with a ``response_model``, FastAPI dumps the returned model to a
+dict, validates that dict back into the model, converts it to JSON-ready
+Python values and finally runs ``json.dumps``. The handlers in ``main.py``
+already build their models from validated input or Firestore data, so the
+hot routes return a ``Response`` instead, which FastAPI passes through
+untouched (``response_model`` stays on the route for the OpenAPI schema).
+
+* ``dumps()``: models through pydantic's Rust serializer, anything else
+  through orjson (the stdlib encoder when orjson isn't installed)
+* ``FastJSONResponse``: the app's default response class, using ``dumps()``
+* ``Payload``: a serialized body with a strong ETag, for content that is
+  served many times unchanged; ``If-None-Match`` gets a 304 without
+  touching the body
+* ``PayloadCache``: payloads by key, rebuilt only when their source changes
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pydantic_core
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up, see requirements.txt
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if isinstance(content, BaseModel) or (
+            isinstance(content, list) and content and isinstance(content[0], BaseModel)):
+        return pydantic_core.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    # Same output as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers ``etag`` (weak comparison, per RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class Payload:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    @classmethod
+    def of(cls, content: Any) -> "Payload":
+        return cls(dumps(content))
+
+    def response(self, request: Request, headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = {**(headers or {}), "ETag": self.etag}
+        if etag_matches(request, self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return FastJSONResponse(self.body, headers=headers)
+
+
+class PayloadCache:
+    """Most recently used payloads, each remembered with the source it was built from.
+
+    ``get(key, source, build)`` returns the cached payload while ``source``
+    equals (or is) the one it was built from, and otherwise serializes
+    ``build()`` again. Sources are kept, so they must not be modified later.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Payload]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, source: Any, build: Callable[[], Any],
+            etag: Optional[str] = None) -> Payload:
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] is source or entry[0] == source):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+        self.misses += 1
+        payload = Payload(dumps(build()), etag)
+        self._entries[key] = (source, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,217 @@
+# backend/benchmarks/bench_auth.py
+"""Per-request cost of Firebase ID-token verification.
+
+Signs tokens with a locally generated RSA key, published as a self-signed
+certificate by a stand-in for Google's certificate endpoint, and times
+
+* parse + verify - PEM parsed and signature checked per token, what
+  ``firebase_admin.auth.verify_id_token`` does on every call
+* verify         - signature checked against a key parsed once per refresh
+* cached         - the claims of a token seen before
+* no token       - GET /bookings/{user_id} without Authorization, vs the
+  same request with a (cached) token, at the ASGI level
+
+and checks that bad tokens are rejected, a key rotation is picked up with a
+single fetch, and the rate limiter keys on the signed-in user.
+
+Run from ``backend/``:  python -m benchmarks.bench_auth
+"""
+import argparse
+import asyncio
+import datetime
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from jose import jwt
+
+from app import main
+from app.auth import InvalidTokenError, PublicKeyCache, TokenVerifier
+from benchmarks.bench_metrics import http_scope, receive
+
+PROJECT = "bench-project"
+
+
+class SigningKey:
+    def __init__(self, kid: str):
+        self.kid = kid
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+                .public_key(private_key.public_key()).serial_number(x509.random_serial_number())
+                .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+                .sign(private_key, hashes.SHA256()))
+        self.cert = cert.public_bytes(serialization.Encoding.PEM).decode()
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()).decode()
+
+    def token(self, uid: str, audience: str = PROJECT, age: int = 0, lifetime: int = 3600) -> str:
+        issued = int(time.time()) - age
+        claims = {"sub": uid, "aud": audience, "iss": f"https://securetoken.google.com/{audience}",
+                  "iat": issued, "auth_time": issued, "exp": issued + lifetime}
+        return jwt.encode(claims, self.private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class CertEndpoint:
+    """Stand-in for Google's x509 endpoint, counting fetches."""
+
+    def __init__(self, *keys: SigningKey):
+        self.keys = list(keys)
+        self.fetches = 0
+
+    async def __call__(self):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return {key.kid: key.cert for key in self.keys}, "public, max-age=21600, must-revalidate"
+
+
+def per_call(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+async def per_call_async(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        await fn()
+    return (time.perf_counter() - start) / n
+
+
+async def expect_rejected(verifier: TokenVerifier, token: str, what: str):
+    try:
+        await verifier.verify(token)
+    except InvalidTokenError:
+        return
+    raise AssertionError(f"{what} was accepted")
+
+
+async def check_behaviour(signer: SigningKey):
+    endpoint = CertEndpoint(signer)
+    verifier = TokenVerifier(PROJECT, PublicKeyCache(endpoint))
+    # Concurrent first requests share one fetch
+    claims = await asyncio.gather(*(verifier.verify(signer.token(f"user-{i}")) for i in range(50)))
+    assert [c["uid"] for c in claims] == [f"user-{i}" for i in range(50)]
+    assert endpoint.fetches == 1, endpoint.fetches
+
+    await expect_rejected(verifier, signer.token("u", age=7200), "an expired token")
+    await expect_rejected(verifier, signer.token("u", audience="other-project"), "another project's token")
+    await expect_rejected(verifier, signer.token("u", age=-600), "a token issued in the future")
+    await expect_rejected(verifier, signer.token("u")[:-4] + "AAAA", "a forged signature")
+    await expect_rejected(verifier, SigningKey(signer.kid).token("u"), "a token signed with another key")
+    await expect_rejected(verifier, "not-a-token", "garbage")
+
+    # Rotation a minute later: a new key id costs one fetch; unknown ids
+    # right after it don't cause more
+    rotated = SigningKey("rotated")
+    endpoint.keys.append(rotated)
+    verifier.keys._attempted -= verifier.keys.min_refresh_interval
+    assert (await verifier.verify(rotated.token("u")))["uid"] == "u"
+    await expect_rejected(verifier, SigningKey("unknown").token("u"), "an unknown key id")
+    assert endpoint.fetches == 2, endpoint.fetches
+    await verifier.keys.stop()
+
+
+async def check_app(signer: SigningKey, verifier: TokenVerifier):
+    token = signer.token("alice")
+    keys = []
+    original_key = main.limiter.client_key
+    main.limiter.client_key = lambda request: keys.append(original_key(request)) or keys[-1]
+    main.limiter.enabled = True
+    try:
+        for path, headers, expected in (
+                ("/bookings/alice", {"authorization": f"Bearer {token}"}, 200),
+                ("/bookings/bob", {"authorization": f"Bearer {token}"}, 403),
+                ("/bookings/alice", {"authorization": "Bearer nonsense"}, 401),
+                ("/bookings/alice", {}, 200)):
+            status = await request_status(path, headers)
+            assert status == expected, (path, headers, status)
+    finally:
+        main.limiter.client_key = original_key
+        main.limiter.enabled = False
+    # The limiter counted the signed-in request against the user
+    assert keys[0][0] == "user:alice", keys
+
+    main.settings.AUTH_REQUIRED = True
+    try:
+        assert await request_status("/bookings/alice", {}) == 401
+    finally:
+        main.settings.AUTH_REQUIRED = False
+
+
+async def request_status(path: str, headers) -> int:
+    scope = http_scope(path)
+    scope["headers"] = scope["headers"] + [(k.encode(), v.encode()) for k, v in headers.items()]
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await main.app(scope, receive, send)
+    return sent[0]["status"]
+
+
+async def time_requests(path: str, headers, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        status = await request_status(path, headers)
+        assert status == 200, status
+    return (time.perf_counter() - start) / requests
+
+
+async def run(args):
+    signer = SigningKey("bench-key")
+    await check_behaviour(signer)
+
+    # Unique tokens, so every verify() misses the claims cache
+    tokens = [signer.token(f"user-{i}") for i in range(args.tokens)]
+    verifier = TokenVerifier(PROJECT, PublicKeyCache(CertEndpoint(signer)), max_entries=args.tokens * 2)
+    await verifier.verify(tokens[0])
+    key = verifier.keys._keys[signer.kid]
+    issuer = f"https://securetoken.google.com/{PROJECT}"
+
+    parse_each = per_call(lambda: jwt.decode(tokens[0], signer.cert, algorithms=["RS256"],
+                                             audience=PROJECT, issuer=issuer), args.tokens)
+    parsed_once = per_call(lambda: jwt.decode(tokens[0], key, algorithms=["RS256"],
+                                              audience=PROJECT, issuer=issuer), args.tokens)
+    remaining = iter(tokens[1:])
+    uncached = await per_call_async(lambda: verifier.verify(next(remaining)), args.tokens - 1)
+    cached = await per_call_async(lambda: verifier.verify(tokens[1]), args.tokens * 10)
+
+    main.limiter.enabled = False
+    original = main.token_verifier
+    main.token_verifier = verifier
+    try:
+        await check_app(signer, verifier)
+        headers = {"authorization": f"Bearer {signer.token('alice')}"}
+        await time_requests("/bookings/alice", headers, 10)
+        without = await time_requests("/bookings/alice", {}, args.requests)
+        with_token = await time_requests("/bookings/alice", headers, args.requests)
+    finally:
+        main.token_verifier = original
+        main.limiter.enabled = True
+        await verifier.keys.stop()
+
+    print(f"{'parse + verify':<16} {parse_each * 1e6:8.1f} us per token")
+    print(f"{'verify':<16} {parsed_once * 1e6:8.1f} us per token")
+    print(f"{'verify()':<16} {uncached * 1e6:8.1f} us per new token (claims cache miss)")
+    print(f"{'cached':<16} {cached * 1e6:8.1f} us per token seen before")
+    print(f"GET /bookings/{{user_id}}: {without * 1e6:.0f} us without a token, "
+          f"{with_token * 1e6:.0f} us with one (+{(with_token - without) * 1e6:.0f} us)")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=500, help="distinct tokens verified")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per ASGI measurement")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,126 @@
+# backend/benchmarks/bench_chat_stream.py
+"""Time-to-first-byte and worker concurrency for /chat vs /chat/stream.
+
+Uses a fake Gemini model with a fixed first-token latency and token rate, so
+the numbers reflect the server rather than the LLM. Requests are driven at
+the ASGI level so the first body chunk can be timed (httpx's ASGI transport
+buffers whole responses). A final pass disconnects every client mid-stream
+and checks that all LLM slots are released.
+
+Run from ``backend/``:  python -m benchmarks.bench_chat_stream
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app import main
+from app.chat import LLMLimiter
+from benchmarks.fakes import FakeGeminiModel
+
+BODY = json.dumps(
+    {"messages": [{"role": "user", "content": "What is the baggage allowance?"}]}
+).encode()
+
+
+async def asgi_post(path: str, disconnect_after: float = None):
+    """POST ``BODY`` to the app; return (status, ttfb, total in seconds, body)."""
+    start = time.perf_counter()
+    result = {"status": None, "ttfb": None, "body": b""}
+    body_sent = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": BODY, "more_body": False}
+        if disconnect_after is not None:
+            await asyncio.sleep(disconnect_after)
+        else:
+            await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            if message.get("body") and result["ttfb"] is None:
+                result["ttfb"] = time.perf_counter() - start
+            result["body"] += message.get("body", b"")
+            if not message.get("more_body"):
+                done.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+    }
+    await main.app(scope, receive, send)
+    return result["status"], result["ttfb"], time.perf_counter() - start, result["body"]
+
+
+def install(model: FakeGeminiModel, max_concurrent: int):
+    main.app.dependency_overrides[main.get_chat_model] = lambda: model
+    # asyncio primitives bind to the first loop that uses them
+    main.llm_limiter = LLMLimiter(max_concurrent, main.settings.LLM_QUEUE_TIMEOUT_SECONDS)
+    # The rate limit would turn a benchmark from one client into 429s
+    main.limiter.enabled = False
+
+
+async def run(path: str, requests: int, model: FakeGeminiModel, max_concurrent: int):
+    install(model, max_concurrent)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(asgi_post(path) for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    assert all(status == 200 for status, _, _, _ in results), results
+    # Errors and fallback replies are 200s too: check the model's reply came through
+    assert all(b"token0" in body for _, _, _, body in results), results[0][3]
+    return {
+        "path": path,
+        "ttfb_p50_ms": statistics.median(r[1] for r in results) * 1000,
+        "total_p50_ms": statistics.median(r[2] for r in results) * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+async def run_disconnects(requests: int, model: FakeGeminiModel, max_concurrent: int):
+    install(model, max_concurrent)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        asgi_post("/chat/stream", disconnect_after=model.first_token_latency + 0.05)
+        for _ in range(requests)
+    ))
+    return time.perf_counter() - start, main.llm_limiter.in_flight
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--max-concurrent", type=int, default=main.settings.MAX_CONCURRENT_LLM_CALLS)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    model = FakeGeminiModel(args.tokens, args.tokens_per_second, args.first_token_ms / 1000)
+    print(f"{args.requests} concurrent chats, {args.tokens} tokens at "
+          f"{args.tokens_per_second:.0f} tok/s, first token after {args.first_token_ms:.0f} ms, "
+          f"LLM cap {args.max_concurrent}")
+    for path in ("/chat", "/chat/stream"):
+        result = asyncio.run(run(path, args.requests, model, args.max_concurrent))
+        print(f"{result['path']:>12}: TTFB p50 {result['ttfb_p50_ms']:7.1f} ms  "
+              f"total p50 {result['total_p50_ms']:7.1f} ms  wall {result['elapsed_s']:.2f} s")
+
+    elapsed, in_flight = asyncio.run(run_disconnects(args.requests, model, args.max_concurrent))
+    print(f"  disconnect: {args.requests} clients dropped mid-stream, wall {elapsed:.2f} s, "
+          f"LLM slots still held: {in_flight}")
+    main.app.dependency_overrides.clear()
+    main.limiter.enabled = True
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,168 @@
+# backend/benchmarks/bench_connections.py
+"""Connection search latency on a synthetic hub-and-spoke network.
+
+Builds the route graph for ``--airports`` airports and ``--per-day``
+flights a day (see ``synthetic.generate_network``), then times 1-2 stop
+itinerary queries between random airports, ranked by price and by
+duration. Also reports how long building the graph and re-filing one
+cancelled flight take.
+
+Before timing, checks the search against a brute-force enumeration of
+every itinerary on a small network, and that a cancelled flight drops out
+of the results.
+
+Run from ``backend/``:  python -m benchmarks.bench_connections
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.connections import ConnectionGraph
+from app.flight_catalogue import format_epoch
+from app.flight_search import FlightSearchEngine
+from benchmarks.synthetic import generate_network
+
+DAY = "2024-06-01"
+
+
+def brute_force(graph: ConnectionGraph, origin: str, destination: str, max_stops: int,
+                passengers: int, sort_by: str, limit: int):
+    catalogue = graph.catalogue
+    targets = graph.airports_for(destination)
+    origins = graph.airports_for(origin) - targets
+    date_codes = set(catalogue.dates.codes_for(DAY))
+    found = []
+
+    def extend(legs):
+        last = legs[-1]
+        airport = int(catalogue.arrival_airport[last])
+        if airport in targets:
+            found.append(legs)
+            return
+        if len(legs) > max_stops or airport not in graph._departures:
+            return
+        visited = {int(catalogue.departure_airport[row]) for row in legs}
+        arrival = int(catalogue.arrival[last])
+        for row in graph._departures[airport].rows.tolist():
+            departure = int(catalogue.departure[row])
+            to = int(catalogue.arrival_airport[row])
+            if (arrival + graph.min_connection[airport] <= departure <= arrival + graph.max_layover
+                    and to not in visited and catalogue.seats[row] >= passengers
+                    and (len(legs) < max_stops or to in targets)):
+                extend(legs + (row,))
+
+    for airport in origins:
+        if airport not in graph._departures:
+            continue
+        for row in graph._departures[airport].rows.tolist():
+            if catalogue.departure_date[row] in date_codes and catalogue.seats[row] >= passengers:
+                extend((row,))
+
+    def cost(legs):
+        price = 0.0
+        for row in legs:
+            price += float(catalogue.price[row])
+        elapsed = int(catalogue.arrival[legs[-1]] - catalogue.departure[legs[0]])
+        return (price, elapsed) if sort_by == "price" else (elapsed, price)
+
+    return sorted(cost(legs) for legs in found)[:limit]
+
+
+def check_correctness(args):
+    engine = FlightSearchEngine(generate_network(airport_count=30, flights_per_day=800, days=2,
+                                                 hubs=4, seed=args.seed))
+    graph = engine.connections
+    codes = graph.catalogue.airports.values
+    rng = random.Random(args.seed)
+    for _ in range(args.checks):
+        origin, destination = rng.sample(codes, 2)
+        max_stops, sort_by, passengers = rng.choice([1, 2]), rng.choice(["price", "duration"]), rng.choice([1, 50])
+        expected = brute_force(graph, origin, destination, max_stops, passengers, sort_by, 10)
+        found = graph.search(origin, destination, DAY, max_stops=max_stops, passengers=passengers,
+                             sort_by=sort_by, limit=10, max_expansions=10 ** 9)
+        got = [(it.price, it.arrival - it.departure) if sort_by == "price" else (it.arrival - it.departure, it.price)
+               for it in found]
+        assert got == expected, (origin, destination, max_stops, sort_by, got, expected)
+
+    # A cancellation takes the flight out of every itinerary
+    for _ in range(20):
+        origin, destination = rng.sample(codes, 2)
+        before = graph.search(origin, destination, DAY, limit=1)
+        if before:
+            break
+    cancelled = before[0].rows[-1]
+    engine.update_status(graph.catalogue.ids[cancelled], {"status": "Cancelled"})
+    after = graph.search(origin, destination, DAY, limit=50)
+    assert all(cancelled not in it.rows for it in after)
+
+    # Retimed flights end up where a fresh build would put them
+    catalogue = graph.catalogue
+    for row in rng.sample(range(len(catalogue)), 20):
+        shift = rng.choice([-3, 1, 26]) * 3600
+        engine.update_status(catalogue.ids[row], {
+            "departureTime": format_epoch(catalogue.departure[row] + shift),
+            "arrivalTime": format_epoch(catalogue.arrival[row] + shift),
+        })
+    fresh = ConnectionGraph(catalogue)
+    assert graph._routes == fresh._routes
+    assert all((graph._departures[airport].rows == fresh._departures[airport].rows).all()
+               for airport in fresh._departures)
+
+
+def run(args):
+    check_correctness(args)
+    print(f"{args.checks} queries match a brute-force enumeration; cancellations and retimes are applied")
+
+    flights = generate_network(airport_count=args.airports, flights_per_day=args.per_day,
+                               days=args.days, seed=args.seed)
+    engine = FlightSearchEngine(flights[:0])
+    start = time.perf_counter()
+    engine.load(flights)
+    loaded = time.perf_counter() - start
+    graph = engine.connections
+    start = time.perf_counter()
+    ConnectionGraph(engine.catalogue)
+    built = time.perf_counter() - start
+    print(f"{len(flights)} flights, {args.airports} airports: catalogue + indexes {loaded:.2f} s, "
+          f"of which the route graph {built:.2f} s")
+
+    rng = random.Random(args.seed)
+    codes = graph.catalogue.airports.values
+    queries = [rng.sample(codes, 2) for _ in range(args.queries)]
+    for sort_by in ("price", "duration"):
+        latencies, stops, short = [], [], 0
+        for origin, destination in queries:
+            start = time.perf_counter()
+            found = graph.search(origin, destination, DAY, max_stops=2, sort_by=sort_by, limit=args.limit)
+            latencies.append(time.perf_counter() - start)
+            short += len(found) < args.limit
+            stops.extend(len(it.rows) - 1 for it in found)
+        latencies.sort()
+        print(f"by {sort_by:<8}  p50 {statistics.median(latencies) * 1000:6.1f} ms  "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.1f} ms  "
+              f"max {latencies[-1] * 1000:6.1f} ms  "
+              f"stops/itinerary {statistics.mean(stops) if stops else 0:.2f}  "
+              f"queries with < {args.limit} results {short}")
+
+    rows = rng.sample(range(len(flights)), 200)
+    start = time.perf_counter()
+    for row in rows:
+        engine.update_status(flights[row]["id"], {"status": "Cancelled"})
+    print(f"cancel one flight: {(time.perf_counter() - start) / len(rows) * 1e6:.0f} us")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--airports", type=int, default=400)
+    parser.add_argument("--per-day", type=int, default=100000, help="flights per day")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10, help="itineraries per query")
+    parser.add_argument("--checks", type=int, default=30, help="queries checked against brute force")
+    parser.add_argument("--seed", type=int, default=7)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,89 @@
+# backend/benchmarks/bench_conversation_log.py
+"""POST /chat latency and Firestore RPCs with write-behind conversation logs.
+
+The fake Firestore charges ``--latency-ms`` per commit, which an inline write
+would add to every chat. Here chats only enqueue their record: latency should
+be the fake model's generation time alone, and the records should land in
+far fewer batch commits than chats. A final burst overflows the queue to show
+the drop counter, and shutdown must flush every accepted record.
+
+Run from ``backend/``:  python -m benchmarks.bench_conversation_log
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app import main
+from app.chat import LLMLimiter
+from app.conversation_log import ConversationLog
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore, FakeGeminiModel
+
+
+def chat_body(i: int):
+    # Distinct users so nothing is served from the chat cache
+    return {"user_id": f"user{i}",
+            "messages": [{"role": "user", "content": f"Question {i} about baggage?"}]}
+
+
+async def run(args):
+    firestore = FakeAsyncFirestore(args.latency_ms / 1000)
+    model = FakeGeminiModel(tokens=5, tokens_per_second=1000, first_token_latency=0.001)
+    main.app.dependency_overrides[main.get_chat_model] = lambda: model
+    main.llm_limiter = LLMLimiter(args.concurrency, 10.0)
+    main.conversation_log = log = ConversationLog(max_queue=args.max_queue,
+                                                  flush_interval=args.flush_ms / 1000)
+    log.start(FirestoreRepository(firestore, is_async=True))
+    # The rate limit would turn a benchmark from one client into 429s
+    main.limiter.enabled = False
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/chat", json=chat_body(i))
+                assert response.status_code == 200, response.text
+                return time.perf_counter() - start
+
+        samples = sorted(await asyncio.gather(*(one(i) for i in range(args.chats))))
+        print(f"chat latency: p50 {statistics.median(samples) * 1000:.2f} ms  "
+              f"p99 {samples[int(len(samples) * 0.99) - 1] * 1000:.2f} ms  "
+              f"(model {model.generation_time * 1000:.2f} ms, one write {args.latency_ms:.2f} ms)")
+
+    # Let the drain catch up, then overflow the queue in one synchronous burst
+    while log.stats()["queued"]:
+        await asyncio.sleep(0.01)
+    for i in range(args.max_queue + args.overflow):
+        log.log(chat_body(i))
+
+    await log.stop()
+    stats = log.stats()
+    stored = len(firestore.sync_view()._store.collections.get("conversations", {}))
+    print(f"{stats['enqueued']} records in {stats['batches']} commits "
+          f"({firestore.rpc_count} RPCs), {stats['dropped']} dropped, {stored} stored")
+    assert stored == stats["enqueued"] == stats["written"]
+    assert stats["dropped"] == args.overflow
+
+    main.app.dependency_overrides.clear()
+    main.limiter.enabled = True
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--flush-ms", type=float, default=200.0)
+    parser.add_argument("--max-queue", type=int, default=5000)
+    parser.add_argument("--overflow", type=int, default=250)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
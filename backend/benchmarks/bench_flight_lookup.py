@@ -0,0 +1,115 @@
+# backend/benchmarks/bench_flight_lookup.py
+"""Flight detail lookups: one-by-one vs POST /flights/batch, cache on and off.
+
+Every simulated client opens a results screen of ``--page`` flights, drawn
+from a small set of popular ones, and fetches their details either
+
+* singles - one GET /flights/{id} per flight (what the app does today)
+* batch   - one POST /flights/batch for the whole page
+
+with the per-flight cache (single-flight + TTL) disabled and enabled.
+Reports wall time, latency per screen and Firestore round-trips. Also
+checks that a PATCH /flights/{id}/status is visible right after it on the
+worker that made it.
+
+Run from ``backend/``:  python -m benchmarks.bench_flight_lookup
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+from app import main
+from app.flight_cache import FlightCache
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore
+from benchmarks.synthetic import generate_flights
+
+
+async def run_mode(args, flights, mode: str, cached: bool):
+    firestore = FakeAsyncFirestore(args.latency_ms / 1000)
+    firestore.sync_view().seed("flights", {f["id"]: f for f in flights})
+    main.repository = FirestoreRepository(firestore, is_async=True)
+    main.flight_cache = FlightCache(ttl=60.0)
+    main.flight_cache.enabled = cached
+    rng = random.Random(args.seed)
+    popular = [f["id"] for f in flights[:args.popular]]
+    screens = [rng.sample(popular, args.page) for _ in range(args.clients)]
+    latencies = []
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def screen(ids):
+            start = time.perf_counter()
+            if mode == "batch":
+                response = await client.post("/flights/batch", json={"ids": ids})
+                assert response.status_code == 200, response.text
+                assert [f["id"] for f in response.json()] == ids
+            else:
+                responses = await asyncio.gather(*(client.get(f"/flights/{i}") for i in ids))
+                assert all(r.status_code == 200 for r in responses)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(screen(ids) for ids in screens))
+        elapsed = time.perf_counter() - start
+
+        if mode == "batch" and cached:
+            # The updating worker must not serve the old status from cache
+            flight_id = popular[0]
+            response = await client.patch(f"/flights/{flight_id}/status",
+                                          json={"status": "Delayed", "gate": "Z9"},
+                                          headers={"X-API-Key": main.settings.API_KEY})
+            assert response.status_code == 200, response.text
+            detail = (await client.get(f"/flights/{flight_id}")).json()
+            assert (detail["status"], detail["gate"]) == ("Delayed", "Z9"), detail
+
+    main.repository = None
+    return {
+        "mode": mode,
+        "cached": cached,
+        "seconds": elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95)] * 1000,
+        "rpcs": firestore.rpc_count,
+    }
+
+
+async def run(args):
+    flights = generate_flights(args.popular)
+    main.limiter.enabled = False
+    original_cache = main.flight_cache
+    try:
+        results = [await run_mode(args, flights, mode, cached)
+                   for mode in ("singles", "batch") for cached in (False, True)]
+    finally:
+        main.limiter.enabled = True
+        main.flight_cache = original_cache
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200, help="concurrent results screens")
+    parser.add_argument("--page", type=int, default=20, help="flights per screen")
+    parser.add_argument("--popular", type=int, default=100, help="distinct flights being looked at")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{args.clients} screens of {args.page} flights out of {args.popular}, "
+          f"{args.latency_ms} ms per Firestore RPC")
+    for r in results:
+        print(f"{r['mode']:<7} cache={'on ' if r['cached'] else 'off'}  {r['seconds']:7.2f} s  "
+              f"p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  firestore rpcs {r['rpcs']:6d}")
+    by_mode = {(r["mode"], r["cached"]): r for r in results}
+    assert by_mode["singles", True]["rpcs"] <= args.popular, "concurrent misses were not coalesced"
+    assert by_mode["batch", False]["rpcs"] == args.clients, "a batch took more than one round-trip"
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,129 @@
+# backend/benchmarks/bench_flight_search.py
+"""Indexed FlightSearchEngine vs the old sequential list filters.
+
+The baseline re-runs the five list-comprehension filters from the original
+``search_flights`` over a prebuilt list of FlightModel objects (it no longer
+pays for rebuilding them, so it is a generous baseline). Also reports memory
+per flight and a full-catalogue fare-comparison scan (filter + sort by price)
+for the object list vs the columnar catalogue.
+
+Run from ``backend/``:  python -m benchmarks.bench_flight_search --flights 100000
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.flight_catalogue import ColumnarFlightCatalogue
+from app.flight_search import FlightSearchEngine
+from app.main import FlightModel, FlightSearchParams
+from benchmarks.synthetic import CLASSES, airports, generate_flights
+
+
+def linear_search(flights, params):
+    filtered_flights = flights
+    if params.departure_city:
+        filtered_flights = [f for f in filtered_flights if f.departureCity.lower() == params.departure_city.lower()]
+    if params.arrival_city:
+        filtered_flights = [f for f in filtered_flights if f.arrivalCity.lower() == params.arrival_city.lower()]
+    if params.travel_class:
+        filtered_flights = [f for f in filtered_flights if params.travel_class in f.travelClasses]
+    if params.max_price:
+        filtered_flights = [f for f in filtered_flights if f.price <= params.max_price]
+    if params.passengers:
+        filtered_flights = [f for f in filtered_flights if f.availableSeats >= params.passengers]
+    return filtered_flights
+
+
+def random_queries(count: int, airport_count: int, seed: int = 7):
+    rng = random.Random(seed)
+    places = airports(airport_count)
+    queries = []
+    for _ in range(count):
+        origin, destination = rng.sample(places, 2)
+        kind = rng.randrange(4)
+        queries.append(FlightSearchParams(
+            departure_city=origin["city"],
+            arrival_city=destination["city"] if kind != 1 else None,
+            departure_date=f"2024-06-{rng.randrange(1, 31):02d}" if kind == 2 else None,
+            travel_class=rng.choice(CLASSES) if kind == 3 else None,
+            max_price=float(rng.randrange(10000, 150000)) if kind != 0 else None,
+            passengers=rng.randrange(1, 5),
+        ))
+    return queries
+
+
+def built(build):
+    """(result, build seconds, bytes held); tracemalloc slows allocation-heavy
+    code down, so the time comes from a separate untraced build."""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, held
+
+
+def timed(fn, queries):
+    samples = []
+    for params in queries:
+        start = time.perf_counter()
+        fn(params)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, max(samples) * 1000
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flights", type=int, default=100_000)
+    parser.add_argument("--airports", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    records = generate_flights(args.flights, args.airports)
+
+    flights, elapsed, objects_bytes = built(lambda: [FlightModel(**data) for data in records])
+    print(f"FlightModel list: built in {elapsed:.2f} s, {objects_bytes / len(flights):7.0f} B/flight")
+    catalogue, elapsed, columnar_bytes = built(lambda: ColumnarFlightCatalogue(records))
+    print(f"columnar store:   built in {elapsed:.2f} s, {columnar_bytes / len(catalogue):7.0f} B/flight")
+    _, elapsed, _ = built(lambda: ColumnarFlightCatalogue.from_models(flights))
+    print(f"columnar store from the FlightModel list: built in {elapsed:.2f} s")
+
+    start = time.perf_counter()
+    engine = FlightSearchEngine(records)
+    print(f"search engine indexed in {time.perf_counter() - start:.2f} s")
+
+    queries = random_queries(args.queries, args.airports)
+    for params in queries[:20]:
+        # Same rows, the engine only adds ordering
+        expected = {f.id for f in linear_search(flights, params)
+                    if not params.departure_date or f.departureTime.startswith(params.departure_date)}
+        result = engine.search(params)
+        assert {f.id for f in result.materialize(result.rows, FlightModel)} == expected
+
+    linear_queries = [q for q in queries if not q.departure_date]
+    p50, worst = timed(lambda q: linear_search(flights, q), linear_queries)
+    print(f"  linear filters:  p50 {p50:8.3f} ms  max {worst:8.3f} ms")
+
+    def indexed_page(params):
+        result = engine.search(params)
+        rows, _ = result.page(20)
+        return result.materialize(rows, FlightModel)
+
+    p50, worst = timed(indexed_page, linear_queries)
+    print(f"  indexed engine:  p50 {p50:8.3f} ms  max {worst:8.3f} ms  (incl. building a 20-row page)")
+
+    # Fare comparison over the whole catalogue: everything under a price, cheapest first
+    scans = [FlightSearchParams(max_price=p, passengers=2) for p in (20000.0, 60000.0, 120000.0)]
+    p50, _ = timed(lambda q: sorted(linear_search(flights, q), key=lambda f: f.price), scans)
+    print(f"  scan+sort (objects):  p50 {p50:8.2f} ms")
+    p50, _ = timed(lambda q: catalogue.sort_rows(
+        catalogue.filter_rows(max_price=q.max_price, min_seats=q.passengers), "price"), scans)
+    print(f"  scan+sort (columnar): p50 {p50:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
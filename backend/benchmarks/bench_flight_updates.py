@@ -0,0 +1,256 @@
+# backend/benchmarks/bench_flight_updates.py
+"""Idle /ws/flights subscribers on one worker, against the fake change feed.
+
+Opens ``--clients`` WebSocket connections straight into the ASGI app (no
+network), each watching ``--per-client`` flights picked with a skew towards
+popular ones, and reports
+
+* how many Firestore listeners serve them (one per distinct flight), and
+  the memory per connection
+* event-loop lag while they all sit idle
+* fan-out latency of status changes, from the Firestore write to the last
+  subscriber's socket, and the Firestore reads it costs (none), compared
+  with the reads clients polling GET /flights/{flight_id} would make
+* that writes not touching status fields send nothing, that clients which
+  stop reading are disconnected without holding up anyone else, and that
+  listeners are stopped once nobody watches their flight
+* that connections without an API key are refused, and that unknown or
+  malformed flight ids and the listener cap get an error message without
+  ending the connection
+
+Run from ``backend/``:  python -m benchmarks.bench_flight_updates
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import time
+
+from app import main
+from app.flight_updates import FlightUpdates
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore
+from benchmarks.synthetic import generate_flights
+
+
+class Client:
+    """One WebSocket connection, driven through the ASGI interface."""
+
+    def __init__(self, flight_ids, stuck: bool = False, api_key: str = "dev-key"):
+        self.flight_ids = flight_ids
+        self.api_key = api_key
+        self.stuck = stuck
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.received = []  # (time, text)
+        self.accepted = False
+        self.closed = False
+        self.task = None
+
+    def connect(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": "/ws/flights",
+            "raw_path": b"/ws/flights", "root_path": "", "subprotocols": [],
+            "query_string": f"flight_ids={','.join(self.flight_ids)}".encode(),
+            "headers": [(b"host", b"bench")] + ([(b"x-api-key", self.api_key.encode())] if self.api_key else []), "client": ("127.0.0.1", 40000), "server": ("bench", 80),
+        }
+        self.inbox.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.get_running_loop().create_task(main.app(scope, self.inbox.get, self.send))
+
+    async def send(self, message):
+        if message["type"] == "websocket.accept":
+            self.accepted = True
+        elif message["type"] == "websocket.send":
+            if self.stuck:
+                await asyncio.Event().wait()  # Never reads: the send never completes
+            self.received.append((time.perf_counter(), message["text"]))
+        elif message["type"] == "websocket.close":
+            self.closed = True
+
+    def request(self, action: str, flight_ids):
+        self.inbox.put_nowait({"type": "websocket.receive",
+                               "text": json.dumps({"action": action, "flight_ids": flight_ids})})
+
+    def errors(self):
+        return [message["detail"] for message in (json.loads(text) for _, text in self.received)
+                if message["type"] == "error"]
+
+    async def disconnect(self):
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+async def loop_lag(seconds: float) -> float:
+    """Worst delay of a 10 ms timer over ``seconds``."""
+    worst = 0.0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - start - 0.01)
+    return worst
+
+
+async def wait_for(condition, timeout: float = 60.0):
+    end = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > end:
+            raise AssertionError("timed out")
+        await asyncio.sleep(0.01)
+
+
+async def check_refusals(hub: FlightUpdates):
+    client = Client(["F0000001"], api_key=None)
+    client.connect()
+    await client.task
+    assert client.closed and not client.accepted
+
+    client = Client([])
+    client.connect()
+    client.request("subscribe", ["F0000001", "flights/F0000002", "NOPE"])
+    await wait_for(lambda: len(client.received) == 3)
+    assert sorted(client.errors()) == ["Unknown flight NOPE", "Unknown flight flights/F0000002"], client.errors()
+    assert hub.stats()["listeners"] == 1
+
+    # At the cap a lingering listener makes room, a watched one doesn't
+    hub.max_listeners = 2
+    client.request("subscribe", ["F0000002"])
+    client.request("unsubscribe", ["F0000002"])
+    client.request("subscribe", ["F0000003"])
+    client.request("subscribe", ["F0000004"])
+    await wait_for(lambda: len(client.errors()) == 3)
+    assert client.errors()[-1].startswith("Too many flights"), client.errors()
+    assert sorted(hub._watches) == ["F0000001", "F0000003"], list(hub._watches)
+    hub.max_listeners = 10000
+    await client.disconnect()
+    await asyncio.sleep(hub.linger + 0.5)
+    assert hub.stats()["listeners"] == 0
+
+
+async def run(args):
+    flights = generate_flights(args.flights)
+    firestore = FakeAsyncFirestore(args.latency_ms / 1000)
+    firestore.sync_view().seed("flights", {f["id"]: f for f in flights})
+    repository = FirestoreRepository(firestore, is_async=True)
+    main.repository = repository
+    main.flight_search.load(main.FlightModel(**flight) for flight in flights)
+    # The rate limit would turn a benchmark from one client into 429s
+    main.limiter.enabled = False
+    main.flight_updates = hub = FlightUpdates(send_timeout=args.send_timeout, linger=0.5,
+                                              known=lambda flight_id: flight_id in main.flight_search)
+    hub.start(repository)
+    await check_refusals(hub)
+    print("connections without an API key are refused; bad flight ids and the listener cap get errors")
+
+    rng = random.Random(args.seed)
+    ids = [f["id"] for f in flights]
+    weights = [1 / (rank + 1) for rank in range(len(ids))]
+    clients = [Client(list(dict.fromkeys(rng.choices(ids, weights, k=args.per_client))))
+               for _ in range(args.clients)]
+    stuck = clients[:args.stuck]
+    for client in stuck:
+        client.stuck = True
+
+    before = rss_mb()
+    start = time.perf_counter()
+    for client in clients:
+        client.connect()
+    await wait_for(lambda: all(len(c.received) == len(c.flight_ids) for c in clients if not c.stuck))
+    connected = time.perf_counter() - start
+    stats = hub.stats()
+    print(f"{args.clients} connections, {stats['subscriptions']} subscriptions on "
+          f"{stats['listeners']} Firestore listeners; connected and sent snapshots in {connected:.2f} s, "
+          f"{(rss_mb() - before) * 1024 / args.clients:.1f} KB per connection")
+
+    rpcs = firestore.rpc_count
+    print(f"event-loop lag while idle: {await loop_lag(args.idle) * 1000:.1f} ms worst "
+          f"(Firestore RPCs: {firestore.rpc_count - rpcs})")
+
+    # Status changes on watched flights, the popular ones most often
+    subscribers = {}
+    for client in clients:
+        for flight_id in client.flight_ids:
+            subscribers.setdefault(flight_id, []).append(client)
+    watched = sorted(subscribers, key=lambda flight_id: -len(subscribers[flight_id]))
+    changes = []
+    rpcs = firestore.rpc_count
+    for i in range(args.updates):
+        flight_id = rng.choice(watched[:50]) if i % 2 else rng.choice(watched)
+        marker = f"change-{i}"
+        changes.append((flight_id, marker, time.perf_counter()))
+        await repository.update_flight(flight_id, {"status": "Delayed", "lastUpdated": marker})
+        await asyncio.sleep(args.interval_ms / 1000)
+    writes = firestore.rpc_count - rpcs
+
+    def delivered(client, marker):
+        return next((at for at, text in client.received if marker in text), None)
+
+    def all_delivered():
+        return all(delivered(c, marker) is not None
+                   for flight_id, marker, _ in changes for c in subscribers[flight_id] if not c.stuck)
+
+    await wait_for(all_delivered)
+    latencies, messages = [], 0
+    for flight_id, marker, written in changes:
+        arrivals = [delivered(c, marker) for c in subscribers[flight_id] if not c.stuck]
+        latencies.append(max(arrivals) - written)
+        messages += len(arrivals)
+    latencies.sort()
+    sample = json.loads(next(text for _, text in clients[-1].received[::-1]))
+    print(f"{args.updates} status changes -> {messages} messages; write to last subscriber "
+          f"p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms; Firestore RPCs {firestore.rpc_count - rpcs - writes} besides the writes")
+    print(f"  e.g. {sample}")
+    print(f"polling every {args.poll_seconds:.0f} s instead: "
+          f"{args.clients * args.per_client / args.poll_seconds:.0f} Firestore reads per second")
+
+    # Seat-count writes don't touch status fields
+    sent = hub.messages
+    for flight_id in watched[:20]:
+        await repository.update_flight(flight_id, {"availableSeats": 1})
+    await asyncio.sleep(0.2)
+    assert hub.messages == sent, "a seat update was pushed"
+
+    # Clients that stopped reading
+    await wait_for(lambda: all(c.closed for c in stuck), timeout=args.send_timeout * 3)
+    stats = hub.stats()
+    assert stats["slow_disconnects"] == len(stuck), stats
+    print(f"{len(stuck)} clients that stopped reading were disconnected after {args.send_timeout} s "
+          f"(merged messages: {stats['merged']})")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client.disconnect() for client in clients))
+    disconnected = time.perf_counter() - start
+    await asyncio.sleep(hub.linger + 0.5)
+    stats = hub.stats()
+    assert stats["connections"] == 0 and stats["listeners"] == 0, stats
+    assert not firestore._store.watches, "listeners left open"
+    print(f"all disconnected in {disconnected:.2f} s; listeners stopped {hub.linger} s later")
+    main.repository = None
+    main.limiter.enabled = True
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--per-client", type=int, default=2, help="flights watched per connection")
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--stuck", type=int, default=50, help="clients that never read")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="between status changes")
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds of idle measurement")
+    parser.add_argument("--send-timeout", type=float, default=2.0)
+    parser.add_argument("--poll-seconds", type=float, default=30.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,116 @@
+# backend/benchmarks/bench_inventory.py
+"""Concurrent bookings against the seat inventory: no overbooking, and scaling.
+
+For each shard count, fires ``--bookings`` simultaneous one-seat bookings
+(each with its own idempotency key, a share of them submitted twice, and
+a share going through an explicit hold first) at one
+flight with ``--seats`` seats, spread over ``--workers`` inventories that
+stand in for worker processes, on the Firestore stand-in with optimistic
+transactions. Clients retry "busy" answers with jittered backoff, like an
+app honouring 503 Retry-After, until they get a booking or "sold out".
+
+Checks, for every shard count:
+* bookings confirmed == seats (demand exceeds supply) and == booking documents
+* every duplicate submission got the same booking back
+* seats left in the shards + seats booked + seats still held == the flight's seats
+
+and that selling out gets faster as the shard count grows.
+
+Run from ``backend/``:  python -m benchmarks.bench_inventory
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.inventory import InventoryBusyError, SeatInventory, SeatsUnavailableError, booking_id_for
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore
+
+FLIGHT = {"id": "HOT1", "airlineName": "Air India", "flightNumber": "AI1", "departureCity": "Delhi",
+          "arrivalCity": "Mumbai", "departureAirport": "DEL", "arrivalAirport": "BOM",
+          "departureTime": "2024-06-01T10:00:00Z", "arrivalTime": "2024-06-01T12:00:00Z",
+          "price": 5000.0, "availableSeats": 0, "travelClasses": ["Economy"], "amenities": [],
+          "status": "Scheduled"}
+
+
+async def run_shards(shards: int, args):
+    firestore = FakeAsyncFirestore(args.latency_ms / 1000)
+    view = firestore.sync_view()
+    view.seed("flights", {FLIGHT["id"]: dict(FLIGHT, availableSeats=args.seats)})
+    inventories = [SeatInventory(shards=shards, sync_interval=3600) for _ in range(args.workers)]
+    for inventory in inventories:
+        inventory.start(FirestoreRepository(firestore, is_async=True))
+    rng = random.Random(args.seed)
+
+    async def client(user: int, use_hold: bool):
+        inventory = rng.choice(inventories)
+        booking = {"user_id": f"user{user}", "flight_id": FLIGHT["id"], "passengers": 1,
+                   "travelClass": "Economy", "totalPrice": FLIGHT["price"], "status": "confirmed"}
+        booking_id = booking_id_for(booking["user_id"], "checkout")
+        hold_id = None
+        delay = args.backoff_ms / 1000
+        while True:
+            try:
+                if use_hold and hold_id is None:
+                    hold_id = (await inventory.hold(FLIGHT["id"], 1, booking["user_id"]))["id"]
+                stored, _ = await inventory.book(dict(booking, id=booking_id), booking_id, hold_id)
+                return stored["id"]
+            except InventoryBusyError:
+                await asyncio.sleep(rng.uniform(0, delay))
+                delay = min(delay * 2, 1.0)
+            except SeatsUnavailableError:
+                return None
+
+    users = list(range(args.bookings))
+    duplicates = users[:int(args.bookings * args.duplicates)]
+    holders = set(users[-int(args.bookings * args.holds):]) if args.holds else set()
+    requests = [(user, client(user, user in holders)) for user in users + duplicates]
+    rng.shuffle(requests)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(request for _, request in requests))
+    elapsed = time.perf_counter() - start
+    for inventory in inventories:
+        await inventory.stop()
+
+    by_user = {}
+    for (user, _), booking_id in zip(requests, results):
+        by_user.setdefault(user, set()).add(booking_id)
+    confirmed = {booking_id for ids in by_user.values() for booking_id in ids if booking_id}
+    collections = view._store.collections
+    left = sum(doc["available"] for doc in collections.get("seat_shards", {}).values())
+    held = sum(doc["seats"] for doc in collections.get("seat_holds", {}).values())
+    booked = len(collections.get("bookings", {}))
+
+    assert all(len(ids) == 1 for ids in by_user.values()), "a duplicate got a different answer"
+    assert min(doc["available"] for doc in collections["seat_shards"].values()) >= 0, "negative shard"
+    assert booked == len(confirmed) == args.seats, f"{booked} booked for {args.seats} seats ({left} left, {held} held)"
+    assert left + booked + held == args.seats, f"{left} left + {booked} booked + {held} held"
+
+    print(f"shards={shards:<3} sold {booked} seats in {elapsed:6.2f} s  {booked / elapsed:7.1f} bookings/s  "
+          f"contention {sum(i.contention for i in inventories):6d}  rpcs {firestore.rpc_count}")
+    return booked / elapsed
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seats", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bookings", type=int, default=2000, help="distinct customers")
+    parser.add_argument("--duplicates", type=float, default=0.1,
+                        help="share of customers who submit twice")
+    parser.add_argument("--holds", type=float, default=0.3,
+                        help="share of customers who hold seats before booking")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--backoff-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rates = [asyncio.run(run_shards(shards, args)) for shards in args.shards]
+    print(f"speed-up {args.shards[-1]} vs {args.shards[0]} shards: {rates[-1] / rates[0]:.1f}x")
+    assert rates[-1] > rates[0], "more shards did not sell faster"
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,100 @@
+# backend/benchmarks/bench_metrics.py
+"""Overhead of the request metrics middleware and dependency spans.
+
+Times a bare ASGI endpoint with and without ``MetricsMiddleware`` (labelling
+requests with the real route templates), then sets that cost against the
+end-to-end latency of real routes served by the app. Requests are driven at the ASGI
+level so client overhead doesn't dilute the numbers.
+
+Run from ``backend/``:  python -m benchmarks.bench_metrics
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app import main
+from app.metrics import MetricsMiddleware, span
+
+
+def http_scope(path: str, query: str = ""):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def bare_endpoint(endpoint):
+    async def app(scope, receive, send):
+        # What the router leaves in the scope for the middleware to read
+        if endpoint is not None:
+            scope["endpoint"] = endpoint
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+async def per_request(app, path: str, query: str, repeat: int) -> float:
+    """Median seconds per request over ``repeat`` sequential calls."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await app(http_scope(path, query), receive, send)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def run(args):
+    endpoints = {route.path: route.endpoint for route in main.app.router.routes}
+    overhead = 0.0
+    for path in ("/flights/search", "/flights/{flight_id}", None):
+        bare = bare_endpoint(endpoints.get(path))
+        wrapped = MetricsMiddleware(bare, routes=lambda: main.app.router.routes)
+        await per_request(wrapped, "/", "", 1000)  # warm up
+        bare_latency = await per_request(bare, "/", "", args.repeat)
+        instrumented = await per_request(wrapped, "/", "", args.repeat)
+        overhead = max(overhead, instrumented - bare_latency)
+        print(f"middleware {path or 'unmatched':<22} +{(instrumented - bare_latency) * 1e6:6.2f} us per request")
+
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        with span("bench", "noop"):
+            pass
+        samples.append(time.perf_counter() - start)
+    print(f"span()                            {statistics.median(samples) * 1e6:6.2f} us per call")
+
+    # Thousands of requests from one client would otherwise be rate limited
+    main.limiter.enabled = False
+    worst = 0.0
+    for path, query in (("/flights/search", "departure_city=Mumbai"),
+                        ("/flight-suggestions", "query=mum"), ("/flights/1", ""), ("/health", "")):
+        await per_request(main.app, path, query, 200)  # warm up
+        latency = await per_request(main.app, path, query, args.repeat)
+        share = overhead / latency * 100
+        worst = max(worst, share)
+        print(f"{path + '?' + query:<40} {latency * 1e6:8.1f} us  metrics {share:4.1f}%")
+    print(f"worst-case overhead {worst:.1f}% (budget {args.budget_percent}%)")
+    assert worst <= args.budget_percent, "metrics overhead over budget"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--budget-percent", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,75 @@
+# backend/benchmarks/bench_pagination.py
+"""Page-N latency of GET /flights under offset vs cursor (keyset) pagination.
+
+The Firestore stand-in charges a per-document read cost, including rows an
+``offset()`` skips, which is what makes deep offset pages slow in production.
+
+Run from ``backend/``:  python -m benchmarks.bench_pagination
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app import main
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore
+from benchmarks.synthetic import generate_flights
+
+
+async def fetch(client, params):
+    start = time.perf_counter()
+    response = await client.get("/flights", params=params)
+    assert response.status_code == 200, response.text
+    return time.perf_counter() - start, response
+
+
+async def run(args):
+    firestore = FakeAsyncFirestore(args.latency_ms / 1000, read_latency=args.read_latency_us / 1e6)
+    flights = generate_flights(args.page * args.limit + args.limit)
+    firestore.sync_view().seed("flights", {f["id"]: f for f in flights})
+    main.repository = FirestoreRepository(firestore, is_async=True)
+    # The rate limit would turn a benchmark from one client into 429s
+    main.limiter.enabled = False
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Walk the cursor chain up to the page before the target (not timed)
+        cursor = None
+        for _ in range(args.page - 1):
+            params = {"limit": args.limit}
+            if cursor:
+                params["cursor"] = cursor
+            _, response = await fetch(client, params)
+            cursor = response.headers["X-Next-Cursor"]
+
+        offset_params = {"limit": args.limit, "page": args.page}
+        cursor_params = {"limit": args.limit, "cursor": cursor}
+        _, by_offset = await fetch(client, offset_params)
+        _, by_cursor = await fetch(client, cursor_params)
+        assert by_offset.json() == by_cursor.json()
+
+        for name, params in (("offset", offset_params), ("cursor", cursor_params)):
+            reads_before = firestore.sync_view()._store.docs_read
+            samples = [(await fetch(client, params))[0] for _ in range(args.repeat)]
+            reads = (firestore.sync_view()._store.docs_read - reads_before) // args.repeat
+            print(f"{name:>7}: page {args.page} p50 {statistics.median(samples) * 1000:8.2f} ms  "
+                  f"{reads} docs read per request")
+    main.repository = None
+    main.limiter.enabled = True
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--read-latency-us", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
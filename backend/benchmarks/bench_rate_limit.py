@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_rate_limit.py
+"""Cost of a rate-limit check, and whether the limit holds across workers.
+
+Times ``take()`` on the in-process and shared-memory bucket stores, and the
+whole route dependency (client key, bucket, decision) on a real request.
+Then several processes hammer one client's bucket at once: with the shared
+store they must together admit no more than one bucket's worth (burst plus
+refill), where per-process buckets admit that much in each process.
+
+Run from ``backend/``:  python -m benchmarks.bench_rate_limit
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+
+from starlette.requests import Request
+
+from app.rate_limit import InMemoryBucketStore, RateLimiter, SharedMemoryBucketStore
+
+SHM_NAME = f"skyview-ratelimit-bench-{os.getpid()}"
+
+
+async def per_check(take, keys, repeat: int) -> float:
+    """Median seconds per ``take`` over ``repeat`` calls cycling through ``keys``."""
+    samples = []
+    for i in range(repeat):
+        key = keys[i % len(keys)]
+        start = time.perf_counter()
+        await take(key, 1, 1e9, 1e9)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def request(ip: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/flights/1", "headers": [],
+                    "query_string": b"", "client": (ip, 1234)})
+
+
+async def timings(args):
+    keys = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(args.keys)]
+    shared = SharedMemoryBucketStore(SHM_NAME, slots=args.slots)
+    try:
+        for name, store in (("in-memory", InMemoryBucketStore()), ("shared memory", shared)):
+            await per_check(store.take, keys, 1000)  # warm up
+            hot = await per_check(store.take, keys[:1], args.repeat)
+            spread = await per_check(store.take, keys, args.repeat)
+            print(f"{name:<14} take(): one key {hot * 1e6:5.2f} us, "
+                  f"{len(keys)} keys {spread * 1e6:5.2f} us")
+
+        limiter = RateLimiter(shared, per_minute=10 ** 9)
+        requests = [request(f"10.1.{i // 256}.{i % 256}") for i in range(1000)]
+        samples = []
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            await limiter.check(requests[i % len(requests)], 1)
+            samples.append(time.perf_counter() - start)
+        print(f"route dependency (shared)     {statistics.median(samples) * 1e6:5.2f} us per request")
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def hammer(shared: bool, per_minute: int, seconds: float, results):
+    store = SharedMemoryBucketStore(SHM_NAME) if shared else InMemoryBucketStore()
+    limiter = RateLimiter(store, per_minute=per_minute)
+    client = request("203.0.113.7")
+    admitted = 0
+
+    async def loop():
+        nonlocal admitted
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                await limiter.check(client, 1)
+                admitted += 1
+            except Exception:
+                pass
+
+    asyncio.run(loop())
+    results.put(admitted)
+    if shared:
+        store.close()
+
+
+def across_workers(args) -> int:
+    shared = SharedMemoryBucketStore(SHM_NAME, slots=args.slots)
+    allowance = args.per_minute + args.per_minute / 60 * args.seconds
+    try:
+        for mode in ("per-process", "shared"):
+            results = multiprocessing.Queue()
+            workers = [multiprocessing.Process(target=hammer, args=(mode == "shared", args.per_minute,
+                                                                    args.seconds, results))
+                       for _ in range(args.workers)]
+            for worker in workers:
+                worker.start()
+            admitted = sum(results.get() for _ in workers)
+            for worker in workers:
+                worker.join()
+            print(f"{args.workers} workers, {mode:<11} buckets: admitted {admitted} "
+                  f"(one client's allowance {allowance:.0f})")
+    finally:
+        shared.close()
+        shared.unlink()
+    return admitted <= allowance + 1
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50000)
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--slots", type=int, default=65536)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--per-minute", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    asyncio.run(timings(args))
+    assert across_workers(args), "workers together exceeded one client's limit"
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_recommendations.py
+"""GET /recommendations latency against a slow Firestore stand-in.
+
+Every request is answered from the in-memory snapshot, so latency must stay
+far below one Firestore round trip even for users seen for the first time,
+and once the per-user lists are materialized no request causes an RPC at
+all. Also checks that a user's own destinations come first.
+
+Run from ``backend/``:  python -m benchmarks.bench_recommendations
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+from app import main
+from app.recommendations import RecommendationService
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore
+from benchmarks.synthetic import EPOCH, generate_flights
+
+COUNTRIES = ["India", "UK", "France", "USA", "UAE", "Singapore", "Japan", "Brazil"]
+
+
+def seed(firestore, users: int, airport_count: int):
+    rng = random.Random(7)
+    flights = generate_flights(users * 3, airport_count=airport_count)
+    locations = {
+        f"loc{i}": {"city": f"City {i:03d}", "country": COUNTRIES[i % len(COUNTRIES)],
+                    "code": None, "airportName": None, "imageUrl": None,
+                    "isPopular": True, "popularity": rng.randint(0, 10000)}
+        for i in range(airport_count)
+    }
+    bookings = {}
+    for u in range(users):
+        for b, flight in enumerate(rng.sample(flights, 3)):
+            bookings[f"b{u}-{b}"] = {
+                "user_id": f"user{u}", "flight_id": flight["id"], "passengers": 1,
+                "travelClass": "Economy", "totalPrice": flight["price"], "status": "confirmed",
+                "bookingTime": (EPOCH.replace(day=1 + b)).isoformat(),
+            }
+    view = firestore.sync_view()
+    view.seed("flights", {f["id"]: f for f in flights})
+    view.seed("locations", locations)
+    view.seed("bookings", bookings)
+    return {f["id"]: f for f in flights}, bookings
+
+
+async def timed_requests(client, user_ids):
+    samples = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        response = await client.get("/recommendations", params={"user_id": user_id})
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:>12}: p50 {statistics.median(samples) * 1000:7.3f} ms  p99 {p99 * 1000:7.3f} ms")
+    return p99
+
+
+async def run(args):
+    latency = args.latency_ms / 1000
+    firestore = FakeAsyncFirestore(latency)
+    flights, bookings = seed(firestore, args.users, args.airports)
+    repository = FirestoreRepository(firestore, is_async=True)
+    main.repository = repository
+    main.recommendations = service = RecommendationService(refresh_interval=args.refresh_seconds,
+                                                            max_concurrent_refreshes=16)
+    service.start(repository)
+    # The rate limit would turn a benchmark from one client into 429s
+    main.limiter.enabled = False
+    user_ids = [f"user{u}" for u in range(args.users)]
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # First sight of each user: the global list is served immediately
+        while service._global_at is None:
+            await asyncio.sleep(0.01)
+        rpcs_before = firestore.rpc_count
+        cold = report("cold users", await timed_requests(client, user_ids))
+        while service._pending:
+            await asyncio.sleep(0.01)
+        refresh_rpcs = (firestore.rpc_count - rpcs_before) / args.users
+        assert refresh_rpcs <= 2, f"{refresh_rpcs:.1f} Firestore RPCs per user refresh"
+
+        rpcs_before = firestore.rpc_count
+        warm = report("warm users", await timed_requests(client, user_ids))
+        assert firestore.rpc_count == rpcs_before, "request path hit Firestore"
+        assert max(cold, warm) < latency, "a request waited on Firestore"
+
+        # The user's own destinations lead their list
+        response = await client.get("/recommendations", params={"user_id": "user0"})
+        cities = [r["city"] for r in response.json()["recommendations"]]
+        flown = [flights[b["flight_id"]]["arrivalCity"] for b in bookings.values() if b["user_id"] == "user0"]
+        assert cities[0] in flown, (cities, flown)
+
+        stats = (await client.get("/health")).json()["recommendations"]
+        print(f"{'snapshot':>12}: global age {stats['global_age_seconds']:.2f} s, "
+              f"{stats['users_cached']} users, oldest {stats['oldest_user_age_seconds']:.2f} s, "
+              f"{stats['refresh_errors']} refresh errors, {refresh_rpcs:.1f} RPCs per user refresh")
+
+    await service.stop()
+    main.repository = None
+    main.limiter.enabled = True
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--airports", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--refresh-seconds", type=float, default=300.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_repository.py
+"""Concurrent throughput of the Firestore data layer on a single worker.
+
+Drives ``GET /flights/{id}`` through the ASGI app with three data layers:
+
+* blocking   - the sync client called directly on the event loop (old handlers)
+* threadpool - FirestoreRepository offloading the sync client to worker threads
+* async      - FirestoreRepository awaiting the async client
+
+Run from ``backend/``:  python -m benchmarks.bench_repository
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app import main
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore, FakeFirestore
+
+FLIGHT = {
+    "id": "1", "airlineName": "Air India", "flightNumber": "AI101",
+    "departureCity": "Delhi", "arrivalCity": "London",
+    "departureAirport": "DEL", "arrivalAirport": "LHR",
+    "departureTime": "2024-06-01T10:00:00Z", "arrivalTime": "2024-06-01T14:00:00Z",
+    "price": 50000, "availableSeats": 5, "travelClasses": ["Economy", "Business"],
+    "amenities": ["meal", "wifi"], "status": "Scheduled", "gate": "A1",
+    "terminal": "T3", "lastUpdated": "", "logo": "", "isNonStop": True,
+}
+
+
+class BlockingRepository(FirestoreRepository):
+    """What the handlers used to do: call the sync client on the event loop."""
+
+    async def _run(self, sync_call, async_call, timeout=None):
+        return sync_call()
+
+
+def build_repository(mode: str, latency: float, workers: int) -> FirestoreRepository:
+    if mode == "async":
+        client = FakeAsyncFirestore(latency)
+        client.sync_view().seed("flights", {"1": FLIGHT})
+        return FirestoreRepository(client, is_async=True)
+    client = FakeFirestore(latency)
+    client.seed("flights", {"1": FLIGHT})
+    if mode == "blocking":
+        return BlockingRepository(client, max_workers=1)
+    return FirestoreRepository(client, max_workers=workers)
+
+
+async def run_mode(mode: str, requests: int, concurrency: int, latency: float, workers: int):
+    main.repository = build_repository(mode, latency, workers)
+    # Every request should reach the data layer being measured
+    main.flight_cache.enabled = False
+    # The rate limit would turn a benchmark from one client into 429s
+    main.limiter.enabled = False
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/flights/1")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    main.repository.close()
+    main.repository = None
+    main.flight_cache.enabled = True
+    main.limiter.enabled = True
+    latencies.sort()
+    return {
+        "mode": mode,
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.latency_ms:.1f} ms per Firestore RPC")
+    for mode in ("blocking", "threadpool", "async"):
+        result = asyncio.run(run_mode(mode, args.requests, args.concurrency, latency, args.workers))
+        print(f"{result['mode']:>10}: {result['rps']:8.1f} req/s  "
+              f"p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_serialization.py
+"""Cost of producing a JSON flight list, by response size.
+
+Serves the same page of ``n`` flights through four small FastAPI routes and
+times whole requests at the ASGI level:
+
+* response_model - models returned with ``response_model`` and the stock
+  JSONResponse (dump, validate again, jsonable values, json.dumps); what
+  every route did before
+* fast models    - models returned in a ``FastJSONResponse`` (pydantic's
+  Rust serializer, no second validation)
+* fast records   - catalogue records (already validated) through orjson,
+  no models at all; what /flights/search does
+* cached payload - bytes serialized once, with an ETag; what
+  /flights/{id}, /recommendations and /flight-suggestions do for content
+  they've served before
+* 304            - the cached payload's ETag sent back in If-None-Match
+
+Run from ``backend/``:  python -m benchmarks.bench_serialization
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.flight_catalogue import ColumnarFlightCatalogue
+from app.main import FlightModel
+from app.responses import FastJSONResponse, Payload
+from benchmarks.bench_metrics import http_scope, receive
+from benchmarks.synthetic import generate_flights
+
+
+def build_app(models, records, payload: Payload) -> FastAPI:
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.get("/response-model", response_model=List[FlightModel])
+    async def response_model():
+        return models
+
+    @app.get("/fast-models", response_model=List[FlightModel])
+    async def fast_models():
+        return FastJSONResponse(models)
+
+    @app.get("/fast-records", response_model=List[FlightModel])
+    async def fast_records():
+        return FastJSONResponse(records)
+
+    @app.get("/payload", response_model=List[FlightModel])
+    async def cached_payload(request: Request):
+        return payload.response(request)
+
+    return app
+
+
+async def time_requests(app, path: str, headers, requests: int):
+    scope = http_scope(path)
+    scope["headers"] = scope["headers"] + headers
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests, sent
+
+
+async def run(args):
+    flights = generate_flights(max(args.sizes))
+    print(f"{'flights':>7} {'bytes':>8}  {'response_model':>14} {'fast models':>11} "
+          f"{'fast records':>12} {'cached':>8} {'304':>8}   (us per request)")
+    for size in args.sizes:
+        catalogue = ColumnarFlightCatalogue.from_models(FlightModel(**f) for f in flights[:size])
+        records = [catalogue.record(row) for row in range(size)]
+        models = [FlightModel(**record) for record in records]
+        payload = Payload.of(models)
+        app = build_app(models, records, payload)
+        requests = max(20, args.budget // size)
+
+        times, bodies = {}, {}
+        for name, path, headers in (
+                ("response_model", "/response-model", []),
+                ("fast models", "/fast-models", []),
+                ("fast records", "/fast-records", []),
+                ("cached", "/payload", []),
+                ("304", "/payload", [(b"if-none-match", payload.etag.encode())])):
+            await time_requests(app, path, headers, 5)
+            times[name], sent = await time_requests(app, path, headers, requests)
+            bodies[name] = b"".join(m.get("body", b"") for m in sent[-2:])
+        assert bodies["fast models"] == bodies["fast records"] == bodies["cached"], "outputs differ"
+        assert json.loads(bodies["response_model"]) == json.loads(bodies["cached"]), "outputs differ"
+        assert bodies["304"] == b""
+        print(f"{size:7d} {len(payload.body):8d}  " + " ".join(
+            f"{times[name] * 1e6:{width}.0f}" for name, width in (
+                ("response_model", 14), ("fast models", 11), ("fast records", 12),
+                ("cached", 8), ("304", 8))))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--budget", type=int, default=20000, help="flights serialized per route and size")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,74 @@
+# backend/benchmarks/bench_startup.py
+"""Import time of ``app.main`` and cold start to the first HTTP response.
+
+Each sample is a fresh interpreter: the import is timed in-process, the
+cold start from spawning the server until ``GET /health`` first answers.
+
+Run from ``backend/``:  python -m benchmarks.bench_startup
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds() -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def cold_start_seconds(command, timeout: float = 60.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(command + ["--port", str(port)], cwd=BACKEND_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer /health in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--command", default="uvicorn app.main:app --host 127.0.0.1",
+                        help="server command line, without --port")
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.repeat)]
+    print(f"import app.main: median {statistics.median(imports) * 1000:7.1f} ms")
+    command = [sys.executable, "-m"] + args.command.split() if args.command.startswith("uvicorn") \
+        else [sys.executable] + args.command.split()
+    starts = [cold_start_seconds(command) for _ in range(args.repeat)]
+    print(f"cold start to first response: median {statistics.median(starts) * 1000:7.1f} ms "
+          f"({args.command})")
+
+
+if __name__ == "__main__":
+    main_cli()
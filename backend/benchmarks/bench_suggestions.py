@@ -0,0 +1,93 @@
+# backend/benchmarks/bench_suggestions.py
+"""Autocomplete latency of AirportIndex at global-airport-list scale.
+
+Builds a synthetic list (default 30k airports with pronounceable city and
+airport names, codes and aliases), then replays keystroke sequences: every
+prefix of a random city/airport/code, as the Flutter search screen sends
+them. Reports cold (ranking cache cleared) and warm per-lookup latency next
+to the old substring scan.
+
+Run from ``backend/``:  python -m benchmarks.bench_suggestions
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.airport_index import AirportIndex
+from benchmarks.synthetic import airport_code
+
+SYLLABLES = [onset + vowel + coda for onset in ["", "b", "ch", "d", "g", "h", "j", "k", "l", "m",
+                                                   "n", "p", "r", "s", "sh", "t", "v", "w", "y", "z"]
+             for vowel in "aeiou" for coda in ["", "n", "r"]]
+SUFFIXES = ["International Airport", "Airport", "Regional Airport", "Airfield"]
+
+
+def synthetic_airports(count: int, seed: int = 11):
+    rng = random.Random(seed)
+
+    def name(parts):
+        return "".join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+    return [{
+        "city": name(rng.randrange(2, 4)),
+        "country": "Testland",
+        "code": airport_code(i),
+        "icao": "X" + airport_code(i),
+        "airport": f"{name(3)} {rng.choice(SUFFIXES)}",
+        "aliases": [name(2)] if rng.random() < 0.2 else [],
+        "popularity": rng.paretovariate(1.2),
+    } for i in range(count)]
+
+
+def substring_scan(airports, query):
+    query = query.lower()
+    return [a for a in airports if query in a["city"].lower() or query in a["code"].lower()]
+
+
+def keystrokes(airports, count: int, seed: int = 5):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        airport = rng.choice(airports)
+        word = rng.choice([airport["city"], airport["code"], airport["airport"].split()[0][2:]])
+        queries.extend(word[:n] for n in range(1, len(word) + 1))
+    return queries
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99) - 1] * 1000, samples[-1] * 1000
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--airports", type=int, default=30_000)
+    parser.add_argument("--words", type=int, default=300)
+    args = parser.parse_args()
+
+    airports = synthetic_airports(args.airports)
+    start = time.perf_counter()
+    index = AirportIndex(airports)
+    print(f"indexed {len(index)} airports in {time.perf_counter() - start:.2f} s")
+
+    queries = keystrokes(airports, args.words)
+    p50, p99, worst = timed(lambda q: substring_scan(airports, q), queries[:300])
+    print(f"  substring scan: p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.3f} ms")
+
+    # Cold: only the single-character prefixes ranked at startup are cached
+    index._search_cached.cache_clear()
+    index.warm()
+    p50, p99, worst = timed(lambda q: index.search(q, 10), queries)
+    print(f"  index (cold):   p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.3f} ms  ({len(queries)} lookups)")
+    p50, p99, worst = timed(lambda q: index.search(q, 10), queries)
+    print(f"  index (warm):   p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,568 @@
+# backend/benchmarks/fakes.py
+"""In-memory stand-ins for the Firestore clients used by the benchmarks.
+
+``FakeFirestore`` mimics the sync client (blocking calls), ``FakeAsyncFirestore``
+the async one (awaitable calls). Both add a configurable per-RPC latency so
+the benchmarks behave like a remote emulator rather than a dict lookup.
+
+Transactions are optimistic: a commit aborts (and the real
+``transactional`` decorators retry) when a document it read has been written
+since, which is how contention on a hot document shows up here.
+
+``on_snapshot`` is the change feed: like the real client's watch, each
+listener gets the document's current snapshot and then one per write, called
+on a background thread.
+"""
+import asyncio
+import copy
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import Aborted, NotFound
+from google.cloud.firestore import SERVER_TIMESTAMP
+
+_OPS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _resolve(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Server timestamps are filled in when the write is applied, as in Firestore
+    now = datetime.now(timezone.utc)
+    return {key: now if value is SERVER_TIMESTAMP else copy.deepcopy(value)
+            for key, value in data.items()}
+
+
+def _field(row, field: str):
+    doc_id, data = row
+    return doc_id if field == '__name__' else data.get(field)
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]], reference=None):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def get(self, field: str):
+        return (self._data or {}).get(field)
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class _Store:
+    def __init__(self, latency: float, read_latency: float = 0.0):
+        self.latency = latency
+        # Extra time per document read, including rows skipped by offset()
+        self.read_latency = read_latency
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Write count per document path, for transaction conflict checks
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.RLock()
+        self.rpc_count = 0
+        self.docs_read = 0
+        # Snapshot listeners per document path, and the thread calling them
+        self.watches: Dict[str, List["FakeWatch"]] = {}
+        self.snapshots_delivered = 0
+        self._feed: Optional[queue.Queue] = None
+
+    def count_rpc(self, reads: int = 0) -> float:
+        """Record one RPC and return how long it should take."""
+        with self.lock:
+            self.rpc_count += 1
+            self.docs_read += reads
+        return self.latency + self.read_latency * reads
+
+    def deliver(self, watch: "FakeWatch", snapshot: FakeSnapshot):
+        if self._feed is None:
+            self._feed = queue.Queue()
+            threading.Thread(target=self._run_feed, name="firestore-watch", daemon=True).start()
+        self._feed.put((watch, snapshot))
+
+    def _run_feed(self):
+        while True:
+            watch, snapshot = self._feed.get()
+            if watch.active:
+                self.snapshots_delivered += 1
+                watch.callback([snapshot] if snapshot.exists else [], [], datetime.now(timezone.utc))
+
+    def changed(self, reference):
+        for watch in self.watches.get(reference.path, ()):
+            self.deliver(watch, reference._snapshot())
+
+
+class FakeWatch:
+    """What ``on_snapshot`` returns; ``unsubscribe()`` stops the callbacks."""
+
+    def __init__(self, reference, callback):
+        self._store = reference._client._store
+        self._path = reference.path
+        self.callback = callback
+        self.active = True
+        with self._store.lock:
+            self._store.watches.setdefault(self._path, []).append(self)
+            self._store.deliver(self, reference._snapshot())
+
+    def unsubscribe(self):
+        with self._store.lock:
+            self.active = False
+            watches = self._store.watches.get(self._path, [])
+            if self in watches:
+                watches.remove(self)
+            if not watches:
+                self._store.watches.pop(self._path, None)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection: str, doc_id: Optional[str] = None):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id or uuid.uuid4().hex[:20]
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection}/{self.id}"
+
+    def _docs(self) -> Dict[str, Dict[str, Any]]:
+        return self._client._store.collections.setdefault(self._collection, {})
+
+    def _snapshot(self) -> FakeSnapshot:
+        return FakeSnapshot(self.id, copy.deepcopy(self._docs().get(self.id)), self)
+
+    def _written(self):
+        versions = self._client._store.versions
+        versions[self.path] = versions.get(self.path, 0) + 1
+        self._client._store.changed(self)
+
+    def _write(self, data: Dict[str, Any], merge: bool = False):
+        with self._client._store.lock:
+            if merge and self.id in self._docs():
+                self._docs()[self.id].update(_resolve(data))
+            else:
+                self._docs()[self.id] = _resolve(data)
+            self._written()
+
+    def _update(self, data: Dict[str, Any]):
+        with self._client._store.lock:
+            if self.id not in self._docs():
+                raise NotFound(f"No document to update: {self.path}")
+            self._docs()[self.id].update(_resolve(data))
+            self._written()
+
+    def _delete(self):
+        with self._client._store.lock:
+            self._docs().pop(self.id, None)
+            self._written()
+
+    def get(self):
+        self._client._rpc(1)
+        return self._snapshot()
+
+    def on_snapshot(self, callback) -> FakeWatch:
+        return FakeWatch(self, callback)
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._client._rpc()
+        self._write(data, merge)
+
+    def update(self, data: Dict[str, Any]):
+        self._client._rpc()
+        self._update(data)
+
+    def delete(self):
+        self._client._rpc()
+        self._delete()
+
+
+class FakeQuery:
+    def __init__(self, client, collection: str):
+        self._client = client
+        self._collection = collection
+        self._filters: List[tuple] = []
+        self._orders: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._start_after: Optional[tuple] = None
+
+    def _copy(self):
+        query = copy.copy(self)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        return query
+
+    def where(self, field: str, op: str, value: Any):
+        query = self._copy()
+        query._filters.append((field, _OPS[op], value))
+        return query
+
+    def order_by(self, field: str, direction: str = 'ASCENDING'):
+        query = self._copy()
+        query._orders.append((field, direction == 'DESCENDING'))
+        return query
+
+    def limit(self, count: int):
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def offset(self, count: int):
+        query = self._copy()
+        query._offset = count
+        return query
+
+    def start_after(self, values):
+        # Accepts a dict of order-by field values or a snapshot
+        query = self._copy()
+        if isinstance(values, FakeSnapshot):
+            values = dict(values.to_dict(), __name__=values.id)
+        query._start_after = tuple(values[field] for field, _ in self._orders)
+        return query
+
+    def _matching(self) -> Tuple[List[FakeSnapshot], int]:
+        store = self._client._store
+        with store.lock:
+            docs = list(store.collections.get(self._collection, {}).items())
+        rows = [
+            (doc_id, data) for doc_id, data in docs
+            if all(op(data.get(field), value) for field, op, value in self._filters)
+        ]
+        # Stable multi-key sort, applied from the last key to the first
+        for field, descending in reversed(self._orders):
+            rows.sort(key=lambda row: _field(row, field), reverse=descending)
+        if self._start_after is not None:
+            rows = [row for row in rows if self._after(row)]
+        skipped = min(self._offset, len(rows))
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        snapshots = [
+            FakeSnapshot(doc_id, copy.deepcopy(data),
+                         self._client._document_class(self._client, self._collection, doc_id))
+            for doc_id, data in rows
+        ]
+        # Offset rows are still read server-side, like real Firestore
+        return snapshots, skipped + len(rows)
+
+    def _after(self, row) -> bool:
+        for (field, descending), cursor in zip(self._orders, self._start_after):
+            value = _field(row, field)
+            if value == cursor:
+                continue
+            return value < cursor if descending else value > cursor
+        return False
+
+    def stream(self):
+        snapshots, reads = self._matching()
+        self._client._rpc(reads)
+        return iter(snapshots)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def document(self, doc_id: Optional[str] = None):
+        return self._client._document_class(self._client, self._collection, doc_id)
+
+
+class FakeWriteBatch:
+    """Buffers writes and applies them in one RPC on ``commit()``."""
+
+    MAX_WRITES = 500
+
+    def __init__(self, client):
+        self._client = client
+        self._writes: List[Tuple[str, Any, Dict[str, Any], bool]] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference, data: Dict[str, Any]):
+        self._writes.append(("update", reference, data, False))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference, {}, False))
+
+    def _apply(self):
+        if len(self._writes) > self.MAX_WRITES:
+            raise ValueError(f"A batch can contain at most {self.MAX_WRITES} writes")
+        for op, reference, data, merge in self._writes:
+            if op == "set":
+                reference._write(data, merge)
+            elif op == "update":
+                reference._update(data)
+            else:
+                reference._delete()
+        self._writes = []
+
+    def commit(self):
+        self._client._rpc()
+        self._apply()
+
+
+class FakeAsyncWriteBatch(FakeWriteBatch):
+    async def commit(self):
+        await self._client._rpc()
+        self._apply()
+
+
+class FakeTransaction(FakeWriteBatch):
+    """Enough of ``Transaction`` for ``google.cloud.firestore.transactional``.
+
+    Reads record the version of each document; ``_commit`` raises
+    ``Aborted`` if any of them has been written since, otherwise applies the
+    buffered writes atomically.
+    """
+
+    def __init__(self, client, max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._read_versions: Dict[str, int] = {}
+
+    def _clean_up(self):
+        self._writes = []
+        self._read_versions = {}
+        self._id = None
+
+    def _read(self, references) -> List[FakeSnapshot]:
+        store = self._client._store
+        with store.lock:
+            for reference in references:
+                self._read_versions[reference.path] = store.versions.get(reference.path, 0)
+            return [reference._snapshot() for reference in references]
+
+    def _check_and_apply(self):
+        store = self._client._store
+        with store.lock:
+            for path, version in self._read_versions.items():
+                if store.versions.get(path, 0) != version:
+                    self._clean_up()
+                    raise Aborted(f"Transaction lock timeout on {path}")
+            self._apply()
+        self._clean_up()
+
+    def _begin(self, retry_id=None):
+        self._client._rpc()
+        self._id = uuid.uuid4().bytes
+
+    def get_all(self, references):
+        self._client._rpc(len(references))
+        return iter(self._read(references))
+
+    def _commit(self):
+        self._client._rpc()
+        self._check_and_apply()
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class FakeAsyncTransaction(FakeTransaction):
+    async def _begin(self, retry_id=None):
+        await self._client._rpc()
+        self._id = uuid.uuid4().bytes
+
+    async def get_all(self, references):
+        await self._client._rpc(len(references))
+        snapshots = self._read(references)
+
+        async def results():
+            for snapshot in snapshots:
+                yield snapshot
+        return results()
+
+    async def _commit(self):
+        await self._client._rpc()
+        self._check_and_apply()
+
+    async def _rollback(self):
+        self._clean_up()
+
+
+class FakeFirestore:
+    """Blocking client: each RPC sleeps the calling thread for ``latency``."""
+
+    _document_class = FakeDocumentReference
+    _collection_class = FakeCollectionReference
+    _batch_class = FakeWriteBatch
+    _transaction_class = FakeTransaction
+
+    def __init__(self, latency: float = 0.0, store: Optional[_Store] = None,
+                 read_latency: float = 0.0):
+        self._store = store or _Store(latency, read_latency)
+
+    @property
+    def rpc_count(self) -> int:
+        return self._store.rpc_count
+
+    def _rpc(self, reads: int = 0):
+        delay = self._store.count_rpc(reads)
+        if delay:
+            time.sleep(delay)
+
+    def collection(self, name: str):
+        return self._collection_class(self, name)
+
+    def batch(self):
+        return self._batch_class(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False):
+        return self._transaction_class(self, max_attempts, read_only)
+
+    def get_all(self, references):
+        self._rpc(len(references))
+        return iter([reference._snapshot() for reference in references])
+
+    def seed(self, collection: str, docs: Dict[str, Dict[str, Any]]):
+        with self._store.lock:
+            self._store.collections.setdefault(collection, {}).update(copy.deepcopy(docs))
+
+
+class FakeAsyncDocumentReference(FakeDocumentReference):
+    async def get(self):
+        await self._client._rpc(1)
+        return self._snapshot()
+
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        await self._client._rpc()
+        self._write(data, merge)
+
+    async def update(self, data: Dict[str, Any]):
+        await self._client._rpc()
+        self._update(data)
+
+    async def delete(self):
+        await self._client._rpc()
+        self._delete()
+
+
+class FakeAsyncQueryMixin:
+    async def stream(self):
+        snapshots, reads = self._matching()
+        await self._client._rpc(reads)
+        for snapshot in snapshots:
+            yield snapshot
+
+    async def get(self):
+        return [doc async for doc in self.stream()]
+
+
+class FakeAsyncCollectionReference(FakeAsyncQueryMixin, FakeCollectionReference):
+    pass
+
+
+class FakeAsyncFirestore(FakeFirestore):
+    """Awaitable client: each RPC yields to the event loop for ``latency``."""
+
+    _document_class = FakeAsyncDocumentReference
+    _collection_class = FakeAsyncCollectionReference
+    _batch_class = FakeAsyncWriteBatch
+    _transaction_class = FakeAsyncTransaction
+
+    async def _rpc(self, reads: int = 0):
+        await asyncio.sleep(self._store.count_rpc(reads))
+
+    async def get_all(self, references):
+        await self._rpc(len(references))
+        for reference in references:
+            yield reference._snapshot()
+
+    def sync_view(self) -> FakeFirestore:
+        # A blocking client over the same data, for seeding and assertions
+        return FakeFirestore(store=self._store)
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamingResponse:
+    def __init__(self, chunks: List[str], first_token_latency: float, token_interval: float):
+        self._chunks = chunks
+        self._first_token_latency = first_token_latency
+        self._token_interval = token_interval
+        self.text = "".join(chunks)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._first_token_latency)
+        for i, chunk in enumerate(self._chunks):
+            if i:
+                await asyncio.sleep(self._token_interval)
+            yield FakeChunk(chunk)
+
+
+def _check_content(content):
+    # The SDK's own conversion, so a message it would reject fails here too
+    from google.generativeai.types import content_types
+
+    content_types.to_content(content)
+
+
+class FakeChatSession:
+    def __init__(self, model):
+        self._model = model
+
+    def _chunks(self) -> List[str]:
+        return [f"token{i} " for i in range(self._model.tokens)]
+
+    async def send_message_async(self, content, stream: bool = False, **kwargs):
+        _check_content(content)
+        self._model.calls += 1
+        response = FakeStreamingResponse(
+            self._chunks(), self._model.first_token_latency, 1 / self._model.tokens_per_second
+        )
+        if stream:
+            return response
+        # Non-streaming: the whole generation happens before returning
+        await asyncio.sleep(self._model.generation_time)
+        return response
+
+    def send_message(self, content, **kwargs):
+        _check_content(content)
+        self._model.calls += 1
+        time.sleep(self._model.generation_time)
+        return FakeStreamingResponse(self._chunks(), 0, 0)
+
+
+class FakeGeminiModel:
+    """Stand-in for ``genai.GenerativeModel`` with a configurable token rate."""
+
+    def __init__(self, tokens: int = 50, tokens_per_second: float = 100.0,
+                 first_token_latency: float = 0.2):
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.calls = 0
+
+    @property
+    def generation_time(self) -> float:
+        return self.first_token_latency + (self.tokens - 1) / self.tokens_per_second
+
+    def start_chat(self, history=None):
+        from google.generativeai.types import content_types
+
+        # Raises for a history the SDK wouldn't accept either
+        content_types.to_contents(history or [])
+        return FakeChatSession(self)
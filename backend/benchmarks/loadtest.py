@@ -0,0 +1,283 @@
+# backend/benchmarks/loadtest.py
+"""Offline load test of the whole API with Firestore and Gemini stand-ins.
+
+Boots ``app.main.app`` (startup and shutdown hooks included) against an
+in-memory Firestore with per-RPC latency and a fake Gemini model with a fixed
+token rate, then drives a weighted mix of search, flight detail, booking and
+chat traffic at each concurrency level in turn. Results are printed as JSON:
+throughput per level and count/errors/p50/p95/p99 per route.
+
+``--baseline FILE`` turns the run into a regression gate: it exits non-zero
+when a route's p95 or a level's throughput is worse than the stored baseline
+by more than ``--tolerance``. A p95 must also be at least ``--p95-floor-ms``
+slower: many routes answer in about a millisecond, where a relative
+tolerance is smaller than the run-to-run noise. ``--save-baseline FILE``
+records a new one.
+
+Run from ``backend/``:
+    python -m benchmarks.loadtest --output results.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import httpx
+
+from app import main
+from app.chat import LLMLimiter
+from app.repository import FirestoreRepository
+from benchmarks.fakes import FakeAsyncFirestore, FakeGeminiModel
+from benchmarks.synthetic import EPOCH, generate_flights
+
+# (route label, weight); the label is the route template as in /metrics
+TRAFFIC_MIX = [
+    ("GET /flights/search", 35),
+    ("GET /flights/{flight_id}", 25),
+    ("GET /flight-suggestions", 10),
+    ("GET /bookings/{user_id}", 10),
+    ("POST /bookings", 5),
+    ("GET /recommendations", 5),
+    ("POST /chat", 10),
+]
+
+# Most chat traffic repeats a handful of questions; the rest is unique
+FAQ = ["What is the baggage allowance?", "How do I cancel my booking?",
+       "Can I change my flight?", "Do you have flights to London?"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Scenario:
+    """Seeds the stand-ins and builds one random request per call."""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.flights = generate_flights(args.flights, airport_count=args.airports)
+        # Booking a sold-out flight is a correct 409, not a failure; don't pick those
+        self.bookable = [f for f in self.flights if f["availableSeats"] > 0]
+        self.cities = sorted({f["departureCity"] for f in self.flights})
+        self.users = [f"user{i}" for i in range(args.users)]
+        self.routes, self.weights = zip(*TRAFFIC_MIX)
+
+    def seed(self, firestore: FakeAsyncFirestore):
+        view = firestore.sync_view()
+        view.seed("flights", {f["id"]: f for f in self.flights})
+        view.seed("locations", {
+            f"loc{i}": {"city": city, "country": "India", "code": None, "airportName": None,
+                        "imageUrl": None, "isPopular": True, "popularity": i}
+            for i, city in enumerate(self.cities)
+        })
+        bookings = {}
+        for u, user in enumerate(self.users):
+            for b in range(5):
+                flight = self.flights[(u * 5 + b) % len(self.flights)]
+                bookings[f"{user}-{b}"] = {
+                    "user_id": user, "flight_id": flight["id"], "passengers": 1,
+                    "travelClass": "Economy", "totalPrice": flight["price"],
+                    "status": "confirmed", "bookingTime": EPOCH.replace(day=1 + b),
+                }
+        view.seed("bookings", bookings)
+
+    def request(self) -> Dict[str, Any]:
+        rng = self.rng
+        route = rng.choices(self.routes, self.weights)[0]
+        if route == "GET /flights/search":
+            origin, destination = rng.sample(self.cities, 2)
+            params = {"departure_city": origin, "limit": 20}
+            if rng.random() < 0.5:
+                params["arrival_city"] = destination
+            return {"route": route, "method": "GET", "url": "/flights/search", "params": params,
+                    "headers": {"X-API-Key": main.settings.API_KEY}}
+        if route == "GET /flights/{flight_id}":
+            return {"route": route, "method": "GET", "url": f"/flights/{rng.choice(self.flights)['id']}"}
+        if route == "GET /flight-suggestions":
+            city = rng.choice(self.cities)
+            return {"route": route, "method": "GET", "url": "/flight-suggestions",
+                    "params": {"query": city[:rng.randint(1, 4)]}}
+        if route == "GET /bookings/{user_id}":
+            return {"route": route, "method": "GET", "url": f"/bookings/{rng.choice(self.users)}",
+                    "params": {"limit": 20}}
+        if route == "POST /bookings":
+            flight = rng.choice(self.bookable)
+            return {"route": route, "method": "POST", "url": "/bookings", "json": {
+                "user_id": rng.choice(self.users), "flight_id": flight["id"], "passengers": 1,
+                "travelClass": "Economy", "totalPrice": flight["price"]}}
+        if route == "GET /recommendations":
+            return {"route": route, "method": "GET", "url": "/recommendations",
+                    "params": {"user_id": rng.choice(self.users)}}
+        question = rng.choice(FAQ) if rng.random() < 0.7 else f"Question {rng.random()}"
+        body = {"messages": [{"role": "user", "content": question}]}
+        if rng.random() < 0.3:
+            body["user_id"] = rng.choice(self.users)
+        return {"route": route, "method": "POST", "url": "/chat", "json": body}
+
+
+async def run_level(client, scenario: Scenario, concurrency: int, requests: int) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            spec = scenario.request()
+            route = spec.pop("route")
+            start = time.perf_counter()
+            try:
+                response = await client.request(**spec)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            samples[route].append(time.perf_counter() - start)
+            if not ok:
+                errors[route] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for route, latencies in sorted(samples.items()):
+        routes[route] = {
+            "count": len(latencies),
+            "errors": errors[route],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        }
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "routes": routes,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    scenario = Scenario(args)
+    firestore = FakeAsyncFirestore(args.firestore_latency_ms / 1000)
+    scenario.seed(firestore)
+    model = FakeGeminiModel(tokens=args.gemini_tokens, tokens_per_second=args.gemini_tokens_per_second,
+                            first_token_latency=args.gemini_first_token_ms / 1000)
+
+    # Inject the stand-ins, then boot the app as uvicorn would
+    main.repository = FirestoreRepository(firestore, is_async=True)
+    main.app.dependency_overrides[main.get_chat_model] = lambda: model
+    main.llm_limiter = LLMLimiter(main.settings.MAX_CONCURRENT_LLM_CALLS,
+                                  main.settings.LLM_QUEUE_TIMEOUT_SECONDS)
+    # The rate limit would turn a load test from one client into 429s
+    main.limiter.enabled = False
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            # Warm-up pass so first-request costs don't land in level one
+            await run_level(client, scenario, max(args.concurrency), args.warmup)
+            levels = [await run_level(client, scenario, concurrency, args.requests)
+                      for concurrency in args.concurrency]
+    finally:
+        await main.app.router.shutdown()
+        main.app.dependency_overrides.clear()
+        main.limiter.enabled = True
+        main.repository = None
+
+    return {
+        "config": {
+            "flights": args.flights, "users": args.users, "seed": args.seed,
+            "firestore_latency_ms": args.firestore_latency_ms,
+            "gemini_tokens": args.gemini_tokens,
+            "gemini_tokens_per_second": args.gemini_tokens_per_second,
+            "gemini_first_token_ms": args.gemini_first_token_ms,
+            "mix": dict(TRAFFIC_MIX),
+        },
+        "levels": levels,
+        "firestore_rpcs": firestore.rpc_count,
+        "gemini_calls": model.calls,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            p95_floor_ms: float = 2.0) -> List[str]:
+    """Regressions of ``results`` against ``baseline``, as readable lines."""
+    failures = []
+    base_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in results["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        name = f"c={level['concurrency']}"
+        if level["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            failures.append(f"{name}: throughput {level['throughput_rps']} rps "
+                            f"< baseline {base['throughput_rps']} rps")
+        for route, stats in level["routes"].items():
+            base_stats = base["routes"].get(route)
+            if base_stats is None:
+                continue
+            if stats["p95_ms"] > max(base_stats["p95_ms"] * (1 + tolerance), base_stats["p95_ms"] + p95_floor_ms):
+                failures.append(f"{name} {route}: p95 {stats['p95_ms']} ms "
+                                f"> baseline {base_stats['p95_ms']} ms")
+            if stats["errors"] > base_stats["errors"]:
+                failures.append(f"{name} {route}: {stats['errors']} errors "
+                                f"(baseline {base_stats['errors']})")
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per level")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--flights", type=int, default=20000)
+    parser.add_argument("--airports", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--firestore-latency-ms", type=float, default=5.0)
+    parser.add_argument("--gemini-tokens", type=int, default=40)
+    parser.add_argument("--gemini-tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--gemini-first-token-ms", type=float, default=100.0)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="fail on regressions against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown before --baseline fails")
+    parser.add_argument("--p95-floor-ms", type=float, default=2.0,
+                        help="p95 differences smaller than this never fail --baseline")
+    parser.add_argument("--save-baseline", help="also store the results as a new baseline")
+    args = parser.parse_args()
+
+    # The app logs with print(); keep stdout for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.tolerance, args.p95_floor_ms)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
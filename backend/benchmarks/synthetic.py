@@ -0,0 +1,116 @@
+# backend/benchmarks/synthetic.py
+"""Deterministic synthetic flight catalogues for the benchmarks."""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+AIRLINES = ["Air India", "IndiGo", "SpiceJet", "Vistara", "Emirates", "British Airways"]
+CLASSES = ["Economy", "Premium Economy", "Business", "First"]
+AMENITIES = ["meal", "wifi", "entertainment", "power", "lounge"]
+EPOCH = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def airport_code(index: int) -> str:
+    # AAA, AAB, ... like IATA codes; a fourth letter past 17,576 airports
+    letters = ""
+    for _ in range(3 if index < 26 ** 3 else 4):
+        index, digit = divmod(index, 26)
+        letters = chr(ord("A") + digit) + letters
+    return letters
+
+
+def airports(count: int) -> List[Dict[str, str]]:
+    return [
+        {"code": airport_code(i), "city": f"City {i:03d}",
+         "airport": f"City {i:03d} International Airport"}
+        for i in range(count)
+    ]
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def generate_flights(count: int, airport_count: int = 300, days: int = 30,
+                     seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    places = airports(airport_count)
+    flights = []
+    for i in range(count):
+        origin, destination = rng.sample(places, 2)
+        departure = EPOCH + timedelta(minutes=rng.randrange(days * 24 * 60 // 5) * 5)
+        duration = timedelta(minutes=rng.randrange(45, 15 * 60, 5))
+        airline = rng.choice(AIRLINES)
+        flights.append({
+            "id": f"F{i:07d}",
+            "airlineName": airline,
+            "flightNumber": f"{airline[:2].upper()}{rng.randrange(100, 9999)}",
+            "departureCity": origin["city"],
+            "arrivalCity": destination["city"],
+            "departureAirport": origin["code"],
+            "arrivalAirport": destination["code"],
+            "departureTime": _iso(departure),
+            "arrivalTime": _iso(departure + duration),
+            "price": float(rng.randrange(2000, 150000, 50)),
+            "availableSeats": rng.randrange(0, 300),
+            "travelClasses": CLASSES[:rng.randrange(1, len(CLASSES) + 1)],
+            "amenities": rng.sample(AMENITIES, rng.randrange(0, len(AMENITIES) + 1)),
+            "status": "Scheduled",
+            "gate": f"{rng.choice('ABCDE')}{rng.randrange(1, 40)}",
+            "terminal": f"T{rng.randrange(1, 4)}",
+            "lastUpdated": None,
+            "logo": None,
+            "isNonStop": True,
+        })
+    return flights
+
+
+def generate_network(airport_count: int = 400, flights_per_day: int = 100000, days: int = 1,
+                     hubs: int = 20, seed: int = 42) -> List[Dict]:
+    """A hub-and-spoke schedule for connection search.
+
+    Hubs fly to each other; every other airport to two or three hubs and a
+    couple of other airports. Flights per route grow with the size of both
+    ends; durations and fares with the distance between them.
+    """
+    rng = random.Random(seed)
+    places = airports(airport_count)
+    position = [(rng.random(), rng.random()) for _ in places]
+    size = [rng.uniform(5, 10) if i < hubs else rng.uniform(0.5, 2) for i in range(airport_count)]
+    routes = {(a, b) for a in range(hubs) for b in range(hubs) if a != b}
+    for spoke in range(hubs, airport_count):
+        for other in rng.sample(range(hubs), rng.randint(2, 3)) + rng.sample(range(hubs, airport_count), 2):
+            if other != spoke:
+                routes |= {(spoke, other), (other, spoke)}
+    routes = sorted(routes)
+    weights = [size[a] * size[b] for a, b in routes]
+
+    flights = []
+    for i, (a, b) in enumerate(rng.choices(routes, weights, k=flights_per_day * days)):
+        origin, destination = places[a], places[b]
+        distance = ((position[a][0] - position[b][0]) ** 2 + (position[a][1] - position[b][1]) ** 2) ** 0.5
+        minutes = 40 + int(distance * 600) // 5 * 5
+        departure = EPOCH + timedelta(minutes=rng.randrange(days * 24 * 60 // 5) * 5)
+        airline = rng.choice(AIRLINES)
+        flights.append({
+            "id": f"N{i:07d}",
+            "airlineName": airline,
+            "flightNumber": f"{airline[:2].upper()}{rng.randrange(100, 9999)}",
+            "departureCity": origin["city"],
+            "arrivalCity": destination["city"],
+            "departureAirport": origin["code"],
+            "arrivalAirport": destination["code"],
+            "departureTime": _iso(departure),
+            "arrivalTime": _iso(departure + timedelta(minutes=minutes)),
+            "price": float(round(1500 + minutes * rng.uniform(40, 80), -1)),
+            "availableSeats": rng.randrange(0, 300),
+            "travelClasses": CLASSES[:rng.randrange(1, len(CLASSES) + 1)],
+            "amenities": [],
+            "status": "Scheduled",
+            "gate": None,
+            "terminal": None,
+            "lastUpdated": None,
+            "logo": None,
+            "isNonStop": True,
+        })
+    return flights
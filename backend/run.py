@@ -1,5 +1,60 @@
 # backend/run.py
+"""Start the API server.
+
+    python run.py            # production: one worker per CPU
+    python run.py --reload   # development: single worker, auto-reload
+
+Workers are separate processes, each with its own event loop, Firebase and
+Gemini clients (created in the app's startup hook, after the fork). uvloop
+and httptools are used when installed. On SIGTERM each worker stops
+accepting connections, lets in-flight requests finish for up to
+``--graceful-timeout`` seconds, then runs the shutdown hooks (flushing the
+conversation log) before exiting.
+"""
+import argparse
+import importlib.util
+import os
+
 import uvicorn
 
+
+def cpu_count() -> int:
+    # Respect CPU affinity / container cpusets where the platform exposes them
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SkyView API server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=float(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--reload", action="store_true", help="development mode")
+    args = parser.parse_args()
+
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "loop": "uvloop" if available("uvloop") else "asyncio",
+        "http": "httptools" if available("httptools") else "h11",
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        # Behind a load balancer; keep idle connections open a little longer
+        # than its own idle timeout
+        "timeout_keep_alive": 75,
+    }
+    if args.reload:
+        uvicorn.run("app.main:app", reload=True, **options)
+    else:
+        uvicorn.run("app.main:app", workers=args.workers or cpu_count(), **options)
+
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    main()